@@ -0,0 +1,19 @@
+from django.contrib import admin
+
+from .models import Task
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    """Очередь задач: состояние, попытки и последняя ошибка."""
+    list_display = (
+        'pk',
+        'name',
+        'state',
+        'run_at',
+        'attempts',
+        'finished_at',
+    )
+    list_filter = ('state', 'name')
+    search_fields = ('name', 'dedup_key')
+    readonly_fields = ('locked_by', 'locked_at', 'finished_at', 'created')
@@ -0,0 +1,47 @@
+"""Временная база для команд замеров.
+
+Команды bench_* создают сотни тысяч строк. Они пишут их не в рабочую
+базу, а в файл во временном каталоге; кеш и метрики на время замера
+тоже свои, чтобы не смешивать их с данными сервера.
+"""
+import shutil
+import tempfile
+from contextlib import contextmanager
+from os import path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.test import override_settings
+
+
+def use_database(settings_dict):
+    """Подменяет default для этого процесса."""
+    connections.close_all()
+    connections.databases['default'] = settings_dict
+    if hasattr(connections._connections, 'default'):
+        delattr(connections._connections, 'default')
+
+
+@contextmanager
+def scratch_database():
+    """Пустая база со схемой вместо default; каталог удаляется после."""
+    original = connections.databases['default']
+    directory = tempfile.mkdtemp()
+    settings_dict = dict(settings.DATABASES['default'])
+    settings_dict['NAME'] = path.join(directory, 'bench.sqlite3')
+    isolated = override_settings(
+        CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+        }},
+        METRICS_PATH=path.join(directory, 'metrics.sqlite3'),
+    )
+    isolated.enable()
+    try:
+        use_database(settings_dict)
+        call_command('migrate', verbosity=0)
+        yield directory
+    finally:
+        isolated.disable()
+        use_database(original)
+        shutil.rmtree(directory, ignore_errors=True)
@@ -0,0 +1,215 @@
+"""Кеш в файле SQLite, общий для всех процессов на одном сервере.
+
+Файл работает в режиме WAL: читатели не ждут писателей, а каждая
+операция записи — короткая транзакция, поэтому incr и add атомарны
+между процессами. Вытеснение — приближенный LRU по времени
+последнего чтения.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+    'expires REAL, accessed REAL NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+# Время чтения обновляется не чаще раза в секунду,
+# чтобы чтения не превращались в записи.
+LRU_RESOLUTION = 1.0
+# Как часто (в операциях записи) проверять размер кеша.
+CULL_CHECK_INTERVAL = 64
+# SQLite ограничивает число параметров запроса.
+MAX_PARAMS = 500
+
+
+class SQLiteCache(BaseCache):
+    """Кеш Django поверх одного файла SQLite в режиме WAL."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes = 0
+
+    @property
+    def _db(self):
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(
+                self._path, timeout=30, isolation_level=None
+            )
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _write(self, func):
+        """Выполняет func(db) в транзакции BEGIN IMMEDIATE."""
+        db = self._db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            result = func(db)
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+        self._writes += 1
+        if self._writes % CULL_CHECK_INTERVAL == 0:
+            self._cull()
+        return result
+
+    def _cull(self):
+        db = self._db
+        now = time.time()
+        db.execute('DELETE FROM cache WHERE expires <= ?', (now,))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            extra = count - self._max_entries
+            db.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (max(extra, count // self._cull_frequency),),
+            )
+
+    def _fetch(self, keys):
+        """Живые значения по ключам с подновлением времени чтения."""
+        now = time.time()
+        found = {}
+        touched = []
+        keys = list(keys)
+        for start in range(0, len(keys), MAX_PARAMS):
+            chunk = keys[start:start + MAX_PARAMS]
+            rows = self._db.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                'WHERE key IN ({})'.format(','.join('?' * len(chunk))),
+                chunk,
+            )
+            for key, value, expires, accessed in rows:
+                if expires is not None and expires <= now:
+                    continue
+                found[key] = pickle.loads(value)
+                if accessed < now - LRU_RESOLUTION:
+                    touched.append((now, key))
+        if touched:
+            self._write(lambda db: db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', touched
+            ))
+        return found
+
+    def _row(self, key, value, timeout):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return key, value, self.get_backend_timeout(timeout), time.time()
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._fetch([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        found = self._fetch(made)
+        return {made[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._row(key, value, timeout)
+        self._write(lambda db: db.execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', row
+        ))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        rows = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            rows.append(self._row(key, value, timeout))
+        self._write(lambda db: db.executemany(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)', rows
+        ))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._row(key, value, timeout)
+
+        def add_row(db):
+            db.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            return db.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)', row
+            ).rowcount == 1
+        return self._write(add_row)
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+
+        def incr_row(db):
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] <= time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            return value
+        return self._write(incr_row)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self.get_backend_timeout(timeout)
+        return self._write(lambda db: db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (expires, key, time.time()),
+        ).rowcount == 1)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key in self._fetch([key])
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(lambda db: db.execute(
+            'DELETE FROM cache WHERE key = ?', (key,)
+        ))
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        self._write(lambda db: db.executemany(
+            'DELETE FROM cache WHERE key = ?', [(key,) for key in keys]
+        ))
+
+    def clear(self):
+        self._write(lambda db: db.execute('DELETE FROM cache'))
+
+    def close(self, **kwargs):
+        # Соединение живет весь поток: переоткрывать его
+        # на каждый запрос дороже, чем держать.
+        pass
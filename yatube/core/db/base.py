@@ -0,0 +1,152 @@
+"""SQLite под конкурентной записью.
+
+На каждом соединении выполняются PRAGMA из OPTIONS['pragmas']: WAL,
+чтобы читатели не ждали писателей, synchronous=NORMAL, mmap, размер
+кеша страниц и busy_timeout.
+
+Транзакции начинаются с BEGIN IMMEDIATE. Отложенная транзакция,
+которая сначала читает, а потом пишет, падает с database is locked
+сразу, не дожидаясь busy_timeout; немедленная берет блокировку
+на запись в начале и ждет ее как положено.
+
+Внутри процесса записи выстраиваются в очередь (FIFO) на файл базы:
+транзакция держит место от BEGIN до COMMIT или ROLLBACK, запрос вне
+транзакции — на время запроса. Ждать очереди можно не дольше
+OPTIONS['write_timeout'] секунд, затем OperationalError. Между
+процессами ожидание ограничивает busy_timeout.
+
+Блокировка файла и место в очереди берутся в начале atomic(), а не
+при первой записи: иначе транзакция, которая сначала читает, падала
+бы из-за писателя в другом процессе. Поэтому любой atomic() — это
+транзакция на запись, даже если внутри только чтение: код, который
+лишь читает, в atomic() не оборачивают. В TestCase внешняя транзакция
+теста держит очередь до его конца, и потоки, которые пишут во время
+теста, ждут write_timeout и падают; такие тесты наследуют
+TransactionTestCase.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+from django.db.backends.sqlite3 import base
+
+WRITE = re.compile(
+    r'\s*(INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE
+)
+DEFAULT_WRITE_TIMEOUT = 5
+
+
+class WriteQueue:
+    """Очередь на запись в одну базу: потоки проходят по порядку."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._waiting = deque()
+        self._busy = False
+
+    def acquire(self, timeout):
+        ticket = object()
+        with self._condition:
+            self._waiting.append(ticket)
+            if not self._condition.wait_for(
+                lambda: not self._busy and self._waiting[0] is ticket,
+                timeout,
+            ):
+                self._waiting.remove(ticket)
+                self._condition.notify_all()
+                raise OperationalError(
+                    f'Очередь на запись не дошла за {timeout} с.'
+                )
+            self._waiting.popleft()
+            self._busy = True
+
+    def release(self):
+        with self._condition:
+            self._busy = False
+            self._condition.notify_all()
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def write_queue(name):
+    with _queues_lock:
+        return _queues.setdefault(name, WriteQueue())
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = options.get('pragmas', {})
+        self.write_timeout = options.get(
+            'write_timeout', DEFAULT_WRITE_TIMEOUT
+        )
+        self.write_queue = None
+        self.holds_write_queue = False
+        # Время ожидания очереди, для замеров.
+        self.write_wait = 0.0
+        self.execute_wrappers.append(self._queue_writes)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('write_timeout', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # Имя базы известно точно только здесь: тесты подменяют NAME.
+        self.write_queue = write_queue(conn_params['database'])
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _enter_write_queue(self):
+        start = time.perf_counter()
+        self.write_queue.acquire(self.write_timeout)
+        self.write_wait += time.perf_counter() - start
+        self.holds_write_queue = True
+
+    def _leave_write_queue(self):
+        if self.holds_write_queue:
+            self.holds_write_queue = False
+            self.write_queue.release()
+
+    def _queue_writes(self, execute, sql, params, many, context):
+        if self.holds_write_queue or not WRITE.match(sql):
+            return execute(sql, params, many, context)
+        self._enter_write_queue()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._leave_write_queue()
+
+    def _start_transaction_under_autocommit(self):
+        self._enter_write_queue()
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._leave_write_queue()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._leave_write_queue()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._leave_write_queue()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._leave_write_queue()
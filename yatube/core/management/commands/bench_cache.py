@@ -0,0 +1,85 @@
+import random
+import shutil
+import tempfile
+from multiprocessing import get_context
+from os import path
+from time import perf_counter
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from ...cache import SQLiteCache
+
+KEYS = 1000
+
+
+def make_cache(name, directory):
+    if name == 'locmem':
+        return LocMemCache('bench', {})
+    if name == 'filebased':
+        return FileBasedCache(path.join(directory, 'files'), {})
+    return SQLiteCache(path.join(directory, 'cache.sqlite3'), {})
+
+
+def worker(name, directory, ops, write_ratio, seed):
+    cache = make_cache(name, directory)
+    rnd = random.Random(seed)
+    payload = 'x' * 2048
+    for _ in range(ops):
+        key = f'key{rnd.randrange(KEYS)}'
+        if rnd.random() < write_ratio:
+            cache.set(key, payload)
+        else:
+            cache.get(key)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность LocMemCache, FileBasedCache '
+        'и SQLiteCache при работе из нескольких процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument(
+            '--ops', type=int, default=5000,
+            help='Операций на процесс.'
+        )
+        parser.add_argument(
+            '--write-ratio', type=float, default=0.1,
+            help='Доля записей среди операций.'
+        )
+
+    def handle(self, *args, **options):
+        context = get_context('fork')
+        for name in ('locmem', 'filebased', 'sqlite'):
+            directory = tempfile.mkdtemp()
+            try:
+                make_cache(name, directory).set_many(
+                    {f'key{i}': 'x' * 2048 for i in range(KEYS)}
+                )
+                workers = [
+                    context.Process(target=worker, args=(
+                        name, directory, options['ops'],
+                        options['write_ratio'], seed,
+                    ))
+                    for seed in range(options['processes'])
+                ]
+                start = perf_counter()
+                for process in workers:
+                    process.start()
+                for process in workers:
+                    process.join()
+                elapsed = perf_counter() - start
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+            total = options['ops'] * options['processes']
+            self.stdout.write(
+                f'{name:>10}: {total / elapsed:10.0f} ops/s '
+                f'({options["processes"]} процессов)'
+            )
+        self.stdout.write(
+            'LocMemCache быстрее всех, но каждый процесс видит '
+            'только свою копию данных.'
+        )
@@ -0,0 +1,199 @@
+import random
+import shutil
+import tempfile
+import threading
+from multiprocessing import get_context
+from os import path
+from time import perf_counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections, transaction
+from django.test import override_settings
+
+from posts.models import Comment, Follow, Post
+
+from ...bench import use_database
+
+User = get_user_model()
+USERS = 100
+POSTS = 1000
+
+
+def profiles(directory):
+    """Обычный SQLite Django и настроенный из settings, каждый в файле."""
+    tuned = dict(settings.DATABASES['default'])
+    tuned['NAME'] = path.join(directory, 'tuned.sqlite3')
+    return {
+        'plain': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path.join(directory, 'plain.sqlite3'),
+        },
+        'tuned': tuned,
+    }
+
+
+def seed():
+    call_command('migrate', verbosity=0)
+    User.objects.bulk_create(
+        User(username=f'user{number}') for number in range(USERS)
+    )
+    users = list(User.objects.values_list('pk', flat=True))
+    Post.objects.bulk_create(
+        Post(author_id=random.choice(users), text=f'Пост {number}')
+        for number in range(POSTS)
+    )
+
+
+def read(rnd, users, posts):
+    list(Post.objects.select_related('author', 'group')[:10])
+
+
+def comment(rnd, users, posts):
+    # Сначала чтение, потом запись: так пишут виды и сигналы.
+    with transaction.atomic():
+        post = Post.objects.get(pk=rnd.choice(posts))
+        Comment.objects.create(
+            post=post, author_id=rnd.choice(users), text='Комментарий'
+        )
+
+
+def follow(rnd, users, posts):
+    user, author = rnd.sample(users, 2)
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(
+            user_id=user, author_id=author
+        ).delete()
+        if not deleted:
+            Follow.objects.create(user_id=user, author_id=author)
+
+
+def run_thread(ops, read_ratio, seed, result):
+    rnd = random.Random(seed)
+    users = list(User.objects.values_list('pk', flat=True))
+    posts = list(Post.objects.values_list('pk', flat=True))
+    for _ in range(ops):
+        if rnd.random() < read_ratio:
+            kind, operation = 'read', read
+        else:
+            kind, operation = 'write', rnd.choice((comment, follow))
+        start = perf_counter()
+        try:
+            operation(rnd, users, posts)
+        except DatabaseError as error:
+            result['errors'][str(error)] = (
+                result['errors'].get(str(error), 0) + 1
+            )
+            continue
+        result[kind].append(perf_counter() - start)
+    connections.close_all()
+
+
+def worker(threads, ops, read_ratio, seed, queue):
+    results = [
+        {'read': [], 'write': [], 'errors': {}} for _ in range(threads)
+    ]
+    workers = [
+        threading.Thread(target=run_thread, args=(
+            ops, read_ratio, seed * threads + number, results[number]
+        ))
+        for number in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    total = {'read': [], 'write': [], 'errors': {}}
+    for result in results:
+        total['read'] += result['read']
+        total['write'] += result['write']
+        for error, count in result['errors'].items():
+            total['errors'][error] = total['errors'].get(error, 0) + count
+    queue.put(total)
+
+
+def percentile(values, share):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает конкурентную запись комментариев и подписок в обычном '
+        'SQLite и в настроенном (WAL, BEGIN IMMEDIATE, очередь на запись).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument(
+            '--threads', type=int, default=4,
+            help='Потоков в каждом процессе.'
+        )
+        parser.add_argument(
+            '--ops', type=int, default=200,
+            help='Операций на поток.'
+        )
+        parser.add_argument(
+            '--read-ratio', type=float, default=0.5,
+            help='Доля чтений среди операций.'
+        )
+
+    def handle(self, *args, **options):
+        original = connections.databases['default']
+        directory = tempfile.mkdtemp()
+        # Кеш и метрики не должны мешать замеру базы.
+        isolated = override_settings(
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'
+            }},
+            METRICS_PATH=path.join(directory, 'metrics.sqlite3'),
+        )
+        isolated.enable()
+        try:
+            for name, settings_dict in profiles(directory).items():
+                use_database(settings_dict)
+                seed()
+                connections.close_all()
+                self.run(name, options)
+        finally:
+            isolated.disable()
+            use_database(original)
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run(self, name, options):
+        context = get_context('fork')
+        queue = context.Queue()
+        processes = [
+            context.Process(target=worker, args=(
+                options['threads'], options['ops'], options['read_ratio'],
+                seed, queue,
+            ))
+            for seed in range(options['processes'])
+        ]
+        start = perf_counter()
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = perf_counter() - start
+        reads = [time for result in results for time in result['read']]
+        writes = [time for result in results for time in result['write']]
+        errors = {}
+        for result in results:
+            for error, count in result['errors'].items():
+                errors[error] = errors.get(error, 0) + count
+        self.stdout.write(
+            f'{name}: {(len(reads) + len(writes)) / elapsed:.0f} оп/с; '
+            f'запись p50 {percentile(writes, 0.5) * 1000:.1f} мс, '
+            f'p99 {percentile(writes, 0.99) * 1000:.1f} мс; '
+            f'чтение p50 {percentile(reads, 0.5) * 1000:.1f} мс, '
+            f'p99 {percentile(reads, 0.99) * 1000:.1f} мс; '
+            f'ошибок {sum(errors.values())}'
+        )
+        for error, count in sorted(errors.items()):
+            self.stdout.write(f'    {count} × {error}')
@@ -0,0 +1,107 @@
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, override_settings
+
+from ... import timing
+
+MIDDLEWARE = 'core.timing.TimingMiddleware'
+CALLS = 100000
+
+
+def measure(client, path):
+    start = perf_counter()
+    client.get(path)
+    return perf_counter() - start
+
+
+def per_call(func):
+    start = perf_counter()
+    for _ in range(CALLS):
+        func()
+    return (perf_counter() - start) / CALLS
+
+
+def fixed_cost(path):
+    """Сколько middleware добавляет к запросу сверх самого вида."""
+    response = HttpResponse()
+    request = RequestFactory().get(path)
+    middleware = timing.TimingMiddleware(lambda request: response)
+    cost = per_call(lambda: middleware(request)) - per_call(
+        lambda: middleware.get_response(request)
+    )
+    timing.clear()
+    return cost
+
+
+def event_cost():
+    """Сколько обертка добавляет к SQL-запросу, шаблону, чтению кеша."""
+    def execute(sql, params, many, context):
+        pass
+
+    timing._local.timing = timing.Timing(RequestFactory().get('/'))
+    try:
+        return per_call(
+            lambda: timing._timed_execute(execute, '', (), False, {})
+        ) - per_call(lambda: execute('', (), False, {}))
+    finally:
+        timing._local.timing = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответа с TimingMiddleware, замеряющим каждый '
+        'запрос, и без него и оценивает накладные расходы замера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=['/'], metavar='path',
+            help='Какие страницы запрашивать.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Сколько запросов к странице с замером и без; '
+                 'берется медиана.'
+        )
+
+    def handle(self, *args, **options):
+        without = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+        with override_settings(TIMING_SAMPLE_RATE=1.0):
+            per_event = event_cost()
+            for path in options['paths']:
+                # Клиент собирает цепочку middleware при первом запросе.
+                with override_settings(MIDDLEWARE=without):
+                    plain = Client()
+                    plain.get(path)
+                timed = Client()
+                timed.get(path)
+                record = timing.recent()[-1]
+                plain_times = []
+                timed_times = []
+                # Запросы чередуются, чтобы фоновый шум делился поровну.
+                for _ in range(options['requests']):
+                    plain_times.append(measure(plain, path))
+                    timed_times.append(measure(timed, path))
+                plain_time = median(plain_times)
+                timed_time = median(timed_times)
+                # Разница медиан тонет в шуме, поэтому есть и прямая
+                # оценка: постоянная часть плюс обертка на каждое событие.
+                events = (
+                    record['db_queries'] + record['cache_hits']
+                    + record['cache_misses'] + sum(
+                        stats['count']
+                        for stats in record['templates'].values()
+                    )
+                )
+                estimate = fixed_cost(path) + events * per_event
+                self.stdout.write(
+                    f'{path}: без замера {plain_time * 1000:.2f} мс, '
+                    f'с замером {timed_time * 1000:.2f} мс '
+                    f'({(timed_time / plain_time - 1) * 100:+.1f}%); '
+                    f'оценка: {estimate * 10 ** 6:.0f} мкс на {events} '
+                    f'событий, {estimate / plain_time * 100:.2f}%'
+                )
@@ -0,0 +1,101 @@
+import os
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ... import tasks
+
+
+def _close_connections():
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди в пуле потоков или процессов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Сколько задач выполнять одновременно.'
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process', 'sync'),
+            default='thread',
+            help='Где выполнять задачи: потоки, процессы или сам воркер.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Пауза между проверками очереди, в секундах.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.'
+        )
+
+    def handle(self, *args, **options):
+        if options['pool'] == 'sync':
+            self.run_sync(options)
+            return
+        if options['pool'] == 'process':
+            # Дочерние процессы не должны делить соединение родителя.
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                options['workers'],
+                mp_context=get_context('fork'),
+                initializer=_close_connections,
+            )
+        else:
+            executor = ThreadPoolExecutor(
+                options['workers'], thread_name_prefix='tasks'
+            )
+        with executor:
+            self.run_pool(executor, options)
+
+    def run_sync(self, options):
+        while True:
+            tasks.schedule_periodic()
+            tasks.release_stale()
+            claimed = tasks.claim(1)
+            for task in claimed:
+                self.run_one(task)
+            if not claimed:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+
+    def run_one(self, task):
+        try:
+            tasks.execute(task.name, task.args)
+        except Exception as error:
+            tasks.finish(task, error)
+        else:
+            tasks.finish(task)
+
+    def run_pool(self, executor, options):
+        running = {}
+        while True:
+            tasks.schedule_periodic()
+            tasks.release_stale()
+            free = options['workers'] - len(running)
+            if free > 0:
+                for task in tasks.claim(free):
+                    future = executor.submit(
+                        tasks.execute_in_pool, task.name, task.args
+                    )
+                    running[future] = task
+            if not running:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            done, _ = wait(
+                running, timeout=options['poll_interval'],
+                return_when=FIRST_COMPLETED,
+            )
+            for future in done:
+                tasks.finish(running.pop(future), future.exception())
@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Значения PRAGMA auto_vacuum.
+INCREMENTAL = 2
+CHECKPOINT_MODES = ('passive', 'full', 'restart', 'truncate')
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание базы SQLite: ANALYZE, возврат свободных страниц '
+        '(incremental vacuum) и контрольная точка WAL.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--skip-analyze', action='store_true',
+            help='Не пересчитывать статистику для планировщика.'
+        )
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=0,
+            help='Сколько свободных страниц вернуть; 0 — все.'
+        )
+        parser.add_argument(
+            '--vacuum', action='store_true',
+            help='Перестроить базу целиком (VACUUM) и включить '
+                 'incremental vacuum, если он выключен. Блокирует базу.'
+        )
+        parser.add_argument(
+            '--checkpoint', choices=CHECKPOINT_MODES, default='truncate',
+            help='Режим контрольной точки WAL.'
+        )
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError(f'База {options["database"]} не SQLite.')
+        with connection.cursor() as cursor:
+            if not options['skip_analyze']:
+                self.step('ANALYZE', cursor.execute, 'ANALYZE')
+            auto_vacuum = self.pragma(cursor, 'auto_vacuum')
+            if options['vacuum']:
+                if auto_vacuum != INCREMENTAL:
+                    # Режим меняется только вместе с полным VACUUM.
+                    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+                self.step('VACUUM', cursor.execute, 'VACUUM')
+            elif auto_vacuum == INCREMENTAL:
+                free = self.pragma(cursor, 'freelist_count')
+                pages = min(options['vacuum_pages'] or free, free)
+                self.step(
+                    f'incremental vacuum ({pages} из {free} '
+                    'свободных страниц)',
+                    self.incremental_vacuum, cursor, pages,
+                )
+            else:
+                self.stdout.write(
+                    'incremental vacuum выключен; включить его можно '
+                    'один раз с --vacuum.'
+                )
+            mode = options['checkpoint'].upper()
+            self.step(
+                f'checkpoint {mode}', cursor.execute,
+                f'PRAGMA wal_checkpoint({mode})',
+            )
+            busy, log, done = cursor.fetchone()
+            if busy:
+                self.stdout.write(
+                    'Контрольная точка не завершена: базу читают.'
+                )
+            self.stdout.write(
+                f'WAL: {log} страниц, перенесено в базу {done}; '
+                f'свободных страниц: {self.pragma(cursor, "freelist_count")}'
+            )
+
+    def step(self, name, func, *args):
+        started = time.perf_counter()
+        func(*args)
+        self.stdout.write(f'{name}: {time.perf_counter() - started:.2f} с')
+
+    @staticmethod
+    def incremental_vacuum(cursor, pages):
+        # sqlite3 делает один шаг запроса без результата, а каждый
+        # шаг incremental_vacuum освобождает одну страницу.
+        for _ in range(pages):
+            cursor.execute('PRAGMA incremental_vacuum')
+
+    @staticmethod
+    def pragma(cursor, name):
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
@@ -0,0 +1,394 @@
+"""Метрики в формате Prometheus, общие для всех процессов сервера.
+
+Запись идет без блокировок: у каждого потока свой словарь значений.
+Раз в METRICS_FLUSH_INTERVAL секунд фоновый поток (и atexit при выходе)
+сбрасывает накопленные итоги процесса в файл SQLite, по строке на
+процесс и метрику; запросы в файл не пишут.
+/metrics складывает строки всех процессов, поэтому рабочие процессы
+WSGI и воркеры задач видны вместе. Строки завершившихся процессов
+/metrics складывает в одну общую строку retired: файл не растет
+с каждым перезапуском, а счетчики не убывают.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    'process TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, '
+    'PRIMARY KEY (process, key)) WITHOUT ROWID'
+)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+RETIRED = 'retired'
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1, 0.5, 1)
+SIZE_BUCKETS = tuple(2 ** power for power in range(14, 27, 2))
+
+_metrics = {}
+
+
+class _State:
+    """Значения метрик этого процесса по потокам."""
+
+    def __init__(self):
+        self.process = f'{os.getpid()}:{uuid.uuid4().hex}'
+        self.local = threading.local()
+        # Пары (поток, его значения); значения завершившихся потоков
+        # переносятся в retired.
+        self.shards = []
+        self.retired = {}
+        self.lock = threading.Lock()
+        self.flusher = None
+
+
+_state = _State()
+_flush_lock = threading.Lock()
+
+
+def _reset():
+    """После fork значения родителя не наши: начинаем с нуля."""
+    global _state, _flush_lock
+    _state = _State()
+    _flush_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset)
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception('Не удалось записать метрики')
+
+
+def _values():
+    """Словарь значений текущего потока."""
+    state = _state
+    values = getattr(state.local, 'values', None)
+    if values is None:
+        values = state.local.values = {}
+        with state.lock:
+            state.shards.append((threading.current_thread(), values))
+            # Поток записи заводится при первой метрике процесса,
+            # в том числе после fork: потоки родителя в ребенке не живут.
+            if state.flusher is None:
+                state.flusher = threading.Thread(
+                    target=_flush_periodically,
+                    name='metrics-flush', daemon=True,
+                )
+                state.flusher.start()
+    return values
+
+
+def _merge(total, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            merged = total.setdefault(key, [0] * len(value))
+            for index, item in enumerate(value):
+                merged[index] += item
+        else:
+            total[key] = total.get(key, 0) + value
+
+
+def _local_totals():
+    """Итоги процесса: завершившиеся потоки плюс живые."""
+    state = _state
+    with state.lock:
+        alive = []
+        for thread, values in state.shards:
+            if thread.is_alive():
+                alive.append((thread, values))
+            else:
+                _merge(state.retired, values)
+        state.shards = alive
+        # Копия под GIL атомарна; значение может отстать на одну запись.
+        totals = {
+            key: list(value) if isinstance(value, list) else value
+            for key, value in state.retired.items()
+        }
+    for _, values in alive:
+        _merge(totals, {
+            key: list(value) if isinstance(value, list) else value
+            for key, value in dict(values).items()
+        })
+    return totals
+
+
+def _connect():
+    directory = os.path.dirname(settings.METRICS_PATH)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(
+        settings.METRICS_PATH, timeout=30, isolation_level=None
+    )
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute(SCHEMA)
+    return db
+
+
+def flush():
+    """Записывает итоги процесса в общий файл."""
+    # Иначе итоги, собранные раньше, могли бы записаться позже.
+    with _flush_lock:
+        totals = _local_totals()
+        if not totals:
+            return
+        db = _connect()
+        try:
+            db.execute('BEGIN IMMEDIATE')
+            db.executemany(
+                'INSERT OR REPLACE INTO metrics (process, key, value) '
+                'VALUES (?, ?, ?)',
+                [
+                    (_state.process, json.dumps(key), json.dumps(value))
+                    for key, value in totals.items()
+                ],
+            )
+            db.execute('COMMIT')
+        finally:
+            db.close()
+
+
+atexit.register(flush)
+
+
+def _alive(process):
+    """Жив ли процесс, записавший строки (файл метрик локальный)."""
+    if process == RETIRED:
+        return True
+    try:
+        os.kill(int(process.split(':', 1)[0]), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _retire(db, dead):
+    """Переносит итоги завершившихся процессов в строку retired."""
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        # Перечитываем под блокировкой: другой сборщик мог успеть раньше.
+        totals = {}
+        rows = db.execute(
+            'SELECT process, key, value FROM metrics'
+        ).fetchall()
+        for process, key, value in rows:
+            if process == RETIRED or process in dead:
+                _merge(totals, {key: json.loads(value)})
+        db.executemany(
+            'DELETE FROM metrics WHERE process = ?',
+            [(process,) for process in dead],
+        )
+        db.executemany(
+            'INSERT OR REPLACE INTO metrics (process, key, value) '
+            'VALUES (?, ?, ?)',
+            [
+                (RETIRED, key, json.dumps(value))
+                for key, value in totals.items()
+            ],
+        )
+        db.execute('COMMIT')
+    except BaseException:
+        db.execute('ROLLBACK')
+        raise
+
+
+def collect():
+    """Итоги всех процессов: (имя, значения меток) -> значение."""
+    flush()
+    if not os.path.exists(settings.METRICS_PATH):
+        return {}
+    db = _connect()
+    try:
+        rows = db.execute(
+            'SELECT process, key, value FROM metrics'
+        ).fetchall()
+        dead = {
+            process for process in {row[0] for row in rows}
+            if not _alive(process)
+        }
+        if dead:
+            _retire(db, dead)
+    finally:
+        db.close()
+    totals = {}
+    for _, key, value in rows:
+        name, labels = json.loads(key)
+        _merge(totals, {(name, tuple(labels)): json.loads(value)})
+    return totals
+
+
+class Counter:
+    """Монотонный счетчик."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _metrics[name] = self
+
+    def inc(self, *labels, amount=1):
+        values = _values()
+        key = (self.name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def samples(self, labels, value):
+        yield self.name, labels, value
+
+
+class Histogram:
+    """Распределение значений по корзинам с суммой и числом."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        _metrics[name] = self
+
+    def observe(self, value, *labels):
+        values = _values()
+        key = (self.name, labels)
+        # Счетчики корзин, затем сумма и число наблюдений.
+        counts = values.get(key)
+        if counts is None:
+            counts = values[key] = [0] * (len(self.buckets) + 2)
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            counts[index] += 1
+        counts[-2] += value
+        counts[-1] += 1
+
+    def samples(self, labels, counts):
+        cumulative = 0
+        for bound, count in zip(self.buckets, counts):
+            cumulative += count
+            yield f'{self.name}_bucket', labels + (('le', bound),), cumulative
+        yield f'{self.name}_bucket', labels + (('le', '+Inf'),), counts[-1]
+        yield f'{self.name}_sum', labels, counts[-2]
+        yield f'{self.name}_count', labels, counts[-1]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', r'\\').replace(
+            '"', r'\"'
+        ).replace('\n', r'\n'))
+        for name, value in labels
+    ) + '}'
+
+
+def render():
+    """Все метрики всех процессов в текстовом формате Prometheus."""
+    totals = collect()
+    lines = []
+    for name, metric in sorted(_metrics.items()):
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.kind}')
+        series = sorted(
+            (labels, value) for (key, labels), value in totals.items()
+            if key == name
+        )
+        for labels, value in series:
+            for sample, sample_labels, sample_value in metric.samples(
+                tuple(zip(metric.labels, labels)), value
+            ):
+                lines.append('{}{} {}'.format(
+                    sample, _format_labels(sample_labels), sample_value
+                ))
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_LATENCY = Histogram(
+    'yatube_request_duration_seconds',
+    'Время ответа по имени URL из posts.urls.',
+    labels=('view',),
+)
+DB_QUERY_TIME = Histogram(
+    'yatube_db_query_duration_seconds',
+    'Время SQL-запросов.',
+    buckets=QUERY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'yatube_cache_requests_total',
+    'Обращения к кешам по результату: hit, stale или miss.',
+    labels=('cache', 'result'),
+)
+THUMBNAIL_GENERATION = Histogram(
+    'yatube_thumbnail_generation_duration_seconds',
+    'Время создания миниатюр одной картинки по результату.',
+    labels=('result',),
+)
+UPLOAD_SIZE = Histogram(
+    'yatube_upload_size_bytes',
+    'Размер загруженных картинок постов.',
+    buckets=SIZE_BUCKETS,
+)
+
+
+def cache_result(cache, hits=0, misses=0, stale=0):
+    """Учитывает обращения к кешу cache."""
+    for result, count in (('hit', hits), ('miss', misses), ('stale', stale)):
+        if count:
+            CACHE_REQUESTS.inc(cache, result, amount=count)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        DB_QUERY_TIME.observe(time.perf_counter() - start)
+
+
+def _add_execute_wrapper(connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+class MetricsMiddleware:
+    """Время ответа видов posts и время их SQL-запросов."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Соединения других потоков получат обертку при подключении.
+        connection_created.connect(_add_execute_wrapper)
+        for connection in connections.all():
+            _add_execute_wrapper(connection)
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        response = self.get_response(request)
+        match = request.resolver_match
+        REQUEST_LATENCY.observe(
+            time.perf_counter() - start,
+            match.url_name if match and match.namespace == 'posts'
+            else 'other',
+        )
+        return response
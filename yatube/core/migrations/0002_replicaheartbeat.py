@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaHeartbeat',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('time', models.DateTimeField(verbose_name='Время копирования')),
+            ],
+            options={
+                'verbose_name': 'Отметка репликации',
+                'verbose_name_plural': 'Отметки репликации',
+            },
+        ),
+    ]
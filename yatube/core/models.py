@@ -0,0 +1,106 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """Отложенная задача для воркера run_tasks."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATES = (
+        (PENDING, 'Ждет'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField(
+        max_length=200,
+        verbose_name='Задача',
+    )
+    args = models.TextField(
+        default='[]',
+        verbose_name='Аргументы (JSON)',
+    )
+    dedup_key = models.CharField(
+        max_length=200,
+        null=True,
+        blank=True,
+        verbose_name='Ключ дедупликации',
+    )
+    state = models.CharField(
+        max_length=10,
+        choices=STATES,
+        default=PENDING,
+        verbose_name='Состояние',
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить не раньше',
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попыток',
+    )
+    max_attempts = models.PositiveIntegerField(
+        verbose_name='Максимум попыток',
+    )
+    locked_by = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='Воркер',
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взята в работу',
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершена',
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+    )
+
+    class Meta:
+        verbose_name = 'Задача'
+        verbose_name_plural = 'Задачи'
+        indexes = [
+            models.Index(
+                fields=['state', 'run_at'], name='task_state_run_at_idx'
+            ),
+        ]
+        constraints = [
+            # Пока задача с ключом ждет запуска, такая же не ставится.
+            models.UniqueConstraint(
+                fields=['dedup_key'],
+                condition=models.Q(state='pending'),
+                name='unique_pending_dedup_key',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.get_state_display()})'
+
+
+class ReplicaHeartbeat(models.Model):
+    """Время последнего копирования базы в реплики.
+
+    sync_replica обновляет единственную строку в default перед
+    копированием; по ее значению на реплике видно отставание.
+    """
+    time = models.DateTimeField(
+        verbose_name='Время копирования',
+    )
+
+    class Meta:
+        verbose_name = 'Отметка репликации'
+        verbose_name_plural = 'Отметки репликации'
@@ -0,0 +1,138 @@
+"""Бюджет SQL-запросов для видов.
+
+Вид объявляет, сколько запросов ему можно сделать:
+
+    @query_budget(4)
+    def index(request): ...
+
+При QUERY_BUDGET_ENFORCE превышение — ошибка QueryBudgetExceeded со списком
+запросов и повторов (типичный N+1), при DEBUG — предупреждение в лог.
+Иначе декоратор ничего не делает. В тестах бюджет проверяет
+assert_within_budget, а для произвольного кода есть контекстный
+менеджер QueryBudget. Считаются запросы ко всем базам: виды
+с read_from_replica читают из реплик.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import ContextDecorator, ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.test.utils import override_settings
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+# Строки и числа в SQL: без них одинаковые запросы с разными
+# параметрами сводятся к одному шаблону.
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r'IN \((?:\?, )*\?\)')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Код сделал больше запросов, чем ему разрешено."""
+
+
+def normalize(sql):
+    """Шаблон запроса: литералы заменены на ?, списки IN свернуты."""
+    return IN_LISTS.sub('IN (...)', LITERALS.sub('?', sql))
+
+
+def report(queries, limit, label):
+    """Текст для разбора: все запросы и те, что повторяются."""
+    lines = [f'{label}: {len(queries)} запросов при бюджете {limit}.']
+    lines += [
+        f'{number}. {query["sql"]}'
+        for number, query in enumerate(queries, 1)
+    ]
+    repeated = [
+        (count, sql) for sql, count in Counter(
+            normalize(query['sql']) for query in queries
+        ).most_common() if count > 1
+    ]
+    if repeated:
+        lines.append('Повторяются:')
+        lines += [f'{count} × {sql}' for count, sql in repeated]
+    return '\n'.join(lines)
+
+
+class QueryBudget(ContextDecorator):
+    """Ошибка QueryBudgetExceeded, если внутри больше limit запросов.
+
+    using — псевдоним базы; по умолчанию считаются все базы. При
+    strict=False превышение только пишется в лог.
+    """
+
+    def __init__(self, limit, label='Код', using=None, strict=True):
+        self.limit = limit
+        self.label = label
+        self.using = using
+        self.strict = strict
+        self.queries = []
+
+    def _record(self, execute, sql, params, many, context):
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not many:
+                sql = context['connection'].ops.last_executed_query(
+                    context['cursor'], sql, params
+                )
+            self.queries.append({
+                'sql': sql, 'using': context['connection'].alias
+            })
+
+    def __enter__(self):
+        self.queries = []
+        self.stack = ExitStack()
+        # Обертка не открывает соединение с базой, которую код не тронет.
+        for alias in connections if self.using is None else [self.using]:
+            self.stack.enter_context(
+                connections[alias].execute_wrapper(self._record)
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stack.close()
+        if exc_type is None and len(self.queries) > self.limit:
+            message = report(self.queries, self.limit, self.label)
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+
+
+def query_budget(limit):
+    """Объявляет бюджет вида; проверяет его по настройкам."""
+    def decorator(view):
+        label = f'{view.__module__}.{view.__name__}'
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not settings.QUERY_BUDGET_ENFORCE and not settings.DEBUG:
+                return view(request, *args, **kwargs)
+            with QueryBudget(
+                limit, label, strict=settings.QUERY_BUDGET_ENFORCE
+            ):
+                return view(request, *args, **kwargs)
+        wrapper.query_budget = limit
+        return wrapper
+    return decorator
+
+
+def declared_budget(path):
+    """Бюджет вида, который обслуживает path; None, если не объявлен."""
+    return getattr(resolve(path).func, 'query_budget', None)
+
+
+def assert_within_budget(client, path, method='get', **kwargs):
+    """Делает запрос тестовым клиентом с проверкой бюджета вида.
+
+    Подходит и для pytest, и для unittest: превышение поднимает
+    QueryBudgetExceeded из вида, а ответ возвращается как есть.
+    """
+    if declared_budget(path) is None:
+        raise AssertionError(f'У вида для {path} не объявлен бюджет.')
+    with override_settings(QUERY_BUDGET_ENFORCE=True):
+        return getattr(client, method)(path, **kwargs)
@@ -0,0 +1,128 @@
+"""Чтение из реплик базы.
+
+Виды с декоратором read_from_replica читают из реплик
+DATABASE_REPLICAS, запись всегда идет в default. Запрос, который
+писал в базу, получает cookie, и еще REPLICA_READ_YOUR_WRITES секунд
+этот клиент читает из default и сразу видит свои изменения.
+
+Отставание реплики — возраст отметки ReplicaHeartbeat на ней: команда
+sync_replica обновляет отметку в default перед копированием. Реплика,
+отставшая больше REPLICA_MAX_LAG секунд или недоступная, пропускается,
+а если подходящих нет, чтение идет из default.
+"""
+import math
+import random
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError
+from django.utils import timezone
+
+from .models import ReplicaHeartbeat
+
+PIN_COOKIE = 'primary_until'
+
+_local = threading.local()
+# Реплика -> (когда проверена, отставание на тот момент).
+_lags = {}
+
+
+def lag(alias):
+    """Отставание реплики в секундах; inf, если она недоступна."""
+    try:
+        beat = ReplicaHeartbeat.objects.using(alias).values_list(
+            'time', flat=True
+        ).first()
+    except DatabaseError:
+        return math.inf
+    if beat is None:
+        return math.inf
+    return max(0.0, (timezone.now() - beat).total_seconds())
+
+
+def fresh_replicas():
+    """Реплики, отставшие не больше REPLICA_MAX_LAG.
+
+    Отставание перепроверяется раз в REPLICA_LAG_CHECK_INTERVAL
+    секунд, а между проверками растет вместе со временем.
+    """
+    now = time.monotonic()
+    fresh = []
+    for alias in settings.DATABASE_REPLICAS:
+        checked = _lags.get(alias)
+        if (checked is None
+                or now - checked[0] >= settings.REPLICA_LAG_CHECK_INTERVAL):
+            checked = _lags[alias] = (now, lag(alias))
+        if checked[1] + now - checked[0] <= settings.REPLICA_MAX_LAG:
+            fresh.append(alias)
+    return fresh
+
+
+class ReplicaRouter:
+    """Чтение видов read_from_replica — из реплик, остальное — из default."""
+
+    def db_for_read(self, model, **hints):
+        if getattr(_local, 'replica', False) and not getattr(
+            _local, 'wrote', False
+        ):
+            fresh = fresh_replicas()
+            if fresh:
+                return random.choice(fresh)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики — копии default, схема приходит вместе с данными.
+        return db not in settings.DATABASE_REPLICAS
+
+
+def _pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def read_from_replica(view):
+    """Вид только читает; его запросы можно отдать реплике."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.DATABASE_REPLICAS or _pinned(request):
+            return view(request, *args, **kwargs)
+        _local.replica = True
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _local.replica = False
+    return wrapper
+
+
+class ReplicaMiddleware:
+    """После записи в базу клиент какое-то время читает из default.
+
+    Ставится раньше SessionMiddleware, чтобы учесть и запись сессии.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.wrote = False
+        response = self.get_response(request)
+        if _local.wrote and settings.DATABASE_REPLICAS:
+            window = settings.REPLICA_READ_YOUR_WRITES
+            response.set_cookie(
+                PIN_COOKIE, f'{time.time() + window:.3f}',
+                max_age=window, httponly=True, samesite='Lax',
+            )
+        _local.wrote = False
+        return response
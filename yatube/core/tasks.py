@@ -0,0 +1,209 @@
+"""Очередь фоновых задач в базе данных.
+
+Функция регистрируется декоратором @task и ставится в очередь
+через enqueue() или func.enqueue(). Задачи выполняет команда
+run_tasks в пуле потоков или процессов. Упавшая задача
+перезапускается с экспоненциальной задержкой, пока не кончатся
+попытки. Ключ дедупликации не дает поставить вторую такую же
+задачу, пока первая ждет запуска. Периодические задачи (@periodic)
+ставятся воркером сами на ближайший слот расписания.
+"""
+import json
+import logging
+import traceback
+from datetime import timedelta
+from uuid import uuid4
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+# Имя задачи -> (функция, максимум попыток).
+registry = {}
+# Имя задачи -> период в секундах.
+schedule = {}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Регистрирует функцию как задачу; аргументы должны быть JSON."""
+    def decorator(func):
+        task_name = name or f'{func.__module__}.{func.__name__}'
+        registry[task_name] = (func, max_attempts)
+
+        def enqueue_task(*args, **options):
+            return enqueue(task_name, args, **options)
+        func.task_name = task_name
+        func.enqueue = enqueue_task
+        return func
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def periodic(every, **options):
+    """Задача без аргументов, которая запускается каждые every."""
+    def decorator(func):
+        func = task(**options)(func)
+        schedule[func.task_name] = int(every.total_seconds())
+        return func
+    return decorator
+
+
+def enqueue(name, args=(), dedup_key=None, run_at=None, delay=None):
+    """Ставит задачу в очередь.
+
+    Возвращает False, если задача с тем же dedup_key уже ждет запуска.
+    В режиме TASKS_EAGER задача выполняется сразу.
+    """
+    func, max_attempts = registry[name]
+    if settings.TASKS_EAGER:
+        func(*args)
+        return True
+    if run_at is None:
+        run_at = timezone.now()
+    if delay is not None:
+        run_at += delay
+    new_task = Task(
+        name=name,
+        args=json.dumps(list(args)),
+        dedup_key=dedup_key,
+        run_at=run_at,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+    )
+    try:
+        with transaction.atomic():
+            new_task.save()
+    except IntegrityError:
+        return False
+    return True
+
+
+def schedule_periodic(now=None):
+    """Ставит периодические задачи на следующий слот расписания."""
+    now = now or timezone.now()
+    timestamp = int(now.timestamp())
+    for name, every in schedule.items():
+        slot = (timestamp // every + 1) * every
+        enqueue(
+            name,
+            dedup_key=f'periodic:{name}',
+            run_at=now + timedelta(seconds=slot - timestamp),
+        )
+
+
+def _requeue(task_pk, run_at, **changes):
+    """Возвращает задачу в очередь.
+
+    Если за это время поставили такую же задачу, повтор не нужен:
+    эту помечаем упавшей, работу сделает новая.
+    """
+    try:
+        with transaction.atomic():
+            Task.objects.filter(pk=task_pk).update(
+                state=Task.PENDING, run_at=run_at, locked_by='', **changes
+            )
+    except IntegrityError:
+        Task.objects.filter(pk=task_pk).update(
+            state=Task.FAILED, finished_at=timezone.now(), locked_by='',
+            **changes
+        )
+
+
+def release_stale(now=None):
+    """Возвращает в очередь задачи, чей воркер пропал.
+
+    Такая попытка считается неудачной, чтобы задача, которая роняет
+    воркер, не перезапускалась вечно.
+    """
+    now = now or timezone.now()
+    stale = Task.objects.filter(
+        state=Task.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.TASK_TIMEOUT),
+    )
+    for task in stale:
+        finish(task, TimeoutError('Воркер не завершил задачу вовремя.'))
+    return len(stale)
+
+
+def claim(limit, now=None):
+    """Забирает до limit готовых задач одним UPDATE.
+
+    Конкурирующие воркеры не получат одну задачу дважды: строка
+    меняет состояние атомарно, а повторная проверка state
+    отсекает уже взятые.
+    """
+    now = now or timezone.now()
+    token = uuid4().hex
+    ready = Task.objects.filter(
+        state=Task.PENDING, run_at__lte=now
+    ).order_by('run_at').values('pk')[:limit]
+    Task.objects.filter(pk__in=ready, state=Task.PENDING).update(
+        state=Task.RUNNING, locked_by=token, locked_at=now,
+    )
+    return list(Task.objects.filter(locked_by=token, state=Task.RUNNING))
+
+
+def execute(name, args):
+    """Выполняет задачу по имени и аргументам в JSON."""
+    func, _ = registry[name]
+    func(*json.loads(args))
+
+
+def execute_in_pool(name, args):
+    """То же в потоке или процессе пула: соединения с базой не копятся."""
+    try:
+        execute(name, args)
+    finally:
+        connections.close_all()
+
+
+def backoff(attempts):
+    """Задержка перед следующей попыткой: 1, 2, 4... интервала."""
+    return min(
+        settings.TASK_RETRY_BACKOFF * 2 ** (attempts - 1),
+        settings.TASK_RETRY_BACKOFF_MAX,
+    )
+
+
+def finish(task, error=None):
+    """Записывает результат попытки."""
+    now = timezone.now()
+    attempts = task.attempts + 1
+    if error is None:
+        Task.objects.filter(pk=task.pk).update(
+            state=Task.DONE, finished_at=now, attempts=attempts, locked_by=''
+        )
+        return
+    logger.warning(
+        'Задача %s #%s упала (попытка %s)', task.name, task.pk, attempts
+    )
+    last_error = ''.join(traceback.format_exception(
+        type(error), error, error.__traceback__
+    ))
+    if attempts < task.max_attempts:
+        _requeue(
+            task.pk,
+            now + timedelta(seconds=backoff(attempts)),
+            attempts=attempts,
+            last_error=last_error,
+        )
+    else:
+        Task.objects.filter(pk=task.pk).update(
+            state=Task.FAILED, finished_at=now, attempts=attempts,
+            locked_by='', last_error=last_error,
+        )
+
+
+@periodic(every=timedelta(days=1))
+def delete_finished_tasks():
+    """Удаляет старые выполненные задачи."""
+    Task.objects.filter(
+        state=Task.DONE,
+        finished_at__lt=timezone.now() - timedelta(
+            days=settings.TASKS_KEEP_DONE_DAYS
+        ),
+    ).delete()
@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+from multiprocessing import get_context
+from os import path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from ..cache import CULL_CHECK_INTERVAL, SQLiteCache
+
+
+def incr_many(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr('hits')
+
+
+class TestCacheTest(SimpleTestCase):
+    """Тесты не трогают кеш сервера."""
+    def test_tests_use_own_cache(self):
+        """Кеш тестов — в памяти процесса, не в файле BASE_DIR."""
+        self.assertTrue(settings.TESTING)
+        self.assertNotIsInstance(cache, SQLiteCache)
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    """Тестирование общего кеша на SQLite."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_get_set_many(self):
+        """set_many и get_many возвращают только живые ключи."""
+        self.cache.set_many({'a': 1, 'b': [2]})
+        self.cache.set('gone', 3, timeout=-1)
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'gone', 'missing']),
+            {'a': 1, 'b': [2]},
+        )
+
+    def test_add_and_incr(self):
+        """add не перезаписывает ключ, incr требует существующий."""
+        self.assertTrue(self.cache.add('key', 1))
+        self.assertFalse(self.cache.add('key', 2))
+        self.assertEqual(self.cache.incr('key', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic_between_processes(self):
+        """Параллельные incr из разных процессов не теряются."""
+        self.cache.set('hits', 0)
+        context = get_context('fork')
+        workers = [
+            context.Process(target=incr_many, args=(self.location, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('hits'), 200)
+
+    def test_lru_eviction(self):
+        """Вытесняются давно не читанные ключи."""
+        cache = SQLiteCache(
+            self.location, {'OPTIONS': {'MAX_ENTRIES': 10}}
+        )
+        cache.set('kept', 1)
+        cache._db.execute('UPDATE cache SET accessed = 1e12')
+        for i in range(CULL_CHECK_INTERVAL - 1):
+            cache.set(f'key{i}', i)
+        self.assertEqual(cache.get('kept'), 1)
+        self.assertLessEqual(
+            cache._db.execute('SELECT COUNT(*) FROM cache').fetchone()[0],
+            10,
+        )
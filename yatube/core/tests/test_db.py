@@ -0,0 +1,110 @@
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+
+from ..db.base import WriteQueue
+
+User = get_user_model()
+
+
+class WriteQueueTest(SimpleTestCase):
+    """Тестирование очереди на запись."""
+
+    def test_fifo(self):
+        """Потоки получают очередь в порядке прихода."""
+        queue = WriteQueue()
+        queue.acquire(1)
+        order = []
+
+        def write(number):
+            queue.acquire(5)
+            order.append(number)
+            queue.release()
+
+        threads = []
+        for number in range(5):
+            thread = threading.Thread(target=write, args=(number,))
+            thread.start()
+            threads.append(thread)
+            # Следующий поток встает в очередь после предыдущего.
+            while len(queue._waiting) <= number:
+                time.sleep(0.001)
+        queue.release()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(order, list(range(5)))
+
+    def test_timeout(self):
+        """Не дождавшись очереди, запись падает с OperationalError."""
+        queue = WriteQueue()
+        queue.acquire(1)
+        with self.assertRaises(OperationalError):
+            queue.acquire(0.01)
+        self.assertFalse(queue._waiting)
+        queue.release()
+        queue.acquire(0.01)
+
+
+class SQLiteProfileTest(TestCase):
+    """Тестирование настроек SQLite."""
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas(self):
+        """PRAGMA из OPTIONS выполнены на соединении."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+
+class AtomicWriteQueueTest(TransactionTestCase):
+    """Тестирование очереди на запись в транзакциях."""
+
+    def write_in_thread(self):
+        """Ошибки записи из другого потока."""
+        errors = []
+
+        def write():
+            try:
+                User.objects.create(username=f'user{len(errors)}')
+            except OperationalError as error:
+                errors.append(error)
+            finally:
+                connections.close_all()
+
+        options = connections.databases['default']['OPTIONS']
+        with mock.patch.dict(options, write_timeout=0.05):
+            thread = threading.Thread(target=write)
+            thread.start()
+            thread.join()
+        return errors
+
+    def test_atomic_holds_queue_until_commit(self):
+        """atomic() держит очередь до конца, даже если только читает."""
+        with transaction.atomic():
+            list(User.objects.all())
+            self.assertTrue(connection.holds_write_queue)
+            self.assertEqual(len(self.write_in_thread()), 1)
+        self.assertFalse(connection.holds_write_queue)
+        self.assertEqual(self.write_in_thread(), [])
+        self.assertEqual(User.objects.count(), 1)
+
+
+class SQLiteMaintenanceTest(TransactionTestCase):
+    """Тестирование обслуживания базы (вне транзакции теста)."""
+
+    def test_maintenance(self):
+        """Команда обслуживания отчитывается о каждом шаге."""
+        out = StringIO()
+        call_command('sqlite_maintenance', stdout=out)
+        self.assertIn('ANALYZE', out.getvalue())
+        self.assertIn('checkpoint TRUNCATE', out.getvalue())
@@ -0,0 +1,192 @@
+import shutil
+import tempfile
+import threading
+from multiprocessing import get_context
+from os import path
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.constants import INDEX_PAGE_CACHE
+from posts.models import Post
+
+from .. import metrics
+
+User = get_user_model()
+TEST_COUNTER = metrics.Counter(
+    'yatube_test_events_total', 'Счетчик для тестов.', labels=('source',)
+)
+
+
+def count_events(times):
+    for _ in range(times):
+        TEST_COUNTER.inc('process')
+    metrics.flush()
+
+
+class MetricsTest(TestCase):
+    """Тестирование метрик Prometheus."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(
+            METRICS_PATH=path.join(self.directory, 'metrics.sqlite3')
+        )
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_tests_use_own_file(self):
+        """Без override_settings тесты пишут итоги не в файл сервера."""
+        self.settings.disable()
+        try:
+            self.assertFalse(
+                settings.METRICS_PATH.startswith(settings.BASE_DIR)
+            )
+        finally:
+            self.settings.enable()
+
+    def test_processes_and_threads(self):
+        """Итоги складываются по всем процессам и потокам."""
+        before = metrics.collect().get(
+            ('yatube_test_events_total', ('thread',)), 0
+        )
+        threads = [
+            threading.Thread(target=lambda: [
+                TEST_COUNTER.inc('thread') for _ in range(100)
+            ])
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        context = get_context('fork')
+        processes = [
+            context.Process(target=count_events, args=(50,))
+            for _ in range(3)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        totals = metrics.collect()
+        self.assertEqual(
+            totals[('yatube_test_events_total', ('thread',))] - before, 400
+        )
+        self.assertEqual(
+            totals[('yatube_test_events_total', ('process',))], 150
+        )
+
+    def test_dead_processes_retired(self):
+        """Строки завершившихся процессов складываются в одну."""
+        context = get_context('fork')
+        for _ in range(3):
+            process = context.Process(target=count_events, args=(10,))
+            process.start()
+            process.join()
+        key = ('yatube_test_events_total', ('process',))
+        self.assertEqual(metrics.collect()[key], 30)
+        self.assertEqual(metrics.collect()[key], 30)
+        db = metrics._connect()
+        try:
+            processes = {
+                process for process, in db.execute(
+                    'SELECT DISTINCT process FROM metrics'
+                )
+            }
+        finally:
+            db.close()
+        processes.discard(metrics._state.process)
+        self.assertEqual(processes, {metrics.RETIRED})
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    def test_flush_in_background(self):
+        """Запись метрики не пишет в файл: итоги сбрасывает фоновый поток."""
+        writers = []
+        flush = metrics.flush
+
+        def record():
+            writers.append(threading.current_thread())
+            flush()
+
+        with mock.patch.object(metrics, 'flush', side_effect=record):
+            TEST_COUNTER.inc('background')
+            self.assertTrue(metrics._state.flusher.is_alive())
+        self.assertNotIn(threading.current_thread(), writers)
+
+    def test_endpoint_staff_only(self):
+        """/metrics отдается только сотруднику."""
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_endpoint(self):
+        """/metrics отдает время ответа видов и попадания в кеш."""
+        before = metrics.collect()
+        for _ in range(2):
+            self.client.get(reverse('posts:index'))
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        text = response.content.decode()
+        self.assertIn(
+            '# TYPE yatube_request_duration_seconds histogram', text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="index",le="+Inf"}', text
+        )
+        totals = metrics.collect()
+
+        def added(name, *labels):
+            key = (name, labels)
+            value = totals.get(key, 0)
+            if isinstance(value, list):
+                return value[-1] - (before.get(key) or [0])[-1]
+            return value - before.get(key, 0)
+
+        self.assertEqual(
+            added('yatube_request_duration_seconds', 'index'), 2
+        )
+        self.assertEqual(added(
+            'yatube_cache_requests_total', INDEX_PAGE_CACHE, 'miss'
+        ), 1)
+        self.assertEqual(added(
+            'yatube_cache_requests_total', INDEX_PAGE_CACHE, 'hit'
+        ), 1)
+        self.assertGreater(added('yatube_db_query_duration_seconds'), 0)
+
+    def test_histogram_samples(self):
+        """Корзины гистограммы накопительные."""
+        histogram = metrics.Histogram(
+            'yatube_test_seconds', 'Гистограмма для тестов.',
+            buckets=(1, 2),
+        )
+        self.assertEqual(
+            list(histogram.samples((), [1, 2, 3, 10.5, 6])),
+            [
+                ('yatube_test_seconds_bucket', (('le', 1),), 1),
+                ('yatube_test_seconds_bucket', (('le', 2),), 3),
+                ('yatube_test_seconds_bucket', (('le', '+Inf'),), 6),
+                ('yatube_test_seconds_sum', (), 10.5),
+                ('yatube_test_seconds_count', (), 6),
+            ],
+        )
@@ -0,0 +1,118 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from os import path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts import trending
+from posts.models import Comment, Post
+
+from .. import replicas
+from ..models import ReplicaHeartbeat
+from ..query_budget import (
+    QueryBudget, QueryBudgetExceeded, assert_within_budget
+)
+
+User = get_user_model()
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica'], REPLICA_LAG_CHECK_INTERVAL=0
+)
+class ReplicaTest(TransactionTestCase):
+    """Тестирование чтения из реплики на втором файле SQLite."""
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        connections.databases['replica'] = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': path.join(cls.directory, 'replica.sqlite3'),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections['replica'].close()
+        del connections.databases['replica']
+        delattr(connections._connections, 'replica')
+        shutil.rmtree(cls.directory, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='author')
+        self.post = Post.objects.create(author=self.user, text='Старый')
+        call_command('sync_replica', stdout=StringIO())
+        self.unsynced = Post.objects.create(author=self.user, text='Новый')
+
+    def detail(self, post):
+        return self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        ).status_code
+
+    def test_sync_and_lag(self):
+        """Копия содержит данные default и отметку времени."""
+        self.assertEqual(Post.objects.using('replica').count(), 1)
+        self.assertLess(replicas.lag('replica'), 5)
+        self.assertEqual(replicas.fresh_replicas(), ['replica'])
+        ReplicaHeartbeat.objects.using('replica').update(
+            time=timezone.now() - timedelta(minutes=1)
+        )
+        self.assertGreaterEqual(replicas.lag('replica'), 60)
+        self.assertEqual(replicas.fresh_replicas(), [])
+
+    def test_reads_from_replica(self):
+        """Вид читает из реплики, а отставшую пропускает."""
+        self.assertEqual(self.detail(self.post), 200)
+        self.assertEqual(self.detail(self.unsynced), 404)
+        with override_settings(REPLICA_MAX_LAG=-1):
+            self.assertEqual(self.detail(self.unsynced), 200)
+
+    @override_settings(REPLICA_LAG_CHECK_INTERVAL=60)
+    def test_budget_counts_replica_queries(self):
+        """Бюджет вида считает и запросы к реплике."""
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        # Отставание проверяется раз в интервал, а не в каждом виде.
+        replicas._lags.clear()
+        replicas.fresh_replicas()
+        with QueryBudget(100) as budget:
+            response = assert_within_budget(self.client, url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {query['using'] for query in budget.queries}, {'replica'}
+        )
+        with self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(0):
+                Post.objects.using('replica').count()
+
+    def test_popular_board_built_from_default(self):
+        """Доска популярных строится по default, а не по реплике."""
+        Comment.objects.create(
+            post=self.unsynced, author=self.user, text='Комментарий'
+        )
+        cache.clear()
+        self.assertEqual(
+            self.client.get(reverse('posts:popular')).status_code, 200
+        )
+        self.assertIn(self.unsynced.pk, trending.leaderboard().ids)
+
+    def test_read_your_writes(self):
+        """После записи клиент читает из default."""
+        self.client.force_login(self.user)
+        self.assertEqual(self.detail(self.unsynced), 404)
+        response = self.client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'},
+        )
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.detail(self.unsynced), 200)
@@ -0,0 +1,133 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from posts.models import FeedEntry, Follow, Post
+
+from .. import tasks
+from ..models import Task
+
+User = get_user_model()
+calls = []
+
+
+@tasks.task(name='test.record')
+def record(value):
+    calls.append(value)
+
+
+@tasks.task(name='test.broken', max_attempts=2)
+def broken():
+    raise RuntimeError('сломалась')
+
+
+class TaskQueueTest(TestCase):
+    """Тестирование очереди фоновых задач."""
+    def setUp(self):
+        calls.clear()
+
+    def run_worker(self):
+        call_command('run_tasks', once=True, pool='sync')
+
+    def test_enqueue_and_run(self):
+        """Воркер выполняет задачу и помечает ее выполненной."""
+        record.enqueue(1)
+        self.run_worker()
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get(name='test.record').state, Task.DONE)
+
+    def test_dedup_key(self):
+        """Вторая задача с тем же ключом не ставится, пока первая ждет."""
+        self.assertTrue(record.enqueue(1, dedup_key='one'))
+        self.assertFalse(record.enqueue(2, dedup_key='one'))
+        self.run_worker()
+        self.assertEqual(calls, [1])
+        self.assertTrue(record.enqueue(3, dedup_key='one'))
+
+    def test_delayed_task_waits(self):
+        """Задача с задержкой не выполняется раньше срока."""
+        record.enqueue(1, delay=timedelta(hours=1))
+        self.run_worker()
+        self.assertEqual(calls, [])
+
+    @override_settings(TASK_RETRY_BACKOFF=10)
+    def test_retry_with_backoff_then_fail(self):
+        """Упавшая задача повторяется с задержкой, затем помечается упавшей."""
+        broken.enqueue()
+        self.run_worker()
+        task = Task.objects.get(name='test.broken')
+        self.assertEqual(task.state, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+        self.assertIn('сломалась', task.last_error)
+        self.assertGreater(task.run_at, timezone.now() + timedelta(seconds=5))
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        self.run_worker()
+        task.refresh_from_db()
+        self.assertEqual(task.state, Task.FAILED)
+        self.assertEqual(task.attempts, 2)
+
+    @override_settings(TASK_RETRY_BACKOFF=10, TASK_RETRY_BACKOFF_MAX=30)
+    def test_backoff_is_capped(self):
+        self.assertEqual(
+            [tasks.backoff(attempt) for attempt in range(1, 5)],
+            [10, 20, 30, 30],
+        )
+
+    def test_claim_is_exclusive(self):
+        """Взятую задачу не получит второй воркер."""
+        record.enqueue(1)
+        self.assertEqual(len(tasks.claim(10)), 1)
+        self.assertEqual(tasks.claim(10), [])
+
+    @override_settings(TASK_TIMEOUT=60)
+    def test_release_stale(self):
+        """Задача брошенного воркера возвращается в очередь."""
+        record.enqueue(1)
+        tasks.claim(1)
+        later = timezone.now() + timedelta(minutes=5)
+        self.assertEqual(tasks.release_stale(later), 1)
+        task = Task.objects.get(name='test.record')
+        self.assertEqual(task.state, Task.PENDING)
+        self.assertEqual(task.attempts, 1)
+
+    def test_periodic_scheduled_once(self):
+        """Периодическая задача ставится на следующий слот один раз."""
+        now = timezone.now()
+        tasks.schedule_periodic(now)
+        tasks.schedule_periodic(now)
+        periodic = Task.objects.filter(
+            dedup_key=f'periodic:{tasks.delete_finished_tasks.task_name}'
+        )
+        self.assertEqual(periodic.count(), 1)
+        self.assertGreater(periodic.get().run_at, now)
+        self.assertLessEqual(periodic.get().run_at, now + timedelta(days=1))
+
+    @override_settings(TASKS_EAGER=True)
+    def test_eager(self):
+        """В режиме TASKS_EAGER задача выполняется сразу."""
+        record.enqueue(1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Task.objects.exists())
+
+
+class PostTasksTest(TestCase):
+    """Тестирование задач постов."""
+    @override_settings(FEED_FANOUT_INLINE_FOLLOWERS=1)
+    def test_large_fan_out_is_queued(self):
+        """Посты автора с многими подписчиками раскладываются воркером."""
+        author = User.objects.create_user(username='author')
+        for number in range(2):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'reader{number}'),
+                author=author,
+            )
+        post = Post.objects.create(text='Пост', author=author)
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertTrue(
+            Task.objects.filter(dedup_key=f'fan_out:{post.pk}').exists()
+        )
+        call_command('run_tasks', once=True, pool='sync')
+        self.assertEqual(FeedEntry.objects.filter(post=post).count(), 2)
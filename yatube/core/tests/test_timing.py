@@ -0,0 +1,67 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import timing
+
+User = get_user_model()
+
+
+class TimingMiddlewareTest(TestCase):
+    """Тестирование замера времени запросов."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.create(author=cls.user, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        timing.clear()
+
+    def test_records_request(self):
+        """Запрос попадает в буфер и заголовок Server-Timing."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        header = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', 'tpl;dur=', 'cache;dur='):
+            self.assertIn(metric, header)
+        record, = timing.recent()
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['db_queries'], len(queries))
+        self.assertIn('posts/index.html', record['templates'])
+        self.assertIn('posts/includes/paginator.html', record['templates'])
+        self.assertLessEqual(record['template_ms'], record['total_ms'])
+        self.assertGreater(record['cache_misses'], 0)
+
+        self.client.get(reverse('posts:index'))
+        self.assertGreater(timing.recent()[-1]['cache_hits'], 0)
+
+    @override_settings(TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        """Незамеряемый запрос не оставляет следов."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(timing.recent(), [])
+
+    def test_timing_log(self):
+        """Буфер скачивает только сотрудник."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('timing_log'))
+        self.assertEqual(response.status_code, 302)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('timing_log'))
+        self.assertEqual(response.status_code, 200)
+        paths = [
+            json.loads(line)['path']
+            for line in response.content.decode().splitlines()
+        ]
+        self.assertEqual(paths[0], reverse('posts:index'))
@@ -0,0 +1,220 @@
+"""Замер времени запросов в бою.
+
+TimingMiddleware записывает для доли запросов (TIMING_SAMPLE_RATE)
+общее время, время и число SQL-запросов, время отрисовки каждого
+шаблона и подключаемого шаблона, попадания и промахи кеша. Итог
+уходит в заголовок Server-Timing и в кольцевой буфер последних
+запросов процесса, который сотрудник скачивает как JSONL.
+
+SQL, шаблоны и кеш замеряются обертками, которые ставятся один раз
+при создании middleware и соединения с базой; вне замеряемого запроса
+они сразу вызывают исходный метод. В буфер кладутся сами замеры,
+а в словари они превращаются только при скачивании.
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+_local = threading.local()
+_buffer = deque(maxlen=settings.TIMING_BUFFER_SIZE)
+_installed = set()
+
+
+class Timing:
+    """Замеры одного запроса."""
+
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.path
+        self.started = time.time()
+        self.total = 0.0
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.template_time = 0.0
+        # Имя шаблона -> [сколько раз отрисован, секунд всего].
+        self.templates = {}
+        self.template_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_time = 0.0
+        self.cache_depth = 0
+        self.view = None
+        self.status = None
+
+    def as_dict(self):
+        return {
+            'time': self.started,
+            'method': self.method,
+            'path': self.path,
+            'view': self.view,
+            'status': self.status,
+            'total_ms': round(self.total * 1000, 3),
+            'db_ms': round(self.db_time * 1000, 3),
+            'db_queries': self.db_queries,
+            'template_ms': round(self.template_time * 1000, 3),
+            'templates': {
+                name: {'count': count, 'ms': round(seconds * 1000, 3)}
+                for name, (count, seconds) in self.templates.items()
+            },
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'cache_ms': round(self.cache_time * 1000, 3),
+        }
+
+    def server_timing(self):
+        return ', '.join((
+            f'total;dur={self.total * 1000:.1f}',
+            f'db;dur={self.db_time * 1000:.1f};'
+            f'desc="{self.db_queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;dur={self.cache_time * 1000:.1f};'
+            f'desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+        ))
+
+
+def current():
+    """Замеры текущего запроса или None, если он не замеряется."""
+    return getattr(_local, 'timing', None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timing = current()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db_time += time.perf_counter() - start
+        timing.db_queries += 1
+
+
+def _add_execute_wrapper(connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        timing = current()
+        if timing is None:
+            return render(self, context)
+        timing.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            timing.template_depth -= 1
+            # Время подключаемых шаблонов входит во время внешнего,
+            # поэтому в сумму идут только шаблоны верхнего уровня.
+            if not timing.template_depth:
+                timing.template_time += elapsed
+            stats = timing.templates.setdefault(
+                self.name or '<string>', [0, 0.0]
+            )
+            stats[0] += 1
+            stats[1] += elapsed
+    return wrapper
+
+
+def _timed_get(get, many):
+    @wraps(get)
+    def wrapper(self, keys, *args, **kwargs):
+        timing = current()
+        # Вложенные вызовы (get_many через get) считаются один раз.
+        if timing is None or timing.cache_depth:
+            return get(self, keys, *args, **kwargs)
+        if many:
+            keys = list(keys)
+        timing.cache_depth += 1
+        start = time.perf_counter()
+        try:
+            result = get(self, keys, *args, **kwargs)
+        finally:
+            timing.cache_time += time.perf_counter() - start
+            timing.cache_depth -= 1
+        if many:
+            timing.cache_hits += len(result)
+            timing.cache_misses += len(keys) - len(result)
+        elif args or 'default' in kwargs:
+            # С явным default промах не отличить от значения.
+            timing.cache_hits += 1
+        elif result is None:
+            timing.cache_misses += 1
+        else:
+            timing.cache_hits += 1
+        return result
+    return wrapper
+
+
+def install():
+    """Ставит обертки на SQL, шаблоны и классы настроенных кешей."""
+    # Соединения других потоков получат обертку при подключении.
+    connection_created.connect(_add_execute_wrapper)
+    for connection in connections.all():
+        _add_execute_wrapper(connection)
+    targets = [(Template, '_render', _timed_render)]
+    for alias in settings.CACHES:
+        backend = type(caches[alias])
+        targets += [
+            (backend, 'get', lambda get: _timed_get(get, many=False)),
+            (backend, 'get_many', lambda get: _timed_get(get, many=True)),
+        ]
+    for owner, name, wrap in targets:
+        if (owner, name) not in _installed:
+            setattr(owner, name, wrap(getattr(owner, name)))
+            _installed.add((owner, name))
+
+
+def recent():
+    """Записи кольцевого буфера, от старых к новым."""
+    return [timing.as_dict() for timing in list(_buffer)]
+
+
+def recent_jsonl():
+    return ''.join(
+        json.dumps(record, ensure_ascii=False) + '\n' for record in recent()
+    )
+
+
+def clear():
+    _buffer.clear()
+
+
+class TimingMiddleware:
+    """Замеряет долю запросов; ставится первым в MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install()
+
+    def __call__(self, request):
+        rate = settings.TIMING_SAMPLE_RATE
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+        timing = Timing(request)
+        _local.timing = timing
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.timing = None
+        timing.total = time.perf_counter() - start
+        match = request.resolver_match
+        timing.view = match.view_name if match else None
+        timing.status = response.status_code
+        _buffer.append(timing)
+        if settings.TIMING_SERVER_TIMING_HEADER:
+            response['Server-Timing'] = timing.server_timing()
+        return response
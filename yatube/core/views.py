@@ -1,4 +1,9 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from . import metrics, timing
 
 
 def page_not_found(request, exception):
@@ -9,3 +14,22 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+@staff_member_required
+@require_safe
+def timing_log(request):
+    """Последние замеры запросов этого процесса в JSONL."""
+    response = HttpResponse(
+        timing.recent_jsonl(),
+        content_type='application/x-ndjson; charset=utf-8',
+    )
+    response['Content-Disposition'] = 'attachment; filename="timing.jsonl"'
+    return response
+
+
+@staff_member_required
+@require_safe
+def prometheus_metrics(request):
+    """Метрики всех процессов сервера для Prometheus."""
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
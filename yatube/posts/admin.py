@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
+from . import search
 from .models import Comment, Follow, Group, Post
 
 
@@ -18,6 +20,16 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по полнотекстовому индексу вместо LIKE '%...%'."""
+        if not search_term.strip():
+            return queryset, False
+        if search.match_query(search_term) is None:
+            return queryset.none(), False
+        return queryset.filter(
+            pk__in=RawSQL(*search.matching_ids_sql(search_term))
+        ), False
+
 
 admin.site.register(Group)
 admin.site.register(Comment)
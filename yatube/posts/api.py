@@ -0,0 +1,209 @@
+"""JSON API только для чтения: ленты, посты и комментарии.
+
+Ответы собираются из values() без создания объектов моделей.
+Клиент выбирает поля через ?fields=, листает ленты курсором
+?after= и получает 304 по ETag, если данные не изменились.
+"""
+from functools import wraps
+
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_safe
+
+from core.query_budget import query_budget
+from core.replicas import read_from_replica
+
+from . import conditional
+from .conditional import versioned
+from .constants import COMMENTS_PER_PAGE, NUMBER_OF_POSTS
+from .models import Comment, Group, Post, User
+from .utils import CursorPaginator, encode_cursor
+
+# Поле ответа -> поле для values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post_id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+
+class FieldsError(ValueError):
+    """Клиент запросил поле, которого нет в ответе."""
+
+
+class ValuesCursorPaginator(CursorPaginator):
+    """Курсорная пагинация строк values() вместо объектов."""
+
+    def _key(self, row):
+        return encode_cursor(row[self.date_field], row['id'])
+
+
+class CommentCursorPaginator(ValuesCursorPaginator):
+    """То же для комментариев, ключ (created, id)."""
+    date_field = 'created'
+
+
+def _fields(request, available):
+    """Поля из ?fields=; без параметра — все."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown or not fields:
+        raise FieldsError(
+            'Неизвестные поля: {}. Доступны: {}.'.format(
+                ', '.join(unknown) or '-', ', '.join(available)
+            )
+        )
+    return fields
+
+
+def _project(rows, fields, available):
+    """Переименовывает колонки values() в поля ответа."""
+    result = []
+    for row in rows:
+        item = {name: row[available[name]] for name in fields}
+        if 'image' in item:
+            item['image'] = (
+                default_storage.url(item['image']) if item['image'] else None
+            )
+        result.append(item)
+    return result
+
+
+def _json(data, status=200):
+    """JSON-ответ; ETag ставит versioned по версиям данных."""
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False},
+    )
+
+
+def _next_url(request, cursor):
+    if cursor is None:
+        return None
+    params = request.GET.copy()
+    params['after'] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def _cursor_list(request, queryset, available, paginator_class, per_page):
+    """Страница ленты в виде {'results': [...], 'next': url}."""
+    try:
+        fields = _fields(request, available)
+    except FieldsError as error:
+        return _json({'error': str(error)}, status=400)
+    paginator = paginator_class(
+        queryset.values(
+            *{available[name] for name in fields},
+            'id', paginator_class.date_field,
+        ),
+        per_page,
+    )
+    page = paginator.cursor_page(after=request.GET.get('after'))
+    return _json({
+        'results': _project(page, fields, available),
+        'next': _next_url(request, page.next_cursor),
+    })
+
+
+def _pk_or_404(request, model, **filters):
+    pk = conditional.lookup(request, model, **filters)
+    if pk is None:
+        raise Http404
+    return pk
+
+
+def api_view(view):
+    """Только GET/HEAD, ответ сжимается gzip, 404 тоже в JSON."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except Http404:
+            return _json({'error': 'Не найдено.'}, status=404)
+    return gzip_page(require_safe(wrapper))
+
+
+@query_budget(3)
+@read_from_replica
+@api_view
+@versioned(conditional.index_scopes)
+def index(request):
+    """Лента всех постов."""
+    return _cursor_list(
+        request, Post.objects.all(), POST_FIELDS,
+        ValuesCursorPaginator, NUMBER_OF_POSTS,
+    )
+
+
+@query_budget(4)
+@read_from_replica
+@api_view
+@versioned(conditional.group_posts_scopes)
+def group_posts(request, slug):
+    """Лента постов группы."""
+    group_id = _pk_or_404(request, Group, slug=slug)
+    return _cursor_list(
+        request, Post.objects.filter(group_id=group_id), POST_FIELDS,
+        ValuesCursorPaginator, NUMBER_OF_POSTS,
+    )
+
+
+@query_budget(4)
+@read_from_replica
+@api_view
+@versioned(conditional.profile_scopes)
+def profile(request, username):
+    """Лента постов автора."""
+    author_id = _pk_or_404(request, User, username=username)
+    return _cursor_list(
+        request, Post.objects.filter(author_id=author_id), POST_FIELDS,
+        ValuesCursorPaginator, NUMBER_OF_POSTS,
+    )
+
+
+@query_budget(4)
+@read_from_replica
+@api_view
+@versioned(conditional.post_detail_scopes)
+def post_detail(request, post_id):
+    """Один пост."""
+    try:
+        fields = _fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return _json({'error': str(error)}, status=400)
+    rows = Post.objects.filter(pk=post_id).values(
+        *{POST_FIELDS[name] for name in fields}
+    )
+    if not rows:
+        raise Http404
+    return _json(_project(rows, fields, POST_FIELDS)[0])
+
+
+@query_budget(4)
+@read_from_replica
+@api_view
+@versioned(conditional.post_comments_scopes)
+def post_comments(request, post_id):
+    """Комментарии поста, от новых к старым."""
+    post_id = _pk_or_404(request, Post, pk=post_id)
+    return _cursor_list(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        CommentCursorPaginator, COMMENTS_PER_PAGE,
+    )
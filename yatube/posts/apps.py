@@ -5,3 +5,6 @@ class PostsConfig(AppConfig):
     """Настройки приложения."""
     name = 'posts'
     verbose_name = 'Посты'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,63 @@
+"""Кеш отрисованных карточек постов.
+
+Версия карточки — отпечаток всех полей, которые она показывает:
+текст, дата, картинка, имя автора и группа. Правка поста,
+переименование автора или группы меняют отпечаток, поэтому
+устаревшие карточки просто перестают читаться и истекают сами.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import metrics
+
+from .thumbnails import preload
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+# Увеличить при изменении шаблона карточки.
+CARD_TEMPLATE_VERSION = 1
+
+
+def card_version(post):
+    """Отпечаток данных, из которых строится карточка."""
+    author = post.author
+    group = post.group
+    parts = (
+        post.text,
+        post.pub_date.isoformat(),
+        post.image.name if post.image else '',
+        author.username,
+        author.get_full_name(),
+        group.slug if group else '',
+        group.title if group else '',
+    )
+    return md5('\x1f'.join(parts).encode()).hexdigest()
+
+
+def card_key(post, group_link):
+    return 'post_card:{}:{}:{}:{}'.format(
+        CARD_TEMPLATE_VERSION, post.pk, card_version(post), int(group_link)
+    )
+
+
+def render_cards(posts, group_link):
+    """Карточки страницы: одним get_many, отрисовываются только промахи."""
+    keys = {post.pk: card_key(post, group_link) for post in posts}
+    cached = cache.get_many(keys.values())
+    missed = [post for post in posts if keys[post.pk] not in cached]
+    metrics.cache_result(
+        'post_card', hits=len(posts) - len(missed), misses=len(missed)
+    )
+    preload(missed)
+    rendered = {}
+    for post in missed:
+        rendered[keys[post.pk]] = render_to_string(
+            CARD_TEMPLATE, {'post': post, 'group_link': group_link}
+        )
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+    cached.update(rendered)
+    return [mark_safe(cached[keys[post.pk]]) for post in posts]
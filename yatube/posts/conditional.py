@@ -0,0 +1,173 @@
+"""Условные GET-запросы (ETag и Last-Modified) для страниц постов.
+
+Изменение данных записывает в кеш новую версию затронутых областей:
+всей ленты, группы, автора, поста. Версия — время изменения
+в наносекундах. Вид перечисляет области, от которых зависит
+страница, и валидаторы считаются по их версиям одним чтением кеша.
+Если клиент прислал тот же ETag, ответ 304 отдается до запросов
+страницы и отрисовки шаблона.
+"""
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from core import metrics
+
+from .models import Group, Post, User
+
+VERSION_KEY = 'version:{}'
+# Все ленты: пост, группа или имя пользователя на любой странице.
+ALL = 'all'
+# Названия групп и имена пользователей видны на многих страницах.
+GROUPS = 'groups'
+USERS = 'users'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    """Посты, счетчики и подписчики автора."""
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    """Пост и его комментарии."""
+    return f'post:{post_id}'
+
+
+def follower_scope(user_id):
+    """Подписки пользователя, то есть состав его ленты."""
+    return f'follower:{user_id}'
+
+
+def bump(*scopes):
+    """Отмечает, что данные областей изменились сейчас."""
+    now = time.time_ns()
+    cache.set_many(
+        {VERSION_KEY.format(scope): now for scope in scopes if scope}, None
+    )
+
+
+def versions(scopes):
+    """Версии областей одним чтением кеша."""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    metrics.cache_result(
+        'conditional', hits=len(keys) - len(missing), misses=len(missing)
+    )
+    if missing:
+        # Версия пропала из кеша: считаем, что данные изменились сейчас,
+        # иначе старый ETag мог бы совпасть с новой версией.
+        now = time.time_ns()
+        for key in missing:
+            cache.add(key, now, None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def lookup(request, model, field='pk', **filters):
+    """Одно поле объекта или None; в пределах запроса — из памяти.
+
+    Виды ищут тот же объект, что и проверка версий, и не платят
+    за это вторым запросом.
+    """
+    key = (model, field, tuple(sorted(filters.items())))
+    found = request.__dict__.setdefault('_lookups', {})
+    if key not in found:
+        found[key] = model.objects.filter(**filters).values_list(
+            field, flat=True
+        ).first()
+    return found[key]
+
+
+def index_scopes(request):
+    return [ALL]
+
+
+def group_posts_scopes(request, slug):
+    group_id = lookup(request, Group, slug=slug)
+    if group_id is None:
+        return None
+    return [group_scope(group_id), USERS]
+
+
+def profile_scopes(request, username):
+    author_id = lookup(request, User, username=username)
+    if author_id is None:
+        return None
+    return [author_scope(author_id), GROUPS, USERS]
+
+
+def post_detail_scopes(request, post_id):
+    author_id = lookup(request, Post, 'author_id', pk=post_id)
+    if author_id is None:
+        return None
+    return [post_scope(post_id), author_scope(author_id), GROUPS, USERS]
+
+
+def post_comments_scopes(request, post_id):
+    return [post_scope(post_id), USERS]
+
+
+def follow_scopes(request):
+    return [ALL, follower_scope(request.user.pk)]
+
+
+def _set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+
+
+def versioned(scopes_func):
+    """Отдает 304, пока не изменились области scopes_func(request, ...).
+
+    scopes_func может вернуть None — тогда проверка пропускается,
+    например когда объекта нет и вид сам ответит 404.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            scopes = scopes_func(request, *args, **kwargs)
+            if scopes is None:
+                return view(request, *args, **kwargs)
+            stamps = versions(scopes)
+            # Страница зависит и от того, кто ее смотрит, и от токена CSRF
+            # в ее формах: вход заново меняет токен, старая копия с прежним
+            # токеном не должна получить 304.
+            raw = '|'.join((
+                request.get_full_path(),
+                str(request.user.pk),
+                request.META.get('CSRF_COOKIE', ''),
+                str(stamps),
+            ))
+            etag = quote_etag(md5(raw.encode()).hexdigest())
+            last_modified = max(stamps, default=0) // 10 ** 9
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                _set_validators(response, etag, last_modified)
+            else:
+                response = view(request, *args, **kwargs)
+                # Устаревшую копию из кеша страниц нельзя помечать
+                # свежим ETag: клиент держал бы ее до следующей правки.
+                if response.status_code == 200 and not getattr(
+                    response, 'stale', False
+                ):
+                    _set_validators(response, etag, last_modified)
+            if request.user.is_authenticated:
+                patch_cache_control(response, no_cache=True, private=True)
+            else:
+                patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
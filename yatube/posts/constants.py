@@ -1,3 +1,5 @@
 NUMBER_OF_POSTS = 10
 TEXT_LIM = 15
 TEST_POSTS = 15
+INDEX_PAGE_CACHE = 'index_page'
+COMMENTS_PER_PAGE = 20
@@ -0,0 +1,76 @@
+"""Денормализованные счетчики постов, подписок и комментариев.
+
+Счетчики меняются сигналами при создании и удалении объектов,
+поэтому шаблонам не нужны COUNT-запросы.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import Comment, Counter, Follow, Post
+
+AUTHOR_COUNTERS = {
+    Counter.AUTHOR_POSTS: 'posts',
+    Counter.AUTHOR_FOLLOWERS: 'followers',
+    Counter.AUTHOR_FOLLOWING: 'following',
+}
+
+# Имя счетчика: (модель, поле группировки) для пересчета с нуля.
+SOURCES = {
+    Counter.AUTHOR_POSTS: (Post, 'author'),
+    Counter.AUTHOR_FOLLOWERS: (Follow, 'author'),
+    Counter.AUTHOR_FOLLOWING: (Follow, 'user'),
+    Counter.POST_COMMENTS: (Comment, 'post'),
+    Counter.GROUP_POSTS: (Post, 'group'),
+}
+
+
+def incr(name, object_id, delta=1):
+    """Атомарно меняет счетчик, создавая его при необходимости."""
+    if object_id is None:
+        return
+    counters = Counter.objects.filter(name=name, object_id=object_id)
+    with transaction.atomic():
+        if counters.update(value=F('value') + delta):
+            return
+        try:
+            with transaction.atomic():
+                Counter.objects.create(
+                    name=name, object_id=object_id, value=max(delta, 0)
+                )
+        except IntegrityError:
+            counters.update(value=F('value') + delta)
+
+
+def reset(name, object_id):
+    """Удаляет счетчик объекта, которого больше нет."""
+    Counter.objects.filter(name=name, object_id=object_id).delete()
+
+
+def get(name, object_id):
+    """Значение одного счетчика."""
+    return Counter.objects.filter(
+        name=name, object_id=object_id
+    ).values_list('value', flat=True).first() or 0
+
+
+def for_author(author_id):
+    """Посты, подписчики и подписки автора одним запросом."""
+    values = dict.fromkeys(AUTHOR_COUNTERS.values(), 0)
+    rows = Counter.objects.filter(
+        name__in=AUTHOR_COUNTERS, object_id=author_id
+    ).values_list('name', 'value')
+    for name, value in rows:
+        values[AUTHOR_COUNTERS[name]] = value
+    return values
+
+
+def actual_counts(name, object_ids):
+    """Настоящие значения счетчика для пачки объектов."""
+    model, field = SOURCES[name]
+    counts = dict.fromkeys(object_ids, 0)
+    rows = model.objects.filter(
+        **{f'{field}__in': object_ids}
+    ).order_by().values(field).annotate(total=Count('pk'))
+    for row in rows:
+        counts[row[field]] = row['total']
+    return counts
@@ -0,0 +1,169 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост раскладывается в ленты подписчиков автора пачками.
+Посты популярных авторов в ленты не раскладываются: они
+подмешиваются к ленте при чтении. Когда автор перестает быть
+популярным, его посты раскладываются по лентам подписчиков
+(backfill_author), иначе написанное за это время пропало бы из лент.
+"""
+from heapq import merge
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from . import counters
+from .models import Counter, FeedEntry, Follow, Post
+from .utils import CursorPaginator
+
+
+def popular_author_ids(user):
+    """Популярные авторы, на которых подписан пользователь."""
+    return list(
+        Counter.objects.filter(
+            name=Counter.AUTHOR_FOLLOWERS,
+            object_id__in=Follow.objects.filter(user=user).values('author'),
+            value__gte=settings.FEED_POPULAR_AUTHOR_FOLLOWERS,
+        ).values_list('object_id', flat=True)
+    )
+
+
+def _bulk_insert(entries):
+    # Размер INSERT выбирает Django: Django 2.2 не уменьшает batch_size
+    # до лимитов SQLite, а FEED_FANOUT_BATCH_SIZE их превышает.
+    FeedEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def fan_out(post, followers_count=None):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    followers_count — уже прочитанный счетчик подписчиков, если есть.
+    """
+    if followers_count is None:
+        followers_count = counters.get(
+            Counter.AUTHOR_FOLLOWERS, post.author_id
+        )
+    if followers_count >= settings.FEED_POPULAR_AUTHOR_FOLLOWERS:
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(FeedEntry(
+            user_id=user_id,
+            post=post,
+            author_id=post.author_id,
+            pub_date=post.pub_date,
+        ))
+        if len(batch) >= settings.FEED_FANOUT_BATCH_SIZE:
+            _bulk_insert(batch)
+            batch = []
+    if batch:
+        _bulk_insert(batch)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту посты автора после подписки."""
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    batch = []
+    for post_id, pub_date in posts.iterator():
+        batch.append(FeedEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        ))
+        if len(batch) >= settings.FEED_FANOUT_BATCH_SIZE:
+            _bulk_insert(batch)
+            batch = []
+    if batch:
+        _bulk_insert(batch)
+
+
+def prune(user_id, author_id):
+    """Убирает посты автора из ленты после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _insert_from_follows(condition, params):
+    """Посты авторов по условию — в ленты их подписчиков, без дублей."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'INSERT INTO posts_feedentry (user_id, post_id, author_id, '
+            'pub_date) '
+            'SELECT follow.user_id, post.id, post.author_id, post.pub_date '
+            'FROM posts_follow follow '
+            'JOIN posts_post post ON post.author_id = follow.author_id '
+            f'WHERE {condition} '
+            'ON CONFLICT DO NOTHING',
+            params,
+        )
+        return cursor.rowcount
+
+
+def backfill_author(author_id):
+    """Раскладывает все посты автора по лентам его подписчиков."""
+    return _insert_from_follows('follow.author_id = %s', [author_id])
+
+
+def rebuild():
+    """Раскладывает по лентам все посты одним INSERT ... SELECT.
+
+    Нужно после массовой загрузки, которая обходит сигналы. Уже
+    разложенные посты пропускаются, популярные авторы — тоже.
+    """
+    return _insert_from_follows(
+        'follow.author_id NOT IN ('
+        '    SELECT object_id FROM posts_counter '
+        '    WHERE name = %s AND value >= %s'
+        ')',
+        [Counter.AUTHOR_FOLLOWERS, settings.FEED_POPULAR_AUTHOR_FOLLOWERS],
+    )
+
+
+class FeedPaginator(CursorPaginator):
+    """Курсорная пагинация ленты подписок.
+
+    Первая страница — один диапазонный запрос по индексу
+    (user, -pub_date, -post) плюс, если нужно, посты популярных авторов.
+    """
+
+    def __init__(self, user, per_page, **kwargs):
+        self.popular = popular_author_ids(user)
+        self.entries = FeedEntry.objects.filter(user=user).select_related(
+            'post__author', 'post__group'
+        ).order_by('-pub_date', '-post_id')
+        posts = Post.objects.filter(
+            Q(feed_entries__user=user) | Q(author__in=self.popular)
+        ).distinct().select_related('author', 'group')
+        super().__init__(posts, per_page, **kwargs)
+
+    def _rows(self, cursor, older, limit):
+        entries = self.entries
+        if cursor is not None:
+            entries = self._seek(
+                entries, cursor, older, pk_field='post_id'
+            )
+        if not older:
+            entries = entries.reverse()
+        if not self.popular:
+            return [entry.post for entry in entries[:limit]]
+        entries = entries.exclude(author__in=self.popular)
+        rows = [entry.post for entry in entries[:limit]]
+        popular = Post.objects.filter(
+            author__in=self.popular
+        ).select_related('author', 'group').order_by('-pub_date', '-pk')
+        if cursor is not None:
+            popular = self._seek(popular, cursor, older)
+        if not older:
+            popular = popular.reverse()
+        merged = merge(
+            rows,
+            popular[:limit],
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=older,
+        )
+        return list(merged)[:limit]
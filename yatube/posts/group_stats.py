@@ -0,0 +1,121 @@
+"""Сводки групп для каталога: число постов и последний пост.
+
+Сигналы постов меняют сводку на месте одним UPDATE. Новый пост
+или пост, перенесенный в группу, прибавляется к счетчику и, если он
+новее, становится последним. Удаленный или перенесенный из группы
+вычитается, а если он был последним, последний пост ищется заново
+по индексу (group, -pub_date). Каталог читает готовые строки
+одним запросом, сколько бы ни было групп.
+"""
+from django.db import models
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce
+
+from .models import Group, GroupStats, Post
+
+
+def _latest(field, group='group'):
+    """Поле самого нового поста группы из внешнего запроса."""
+    return Subquery(
+        Post.objects.filter(group=OuterRef(group)).order_by(
+            '-pub_date', '-pk'
+        ).values(field)[:1]
+    )
+
+
+def _count(group='group'):
+    return Coalesce(Subquery(
+        Post.objects.filter(group=OuterRef(group)).order_by().values(
+            'group'
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=models.IntegerField(),
+    ), 0)
+
+
+def add_post(post):
+    """Пост появился в группе: создан или перенесен из другой."""
+    if post.group_id is None:
+        return
+    newer = Q(last_activity__isnull=True) | Q(
+        last_activity__lte=post.pub_date
+    )
+    updated = GroupStats.objects.filter(pk=post.group_id).update(
+        posts_count=F('posts_count') + 1,
+        last_activity=Case(
+            When(newer, then=models.Value(
+                post.pub_date, output_field=models.DateTimeField()
+            )),
+            default=F('last_activity'),
+            output_field=models.DateTimeField(),
+        ),
+        last_post=Case(
+            When(newer, then=models.Value(post.pk)),
+            default=F('last_post'),
+            output_field=models.IntegerField(),
+        ),
+    )
+    if not updated:
+        refresh([post.group_id])
+
+
+def remove_post(group_id, post_id):
+    """Пост ушел из группы: удален или перенесен в другую.
+
+    При удалении last_post уже обнулен (SET_NULL), поэтому последний
+    пост ищется заново и для пустой ссылки.
+    """
+    if group_id is None:
+        return
+    gone = Q(last_post=post_id) | Q(last_post__isnull=True)
+    GroupStats.objects.filter(pk=group_id, posts_count__gt=0).update(
+        posts_count=F('posts_count') - 1,
+        last_post=Case(
+            When(gone, then=_latest('pk')),
+            default=F('last_post'),
+            output_field=models.IntegerField(),
+        ),
+        last_activity=Case(
+            When(gone, then=_latest('pub_date')),
+            default=F('last_activity'),
+            output_field=models.DateTimeField(),
+        ),
+    )
+
+
+def refresh(group_ids=None):
+    """Пересчитывает сводки с нуля, создавая недостающие."""
+    groups = Group.objects.filter(stats__isnull=True)
+    stats = GroupStats.objects.all()
+    if group_ids is not None:
+        groups = groups.filter(pk__in=group_ids)
+        stats = stats.filter(pk__in=group_ids)
+    missing = groups.values_list('pk', flat=True)
+    GroupStats.objects.bulk_create(
+        [GroupStats(group_id=pk) for pk in missing], ignore_conflicts=True
+    )
+    return stats.update(
+        posts_count=_count(),
+        last_post=_latest('pk'),
+        last_activity=_latest('pub_date'),
+    )
+
+
+def stale_groups():
+    """Группы, чья сводка расходится с постами или отсутствует."""
+    rows = Group.objects.annotate(
+        actual_count=_count('pk'), actual_last=_latest('pk', 'pk')
+    ).values_list(
+        'pk', 'stats__posts_count', 'actual_count',
+        'stats__last_post', 'actual_last',
+    )
+    return [
+        pk for pk, count, actual_count, last, actual_last in rows.iterator()
+        if (count, last) != (actual_count, actual_last)
+    ]
+
+
+def directory():
+    """Сводки всех групп, сначала недавно активные."""
+    return GroupStats.objects.select_related('group', 'last_post').order_by(
+        '-last_activity', '-group'
+    )
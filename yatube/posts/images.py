@@ -0,0 +1,106 @@
+"""Обработка загруженных картинок постов с ограниченной памятью.
+
+Загрузка пишется на диск кусками (TemporaryFileUploadHandler).
+Размеры проверяются по заголовку до декодирования, JPEG декодируется
+сразу в уменьшенном масштабе (draft). Результат — прогрессивный JPEG
+не больше POST_IMAGE_MAX_SIDE по большей стороне.
+"""
+import os
+import warnings
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+from core import metrics
+
+# Режимы с прозрачностью кладутся на белый фон перед JPEG.
+TRANSPARENT_MODES = ('RGBA', 'LA', 'P')
+
+
+def _open(upload):
+    """Открывает картинку, читая только заголовок."""
+    upload.seek(0)
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        try:
+            return Image.open(upload)
+        except (Image.DecompressionBombError,
+                Image.DecompressionBombWarning):
+            raise ValidationError(
+                'Картинка слишком большая.', code='image_too_large'
+            )
+
+
+def _flatten(image):
+    if image.mode not in TRANSPARENT_MODES:
+        return image.convert('RGB')
+    image = image.convert('RGBA')
+    background = Image.new('RGB', image.size, 'white')
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _encode(image):
+    """Уменьшает, поворачивает и пережимает картинку в JPEG."""
+    width, height = image.size
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    scale = max_side / max(width, height)
+    if scale < 1:
+        # Декодер JPEG сразу уменьшает картинку в 2, 4 или 8 раз,
+        # не опускаясь ниже итогового размера.
+        image.draft('RGB', (
+            max(1, round(width * scale)), max(1, round(height * scale))
+        ))
+    image.thumbnail((max_side, max_side), Image.LANCZOS, reducing_gap=None)
+    # Поворот и смена режима копируют картинку, поэтому идут
+    # после уменьшения.
+    image = _flatten(ImageOps.exif_transpose(image))
+    # Результат ограничен POST_IMAGE_MAX_SIDE, его можно держать в памяти.
+    buffer = BytesIO()
+    image.save(
+        buffer,
+        'JPEG',
+        quality=settings.POST_IMAGE_JPEG_QUALITY,
+        progressive=True,
+        optimize=True,
+    )
+    return buffer
+
+
+def process_upload(upload):
+    """Проверяет, поворачивает, уменьшает и пережимает картинку."""
+    metrics.UPLOAD_SIZE.observe(upload.size)
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={
+                'limit': filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+            },
+        )
+    image = _open(upload)
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка больше %(limit)s мегапикселей.',
+            code='image_too_large',
+            params={'limit': settings.POST_IMAGE_MAX_PIXELS // 10 ** 6},
+        )
+    # Заголовок проверен, но данные могут быть обрезаны или испорчены:
+    # ошибка декодера — ошибка формы, а не 500.
+    try:
+        buffer = _encode(image)
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Не удалось прочитать картинку.', code='invalid_image'
+        )
+    finally:
+        image.close()
+    name = os.path.splitext(os.path.basename(upload.name))[0] + '.jpg'
+    return InMemoryUploadedFile(
+        buffer, 'image', name, 'image/jpeg', buffer.tell(), None
+    )
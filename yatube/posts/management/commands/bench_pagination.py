@@ -0,0 +1,87 @@
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+
+from core.bench import scratch_database
+
+from ...constants import NUMBER_OF_POSTS
+from ...models import Post, User
+from ...utils import CursorPaginator, encode_cursor
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает OFFSET-пагинацию и курсорную на первой '
+        'и глубокой странице ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1000000,
+            help='Сколько постов создать во временной базе.'
+        )
+        parser.add_argument(
+            '--page', type=int, default=10000,
+            help='Номер глубокой страницы.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый замер.'
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options['posts'])
+            self.run(options)
+
+    def run(self, options):
+        queryset = Post.objects.select_related('author', 'group')
+        deep = options['page']
+        offset = (deep - 1) * NUMBER_OF_POSTS
+        cursor = None
+        if offset:
+            pub_date, pk = CursorPaginator(
+                queryset, NUMBER_OF_POSTS
+            ).object_list.values_list('pub_date', 'pk')[offset - 1]
+            cursor = encode_cursor(pub_date, pk)
+
+        for number, after in ((1, None), (deep, cursor)):
+            offset_time = self.measure(
+                lambda: list(
+                    Paginator(queryset, NUMBER_OF_POSTS).page(number)
+                ),
+                options['repeat'],
+            )
+            cursor_time = self.measure(
+                lambda: list(
+                    CursorPaginator(queryset, NUMBER_OF_POSTS)
+                    .cursor_page(after=after)
+                ),
+                options['repeat'],
+            )
+            self.stdout.write(
+                f'page {number:>7}: offset {offset_time * 1000:8.2f} ms, '
+                f'cursor {cursor_time * 1000:8.2f} ms'
+            )
+
+    def seed(self, total):
+        author = User.objects.create(username='bench_pagination')
+        self.stdout.write(f'Создаю {total} постов...')
+        for start in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(text=f'Пост для замеров {i}', author=author)
+                for i in range(start, min(start + BATCH_SIZE, total))
+            )
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            timings.append(perf_counter() - start)
+        return median(timings)
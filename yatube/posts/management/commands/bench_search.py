@@ -0,0 +1,86 @@
+import random
+from statistics import median
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+
+from core.bench import scratch_database
+
+from ... import search
+from ...constants import NUMBER_OF_POSTS
+from ...models import Post, User
+
+BATCH_SIZE = 10000
+# Словарь с убывающей частотой слов: первые встречаются почти
+# в каждом посте, последние — в единицах.
+VOCABULARY = [f'слово{i}' for i in range(20000)]
+WEIGHTS = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает поиск LIKE и FTS5 по текстам постов '
+        'для частого и редкого слова.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1000000,
+            help='Сколько постов создать во временной базе.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый замер.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора текстов.'
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.seed(options['posts'], random.Random(options['seed']))
+            self.run(options)
+
+    def run(self, options):
+        queryset = Post.objects.select_related('author', 'group')
+        for word in (VOCABULARY[10], VOCABULARY[-10]):
+            like_time = self.measure(
+                lambda: list(
+                    queryset.filter(text__icontains=word)[:NUMBER_OF_POSTS]
+                ),
+                options['repeat'],
+            )
+            fts_time = self.measure(
+                lambda: list(search.search(word, NUMBER_OF_POSTS)),
+                options['repeat'],
+            )
+            self.stdout.write(
+                f'{word:>12}: like {like_time * 1000:9.2f} ms, '
+                f'fts5 {fts_time * 1000:9.2f} ms'
+            )
+
+    def seed(self, total, generator):
+        author = User.objects.create(username='bench_search')
+        self.stdout.write(f'Создаю {total} постов...')
+        for start in range(0, total, BATCH_SIZE):
+            Post.objects.bulk_create(
+                Post(
+                    text=' '.join(
+                        generator.choices(VOCABULARY, WEIGHTS, k=30)
+                    ),
+                    author=author,
+                )
+                for _ in range(min(BATCH_SIZE, total - start))
+            )
+        # bulk_create не вызывает сигналы, поэтому индекс собирается заново.
+        self.stdout.write(f'В индексе постов: {search.rebuild()}')
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            timings.append(perf_counter() - start)
+        return median(timings)
@@ -0,0 +1,112 @@
+import random
+from datetime import timedelta
+from statistics import median
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from core.bench import scratch_database
+
+from ... import trending
+from ...constants import NUMBER_OF_POSTS
+from ...models import Comment, Post, User
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет комментарии шагами и после каждого шага сравнивает '
+        'чтение популярных постов из доски с подсчетом комментариев '
+        'в запросе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=1000,
+            help='Сколько постов обсуждают (создаются во временной базе).'
+        )
+        parser.add_argument(
+            '--comments', type=int, default=50000,
+            help='Сколько комментариев добавить всего.'
+        )
+        parser.add_argument(
+            '--steps', type=int, default=5,
+            help='За сколько шагов добавлять комментарии.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз повторять каждый замер чтения.'
+        )
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options)
+
+    def run(self, options):
+        author = User.objects.create(username='bench_trending')
+        posts = self.seed(author, options['posts'])
+        step = options['comments'] // options['steps']
+        since = timezone.now() - timedelta(
+            seconds=settings.TRENDING_HALF_LIFE * 4
+        )
+        for _ in range(options['steps']):
+            record_time = self.comment(author, posts, step)
+            board_time = self.measure(
+                lambda: list(trending.page(1)), options['repeat']
+            )
+            naive_time = self.measure(
+                lambda: list(Post.objects.annotate(recent=Count(
+                    'comments', filter=Q(comments__created__gte=since)
+                )).order_by('-recent')[:NUMBER_OF_POSTS]),
+                options['repeat'],
+            )
+            self.stdout.write(
+                f'комментариев {Comment.objects.count():>8}: '
+                f'доска {board_time * 1000:7.2f} ms, '
+                f'подсчет {naive_time * 1000:8.2f} ms, '
+                f'запись {record_time / step * 1e6:6.0f} мкс/комментарий'
+            )
+
+    def seed(self, author, total):
+        Post.objects.bulk_create(
+            Post(text=f'Пост для замеров {i}', author=author)
+            for i in range(total)
+        )
+        return list(author.posts.values_list('pk', flat=True))
+
+    def comment(self, author, posts, count):
+        """Комментарии к постам по степенному закону; время пересчета."""
+        elapsed = 0
+        while count > 0:
+            size = min(BATCH_SIZE, count)
+            comments = Comment.objects.bulk_create(
+                Comment(
+                    post_id=posts[
+                        min(int(random.paretovariate(1.2)), len(posts)) - 1
+                    ],
+                    author=author,
+                    text='Комментарий для замеров',
+                )
+                for _ in range(size)
+            )
+            start = perf_counter()
+            for comment in comments:
+                trending.record_comment(
+                    comment.post_id, None, comment.created
+                )
+            elapsed += perf_counter() - start
+            count -= size
+        return elapsed
+
+    @staticmethod
+    def measure(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = perf_counter()
+            func()
+            timings.append(perf_counter() - start)
+        return median(timings)
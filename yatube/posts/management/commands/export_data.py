@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from os import path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import export
+
+CHECKPOINT = 'checkpoint.json'
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает данные в JSONL или CSV пачками по id; прерванную '
+        'выгрузку можно продолжить с --resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'kinds', nargs='*', metavar='kind',
+            help='Что выгружать: {} (по умолчанию — все).'.format(
+                ', '.join(export.KINDS)
+            ),
+        )
+        parser.add_argument(
+            '--output-dir', required=True,
+            help='Каталог для файлов выгрузки и контрольной точки.'
+        )
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать файлы gzip.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько строк читать одним запросом.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с контрольной точки прошлой выгрузки.'
+        )
+
+    def handle(self, *args, **options):
+        unknown = set(options['kinds']) - set(export.KINDS)
+        if unknown:
+            raise CommandError(f'Неизвестные данные: {", ".join(unknown)}.')
+        os.makedirs(options['output_dir'], exist_ok=True)
+        checkpoint_path = path.join(options['output_dir'], CHECKPOINT)
+        expected = {'format': options['format'], 'gzip': options['gzip']}
+        checkpoint = {**expected, 'kinds': {}}
+        if options['resume']:
+            try:
+                with open(checkpoint_path) as stream:
+                    checkpoint = json.load(stream)
+            except FileNotFoundError:
+                raise CommandError('Контрольной точки нет, нечего продолжать.')
+            if {key: checkpoint[key] for key in expected} != expected:
+                raise CommandError(
+                    'Формат и сжатие должны совпадать с прошлой выгрузкой: '
+                    f'{checkpoint["format"]}, gzip={checkpoint["gzip"]}.'
+                )
+        for kind in options['kinds'] or export.KINDS:
+            state = checkpoint['kinds'].setdefault(
+                kind, {'last_pk': 0, 'offset': 0, 'done': False}
+            )
+            if state['done']:
+                self.stdout.write(f'{kind}: уже выгружено')
+                continue
+            self.export(kind, state, options, checkpoint, checkpoint_path)
+
+    def export(self, kind, state, options, checkpoint, checkpoint_path):
+        file_path = path.join(options['output_dir'], export.filename(
+            kind, options['format'], options['gzip']
+        ))
+        started = time.perf_counter()
+        rows = 0
+        if not path.exists(file_path):
+            state.update(last_pk=0, offset=0)
+        with open(file_path, 'r+b' if state['offset'] else 'wb') as output:
+            # Все, что записано после контрольной точки, пишется заново.
+            output.truncate(state['offset'])
+            output.seek(state['offset'])
+            for last_pk, count, data in export.stream(
+                kind, options['format'], options['gzip'],
+                after=state['last_pk'],
+                header=not state['offset'],
+                chunk_size=options['chunk_size'],
+            ):
+                output.write(data)
+                output.flush()
+                os.fsync(output.fileno())
+                rows += count
+                state.update(last_pk=last_pk, offset=output.tell())
+                self.save_checkpoint(checkpoint, checkpoint_path)
+        state['done'] = True
+        self.save_checkpoint(checkpoint, checkpoint_path)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{kind}: {rows} строк за {elapsed:.1f} с, '
+            f'{rows / elapsed if elapsed else 0:.0f} строк/с -> {file_path}'
+        )
+
+    @staticmethod
+    def save_checkpoint(checkpoint, checkpoint_path):
+        """Пишет контрольную точку атомарно, через временный файл."""
+        temporary = checkpoint_path + '.tmp'
+        with open(temporary, 'w') as stream:
+            json.dump(checkpoint, stream)
+        os.replace(temporary, checkpoint_path)
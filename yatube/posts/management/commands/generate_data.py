@@ -0,0 +1,350 @@
+"""Синтетические данные, похожие на боевые, для замеров.
+
+Популярность авторов распределена по закону Ципфа: у немногих
+авторов большая часть подписчиков, у остальных почти никого.
+Активные авторы пишут чаще, посты идут всплесками, комментарии
+липнут к немногим постам (распределение Парето). Одно и то же
+зерно --seed с одним и тем же --now дает одни и те же данные,
+включая даты.
+
+Все пишется через bulk_create пачками с заранее выбранными id,
+поэтому связи строятся без чтения только что созданных строк.
+"""
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from faker import Faker
+from PIL import Image
+
+from ...models import Comment, Follow, Group, Post, User
+from .import_data import explicit_dates, rebuild_derived
+
+IMAGES = 20
+VOCABULARY_SIZE = 3000
+
+
+def zipf_weights(count, exponent):
+    """Накопленные веса 1/rank^exponent для random.choices."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, count + 1)
+    ))
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает пользователей, группы, посты, комментарии и подписки '
+        'со степенными распределениями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=30000)
+        parser.add_argument(
+            '--follows', type=int, default=20000,
+            help='Сколько подписок создать (примерно).'
+        )
+        parser.add_argument(
+            '--image-ratio', type=float, default=0.05,
+            help='Доля постов с картинкой.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько последних дней раскидать посты.'
+        )
+        parser.add_argument(
+            '--now',
+            help='Конец этого периода, ISO 8601 (по умолчанию — сейчас).'
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Показатель закона Ципфа для популярности авторов.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Сколько строк сохранять в одной транзакции.'
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = self.parse_now(options['now'])
+        self.joined = self.now - timedelta(days=options['days'])
+        self.vocabulary = sorted(set(self.fake.words(VOCABULARY_SIZE)))
+        started = time.perf_counter()
+        with explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            users = self.timed('users', self.create_users, options['users'])
+            groups = self.timed(
+                'groups', self.create_groups, options['groups']
+            )
+            # Популярность и активность — по случайным порядкам, а не
+            # по id. Они не связаны: иначе самые популярные авторы
+            # писали бы больше всех и ленты росли бы на порядки.
+            popular = list(users)
+            self.random.shuffle(popular)
+            active = list(users)
+            self.random.shuffle(active)
+            self.timed(
+                'follows', self.create_follows, users, popular,
+                zipf_weights(len(popular), options['exponent']),
+                options['follows'],
+            )
+            self.timed(
+                'posts', self.create_posts, options['posts'], active,
+                zipf_weights(len(active), options['exponent'] / 2),
+                groups, options['image_ratio'], options['days'],
+            )
+            self.timed(
+                'comments', self.create_comments, options['comments'], users
+            )
+        self.reset_sequences()
+        rebuild_derived(
+            ('counters', 'group_stats', 'search', 'feed', 'trending'),
+            self.stdout,
+        )
+        self.stdout.write(
+            f'Готово за {time.perf_counter() - started:.0f} с.'
+        )
+
+    @staticmethod
+    def parse_now(value):
+        if value is None:
+            return timezone.now()
+        moment = parse_datetime(value)
+        if moment is None:
+            raise CommandError(f'Неверное время --now: {value}.')
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    def timed(self, name, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        count = len(result) if isinstance(result, range) else result
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{name}: {count} за {elapsed:.1f} с, '
+            f'{count / elapsed if elapsed else 0:.0f} строк/с'
+        )
+        return result
+
+    def save(self, model, objects):
+        """Сохраняет объекты пачками, каждую в своей транзакции."""
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+
+    def create_users(self, count):
+        first = next_id(User)
+        password = make_password(None)
+
+        def users():
+            for pk in range(first, first + count):
+                yield User(
+                    pk=pk,
+                    username=f'{self.fake.user_name()}_{pk}',
+                    first_name=self.fake.first_name(),
+                    last_name=self.fake.last_name(),
+                    password=password,
+                    date_joined=self.joined,
+                )
+        self.save(User, users())
+        return range(first, first + count)
+
+    def create_groups(self, count):
+        first = next_id(Group)
+
+        def groups():
+            for pk in range(first, first + count):
+                yield Group(
+                    pk=pk,
+                    slug=f'group-{pk}',
+                    title=self.fake.word().capitalize(),
+                    description=self.fake.sentence(),
+                )
+        self.save(Group, groups())
+        return range(first, first + count)
+
+    def create_follows(self, users, authors, popularity, total):
+        """Число подписок читателя случайно, авторы — по популярности."""
+        mean = total / len(users) if users else 0
+        created = 0
+
+        def follows():
+            nonlocal created
+            for user_id in users:
+                wanted = min(
+                    int(self.random.expovariate(1 / mean)) if mean else 0,
+                    len(users) - 1,
+                )
+                chosen = set()
+                for _ in range(3):
+                    chosen.update(self.random.choices(
+                        authors, cum_weights=popularity, k=wanted
+                    ))
+                    chosen.discard(user_id)
+                    if len(chosen) >= wanted:
+                        break
+                for author_id in sorted(chosen)[:wanted]:
+                    created += 1
+                    yield Follow(user_id=user_id, author_id=author_id)
+        self.save(Follow, follows())
+        return created
+
+    def create_images(self):
+        """Несколько настоящих картинок, на которые ссылаются посты."""
+        names = []
+        for number in range(IMAGES):
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            buffer = BytesIO()
+            Image.new('RGB', (1280, 720), color).save(buffer, 'JPEG')
+            names.append(default_storage.save(
+                f'posts/synthetic_{number}.jpg', ContentFile(buffer.getvalue())
+            ))
+        return names
+
+    def post_times(self, count, days):
+        """Время постов: всплески по несколько постов за минуты."""
+        start = self.now - timedelta(days=days)
+        mean_burst = 5
+        mean_gap = days * 24 * 60 * 60 / max(count / mean_burst, 1)
+        moment = start
+        produced = 0
+        while produced < count:
+            moment += timedelta(seconds=self.random.expovariate(1 / mean_gap))
+            size = min(
+                1 + int(self.random.expovariate(1 / (mean_burst - 1))),
+                count - produced,
+            )
+            offsets = sorted(
+                self.random.expovariate(1 / 600) for _ in range(size)
+            )
+            for offset in offsets:
+                yield min(moment + timedelta(seconds=offset), self.now)
+            produced += size
+
+    def create_posts(self, count, authors, activity, groups, image_ratio,
+                     days):
+        first = next_id(Post)
+        images = self.create_images() if image_ratio > 0 and count else []
+
+        def posts():
+            for pk, pub_date in zip(
+                range(first, first + count), self.post_times(count, days)
+            ):
+                length = max(3, int(self.random.lognormvariate(3, 0.7)))
+                yield Post(
+                    pk=pk,
+                    text=' '.join(
+                        self.random.choices(self.vocabulary, k=length)
+                    ).capitalize() + '.',
+                    pub_date=pub_date,
+                    author_id=self.random.choices(
+                        authors, cum_weights=activity
+                    )[0],
+                    group_id=(
+                        self.random.choice(groups)
+                        if groups and self.random.random() < 0.6 else None
+                    ),
+                    image=(
+                        self.random.choice(images)
+                        if images and self.random.random() < image_ratio
+                        else ''
+                    ),
+                )
+        self.save(Post, posts())
+        return count
+
+    def create_comments(self, total, users):
+        """Комментарии по Парето: у немногих постов их большинство.
+
+        Посты читаются пачками по id, поэтому память не зависит
+        от их числа.
+        """
+        if not total or not users:
+            return 0
+        posts_count = Post.objects.count()
+        if not posts_count:
+            return 0
+        alpha = 1.5
+        per_post = total / posts_count
+        created = 0
+
+        def comments():
+            nonlocal created
+            while created < total:
+                last_pk = 0
+                while created < total:
+                    rows = list(
+                        Post.objects.filter(pk__gt=last_pk).order_by(
+                            'pk'
+                        ).values_list('pk', 'pub_date')[:self.batch_size]
+                    )
+                    if not rows:
+                        break
+                    last_pk = rows[-1][0]
+                    for post_id, pub_date in rows:
+                        expected = (
+                            (self.random.paretovariate(alpha) - 1)
+                            * per_post * (alpha - 1)
+                        )
+                        # Дробную часть — с ее вероятностью, иначе при
+                        # малом per_post не было бы ни одного комментария.
+                        wanted = int(expected) + (
+                            self.random.random() < expected % 1
+                        )
+                        for _ in range(min(wanted, total - created)):
+                            created += 1
+                            yield Comment(
+                                post_id=post_id,
+                                author_id=self.random.choice(users),
+                                text=self.fake.sentence(),
+                                created=min(
+                                    pub_date + timedelta(
+                                        hours=self.random.expovariate(1 / 6)
+                                    ),
+                                    self.now,
+                                ),
+                            )
+        self.save(Comment, comments())
+        return created
+
+    @staticmethod
+    def reset_sequences():
+        """Id задавались явно; последовательностям нужно догнать их."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Group, Post, Comment, Follow]
+        )
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
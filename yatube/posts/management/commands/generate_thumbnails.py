@@ -0,0 +1,48 @@
+import os
+from multiprocessing import get_context
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ... import thumbnails
+from ...models import Post
+
+
+def _close_connections():
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Создает миниатюры для уже загруженных картинок на всех ядрах.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов (по умолчанию — все ядра).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=100,
+            help='Сколько картинок отдавать процессу за раз.'
+        )
+
+    def handle(self, *args, **options):
+        # Поле сортировки попадает в SELECT DISTINCT, поэтому сортировка
+        # только по самой картинке: иначе общая картинка пошла бы дважды.
+        images = Post.objects.exclude(image='').order_by(
+            'image'
+        ).values_list('image', flat=True).distinct()
+        # Дочерние процессы не должны делить соединение родителя.
+        connections.close_all()
+        done = total = 0
+        with get_context('fork').Pool(
+            options['workers'], initializer=_close_connections
+        ) as pool:
+            results = pool.imap_unordered(
+                thumbnails.generate,
+                images.iterator(chunk_size=options['chunk_size']),
+                chunksize=options['chunk_size'],
+            )
+            for created in results:
+                total += 1
+                done += created
+        self.stdout.write(f'Обработано картинок: {total}, создано: {done}')
@@ -0,0 +1,439 @@
+"""Массовая загрузка групп, постов, комментариев и подписок.
+
+Файл читается потоком по строке и сохраняется пачками через
+bulk_create и bulk_update, каждая пачка в своей транзакции. Авторы
+и группы ищутся в словарях, загруженных один раз; неизвестные
+пользователи создаются без пароля. Память растет с числом
+пользователей и групп, но не с размером файла.
+
+Массовые операции не отправляют сигналы, поэтому счетчики, поисковый
+индекс и ленты пересчитываются один раз после загрузки.
+"""
+import csv
+import gzip
+import json
+import sys
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ... import (
+    conditional, feed, group_stats, page_cache, search, trending
+)
+from ...constants import INDEX_PAGE_CACHE
+from ...models import Comment, Follow, Group, Post, User
+
+# Как часто печатать скорость загрузки, в секундах.
+REPORT_INTERVAL = 5
+
+
+def _required(row, field):
+    value = row.get(field)
+    if value in (None, ''):
+        raise ValueError(f'нет поля {field}')
+    return value
+
+
+def _optional_int(row, field):
+    value = row.get(field)
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def _datetime(row, field):
+    """Дата из ISO 8601; без нее — текущее время."""
+    value = row.get(field)
+    if value in (None, ''):
+        return timezone.now()
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'неверная дата в поле {field}: {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now_add, иначе bulk_create перепишет даты файла."""
+    saved = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, saved):
+            field.auto_now_add = value
+
+
+def rebuild_derived(steps, stdout):
+    """Пересчитывает то, что обычно обновляют сигналы.
+
+    steps — что пересчитать: 'counters', 'group_stats', 'search', 'feed',
+    'trending'.
+    Кеши страниц сбрасываются всегда.
+    """
+    if 'counters' in steps:
+        call_command('rebuild_counters', stdout=stdout)
+    if 'group_stats' in steps:
+        stdout.write(f'Сводок групп: {group_stats.refresh()}')
+    if 'search' in steps:
+        stdout.write(f'Проиндексировано постов: {search.rebuild()}')
+    if 'feed' in steps:
+        stdout.write(f'Записей в лентах: {feed.rebuild()}')
+    if 'trending' in steps:
+        stdout.write(f'Популярных постов: {trending.rebuild()}')
+    conditional.bump(conditional.ALL, conditional.GROUPS, conditional.USERS)
+    page_cache.invalidate(INDEX_PAGE_CACHE)
+
+
+class Loader:
+    """Превращает строки файла в объекты и сохраняет их пачкой."""
+    update_fields = ()
+    # Что пересчитать после загрузки.
+    rebuild = ()
+
+    def __init__(self, update, batch_size):
+        self.update = update
+        self.batch_size = batch_size
+        self.stats = dict.fromkeys(
+            ('created', 'updated', 'skipped', 'invalid'), 0
+        )
+        self.users = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+
+    def usernames(self, row):
+        return ()
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def save(self, objects):
+        raise NotImplementedError
+
+    def create_users(self, rows):
+        """Создает одним запросом авторов, которых еще нет в базе."""
+        missing = {
+            name for row in rows if row is not None
+            for name in self.usernames(row)
+            if isinstance(name, str) and name and name not in self.users
+        }
+        if not missing:
+            return
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=name, password=password) for name in missing]
+        )
+        self.users.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'pk'
+            )
+        )
+
+    def author_id(self, row, field='author'):
+        return self.users[_required(row, field)]
+
+    def group_id(self, row):
+        slug = row.get('group')
+        if not slug:
+            return None
+        if slug not in self.groups:
+            raise ValueError(f'нет группы {slug}')
+        return self.groups[slug]
+
+    def save_by_pk(self, objects):
+        """Создает новые объекты, уже известные по id пропускает или
+        обновляет.
+        """
+        latest = {}
+        anonymous = []
+        for obj in objects:
+            if obj.pk is None:
+                anonymous.append(obj)
+            else:
+                latest[obj.pk] = obj
+        model = type(objects[0])
+        existing = set(model.objects.filter(pk__in=latest).values_list(
+            'pk', flat=True
+        ))
+        # Размер INSERT выбирает Django: в SQLite ограничено число
+        # параметров запроса.
+        model.objects.bulk_create(anonymous + [
+            obj for pk, obj in latest.items() if pk not in existing
+        ])
+        self.stats['created'] += (
+            len(anonymous) + len(latest) - len(existing)
+        )
+        duplicates = len(objects) - len(anonymous) - len(latest)
+        if self.update:
+            model.objects.bulk_update(
+                [latest[pk] for pk in existing], self.update_fields,
+                batch_size=self.batch_size,
+            )
+            self.stats['updated'] += len(existing)
+            self.stats['skipped'] += duplicates
+        else:
+            self.stats['skipped'] += len(existing) + duplicates
+
+
+class GroupLoader(Loader):
+    """Группы; дубликат — та же slug."""
+    update_fields = ('title', 'description')
+    rebuild = ('group_stats',)
+
+    def build(self, row):
+        return Group(
+            slug=_required(row, 'slug'),
+            title=_required(row, 'title'),
+            description=row.get('description') or '',
+        )
+
+    def save(self, groups):
+        by_slug = {group.slug: group for group in groups}
+        new = [
+            group for slug, group in by_slug.items()
+            if slug not in self.groups
+        ]
+        old = [
+            group for slug, group in by_slug.items() if slug in self.groups
+        ]
+        Group.objects.bulk_create(new)
+        self.groups.update(
+            Group.objects.filter(
+                slug__in=[group.slug for group in new]
+            ).values_list('slug', 'pk')
+        )
+        self.stats['created'] += len(new)
+        if self.update:
+            for group in old:
+                group.pk = self.groups[group.slug]
+            Group.objects.bulk_update(
+                old, self.update_fields, batch_size=self.batch_size
+            )
+            self.stats['updated'] += len(old)
+            self.stats['skipped'] += len(groups) - len(by_slug)
+        else:
+            self.stats['skipped'] += len(groups) - len(new)
+
+
+class PostLoader(Loader):
+    """Посты; дубликат — тот же id."""
+    update_fields = ('text', 'pub_date', 'author', 'group', 'image')
+    rebuild = ('counters', 'group_stats', 'search', 'feed', 'trending')
+
+    def usernames(self, row):
+        return (row.get('author'),)
+
+    def build(self, row):
+        return Post(
+            pk=_optional_int(row, 'id'),
+            text=_required(row, 'text'),
+            pub_date=_datetime(row, 'pub_date'),
+            author_id=self.author_id(row),
+            group_id=self.group_id(row),
+            image=row.get('image') or '',
+        )
+
+    def save(self, posts):
+        self.save_by_pk(posts)
+
+
+class CommentLoader(Loader):
+    """Комментарии; дубликат — тот же id."""
+    update_fields = ('text', 'created', 'author')
+    rebuild = ('counters', 'trending')
+
+    def usernames(self, row):
+        return (row.get('author'),)
+
+    def build(self, row):
+        return Comment(
+            pk=_optional_int(row, 'id'),
+            post_id=int(_required(row, 'post')),
+            author_id=self.author_id(row),
+            text=_required(row, 'text'),
+            created=_datetime(row, 'created'),
+        )
+
+    def save(self, comments):
+        posts = set(Post.objects.filter(
+            pk__in={comment.post_id for comment in comments}
+        ).values_list('pk', flat=True))
+        valid = [
+            comment for comment in comments if comment.post_id in posts
+        ]
+        self.stats['invalid'] += len(comments) - len(valid)
+        if valid:
+            self.save_by_pk(valid)
+
+
+class FollowLoader(Loader):
+    """Подписки; дубликат — та же пара, обновлять в ней нечего."""
+    rebuild = ('counters', 'feed')
+
+    def usernames(self, row):
+        return (row.get('user'), row.get('author'))
+
+    def build(self, row):
+        follow = Follow(
+            user_id=self.author_id(row, 'user'),
+            author_id=self.author_id(row),
+        )
+        if follow.user_id == follow.author_id:
+            raise ValueError('подписка на самого себя')
+        return follow
+
+    def save(self, follows):
+        pairs = {
+            (follow.user_id, follow.author_id): follow for follow in follows
+        }
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        new = [
+            follow for pair, follow in pairs.items() if pair not in existing
+        ]
+        Follow.objects.bulk_create(new)
+        self.stats['created'] += len(new)
+        self.stats['skipped'] += len(follows) - len(new)
+
+
+LOADERS = {
+    'groups': GroupLoader,
+    'posts': PostLoader,
+    'comments': CommentLoader,
+    'follows': FollowLoader,
+}
+
+
+def read_rows(stream, file_format):
+    """Строки файла по одной: (номер строки, словарь полей).
+
+    Вместо строки, которую не удалось разобрать, отдается None.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Загружает данные из JSONL или CSV пачками через bulk_create.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(LOADERS))
+        parser.add_argument(
+            'path',
+            help='Файл .jsonl или .csv, можно сжатый gzip; '
+                 '"-" — стандартный ввод.'
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файла (по умолчанию — по расширению).'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк сохранять в одной транзакции.'
+        )
+        parser.add_argument(
+            '--on-duplicate', choices=('skip', 'update'), default='skip',
+            help='Что делать с объектами, которые уже есть в базе.'
+        )
+        parser.add_argument(
+            '--skip-rebuild', action='store_true',
+            help='Не пересчитывать счетчики, индекс и ленты после загрузки, '
+                 'например если дальше загружается еще один файл.'
+        )
+
+    def handle(self, *args, **options):
+        file_format = options['format'] or (
+            'csv' if options['path'].endswith(('.csv', '.csv.gz')) else 'jsonl'
+        )
+        loader = LOADERS[options['kind']](
+            options['on_duplicate'] == 'update', options['batch_size']
+        )
+        if options['path'] == '-':
+            self.load(loader, sys.stdin, file_format, options['batch_size'])
+        else:
+            try:
+                opener = gzip.open if options['path'].endswith(
+                    '.gz'
+                ) else open
+                stream = opener(
+                    options['path'], 'rt', encoding='utf-8', newline=''
+                )
+            except OSError as error:
+                raise CommandError(error)
+            with stream:
+                self.load(loader, stream, file_format, options['batch_size'])
+        if not options['skip_rebuild']:
+            rebuild_derived(loader.rebuild, self.stdout)
+
+    def load(self, loader, stream, file_format, batch_size):
+        started = reported = time.perf_counter()
+        rows = 0
+        with explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Comment._meta.get_field('created'),
+        ):
+            for batch in batches(read_rows(stream, file_format), batch_size):
+                rows += len(batch)
+                with transaction.atomic():
+                    loader.create_users([row for _, row in batch])
+                    objects = []
+                    for number, row in batch:
+                        if row is None:
+                            loader.stats['invalid'] += 1
+                            self.stderr.write(
+                                f'Строка {number}: ожидался объект JSON'
+                            )
+                            continue
+                        try:
+                            objects.append(loader.build(row))
+                        except (KeyError, TypeError, ValueError) as error:
+                            loader.stats['invalid'] += 1
+                            self.stderr.write(f'Строка {number}: {error!r}')
+                    if objects:
+                        loader.save(objects)
+                now = time.perf_counter()
+                if now - reported >= REPORT_INTERVAL:
+                    reported = now
+                    self.stdout.write(
+                        f'{rows} строк, {rows / (now - started):.0f} строк/с'
+                    )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            'Создано {created}, обновлено {updated}, пропущено {skipped}, '
+            'с ошибками {invalid}.'.format(**loader.stats)
+        )
+        self.stdout.write(
+            f'{rows} строк за {elapsed:.1f} с, '
+            f'{rows / elapsed if elapsed else 0:.0f} строк/с'
+        )
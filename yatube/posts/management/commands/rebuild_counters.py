@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ... import counters, group_stats
+from ...models import Counter
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счетчики пачками '
+        'и сводки групп.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Сколько объектов пересчитывать за один запрос.'
+        )
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только сверить счетчики, ничего не меняя.'
+        )
+
+    def handle(self, *args, **options):
+        mismatches = 0
+        for name in counters.SOURCES:
+            fixed = self.rebuild(
+                name, options['chunk_size'], options['check']
+            )
+            mismatches += fixed
+            self.stdout.write(f'{name}: расхождений {fixed}')
+        stale = group_stats.stale_groups()
+        if stale and not options['check']:
+            group_stats.refresh(stale)
+        mismatches += len(stale)
+        self.stdout.write(f'group_stats: расхождений {len(stale)}')
+        if options['check'] and mismatches:
+            raise CommandError(f'Счетчики расходятся: {mismatches}')
+
+    def rebuild(self, name, chunk_size, check):
+        model, field = counters.SOURCES[name]
+        owner = model._meta.get_field(field).related_model
+        mismatches = 0
+        last_pk = 0
+        while True:
+            ids = list(
+                owner.objects.filter(pk__gt=last_pk).order_by(
+                    'pk'
+                ).values_list('pk', flat=True)[:chunk_size]
+            )
+            if not ids:
+                return mismatches
+            last_pk = ids[-1]
+            actual = counters.actual_counts(name, ids)
+            stored = dict(
+                Counter.objects.filter(
+                    name=name, object_id__in=ids
+                ).values_list('object_id', 'value')
+            )
+            wrong = {
+                object_id: value for object_id, value in actual.items()
+                if stored.get(object_id, 0) != value
+            }
+            mismatches += len(wrong)
+            if wrong and not check:
+                self.save(name, wrong, stored)
+
+    @staticmethod
+    @transaction.atomic
+    def save(name, wrong, stored):
+        existing = list(Counter.objects.filter(
+            name=name, object_id__in=[pk for pk in wrong if pk in stored]
+        ))
+        for counter in existing:
+            counter.value = wrong[counter.object_id]
+        Counter.objects.bulk_update(existing, ['value'])
+        Counter.objects.bulk_create(
+            Counter(name=name, object_id=pk, value=value)
+            for pk, value in wrong.items() if pk not in stored
+        )
@@ -0,0 +1,54 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:08
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Как counters.SOURCES: имя счетчика, модель и поле группировки.
+SOURCES = {
+    'author_posts': ('Post', 'author'),
+    'author_followers': ('Follow', 'author'),
+    'author_following': ('Follow', 'user'),
+    'post_comments': ('Comment', 'post'),
+    'group_posts': ('Post', 'group'),
+}
+
+
+def fill_counters(apps, schema_editor):
+    """Счетчики для существующих постов, подписок и комментариев."""
+    Counter = apps.get_model('posts', 'Counter')
+    for name, (model_name, field) in SOURCES.items():
+        rows = apps.get_model('posts', model_name).objects.filter(
+            **{f'{field}__isnull': False}
+        ).order_by().values(field).annotate(total=Count('pk'))
+        Counter.objects.bulk_create(
+            Counter(name=name, object_id=row[field], value=row['total'])
+            for row in rows.iterator()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_feedentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('author_posts', 'Посты автора'), ('author_followers', 'Подписчики автора'), ('author_following', 'Подписки автора'), ('post_comments', 'Комментарии к посту'), ('group_posts', 'Посты группы')], max_length=32, verbose_name='Счетчик')),
+                ('object_id', models.PositiveIntegerField(verbose_name='Объект')),
+                ('value', models.IntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счетчик',
+                'verbose_name_plural': 'Счетчики',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='counter',
+            constraint=models.UniqueConstraint(fields=('name', 'object_id'), name='unique_counter'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
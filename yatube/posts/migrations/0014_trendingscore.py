@@ -0,0 +1,67 @@
+# Generated by Django 2.2.16 on 2026-10-18 08:03
+
+import math
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_trending_scores(apps, schema_editor):
+    """Счета для постов с комментариями, как в posts/trending.py."""
+    Comment = apps.get_model('posts', 'Comment')
+    TrendingScore = apps.get_model('posts', 'TrendingScore')
+    epoch = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    scores = {}
+    groups = {}
+    comments = Comment.objects.order_by().values_list(
+        'post_id', 'post__group_id', 'created'
+    )
+    for post_id, group_id, created in comments.iterator():
+        added = (
+            (created - epoch).total_seconds() / settings.TRENDING_HALF_LIFE
+        )
+        if post_id in scores:
+            high, low = max(scores[post_id], added), min(scores[post_id], added)
+            scores[post_id] = high + math.log2(1 + 2 ** (low - high))
+        else:
+            scores[post_id] = added
+            groups[post_id] = group_id
+    TrendingScore.objects.bulk_create(
+        TrendingScore(post_id=pk, group_id=groups[pk], score=score)
+        for pk, score in scores.items()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_groupstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='posts.Post', verbose_name='Пост')),
+                ('score', models.FloatField(verbose_name='Счет')),
+                ('group', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='posts.Group', verbose_name='Группа')),
+            ],
+            options={
+                'verbose_name': 'Счет популярности',
+                'verbose_name_plural': 'Счета популярности',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['-score'], name='trending_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trendingscore',
+            index=models.Index(fields=['group', '-score'], name='trending_group_score_idx'),
+        ),
+        migrations.RunPython(
+            fill_trending_scores, migrations.RunPython.noop
+        ),
+    ]
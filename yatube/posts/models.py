@@ -55,6 +55,19 @@ class Post(models.Model):
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:TEXT_LIM]
@@ -87,6 +100,12 @@ class Comment(models.Model):
         ordering = ['-created']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:TEXT_LIM]
@@ -110,3 +129,162 @@ class Follow(models.Model):
     class Meta:
         verbose_name = 'Подписки'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+            models.CheckConstraint(
+                check=~models.Q(user=models.F('author')),
+                name='prevent_self_follow'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_feed_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author_idx'
+            ),
+        ]
+
+
+class Counter(models.Model):
+    """Денормализованный счетчик, обновляемый при изменениях."""
+    AUTHOR_POSTS = 'author_posts'
+    AUTHOR_FOLLOWERS = 'author_followers'
+    AUTHOR_FOLLOWING = 'author_following'
+    POST_COMMENTS = 'post_comments'
+    GROUP_POSTS = 'group_posts'
+    NAME_CHOICES = (
+        (AUTHOR_POSTS, 'Посты автора'),
+        (AUTHOR_FOLLOWERS, 'Подписчики автора'),
+        (AUTHOR_FOLLOWING, 'Подписки автора'),
+        (POST_COMMENTS, 'Комментарии к посту'),
+        (GROUP_POSTS, 'Посты группы'),
+    )
+    name = models.CharField(
+        max_length=32,
+        choices=NAME_CHOICES,
+        verbose_name='Счетчик'
+    )
+    object_id = models.PositiveIntegerField(verbose_name='Объект')
+    value = models.IntegerField(default=0, verbose_name='Значение')
+
+    class Meta:
+        verbose_name = 'Счетчик'
+        verbose_name_plural = 'Счетчики'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['name', 'object_id'], name='unique_counter'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name}:{self.object_id}={self.value}'
+
+
+class GroupStats(models.Model):
+    """Сводка группы для каталога, обновляемая при изменении постов."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа'
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Постов'
+    )
+    last_activity = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Последняя активность'
+    )
+    last_post = models.ForeignKey(
+        Post,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Последний пост'
+    )
+
+    class Meta:
+        verbose_name = 'Сводка группы'
+        verbose_name_plural = 'Сводки групп'
+        indexes = [
+            models.Index(
+                fields=['-last_activity', '-group'],
+                name='group_stats_activity_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.group_id}: {self.posts_count}'
+
+
+class TrendingScore(models.Model):
+    """Счет поста по комментариям с затуханием (posts/trending.py)."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='trending',
+        verbose_name='Пост'
+    )
+    group = models.ForeignKey(
+        Group,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Группа'
+    )
+    score = models.FloatField(verbose_name='Счет')
+
+    class Meta:
+        verbose_name = 'Счет популярности'
+        verbose_name_plural = 'Счета популярности'
+        indexes = [
+            models.Index(fields=['-score'], name='trending_score_idx'),
+            models.Index(
+                fields=['group', '-score'], name='trending_group_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id}: {self.score:.2f}'
@@ -0,0 +1,124 @@
+"""Кеш страниц со сбросом по событиям и stale-while-revalidate.
+
+Сохраненная страница помечается поколением кеша. Изменение постов,
+групп или пользователей увеличивает поколение. Читатель получает
+устаревшую копию сразу, а свежая отрисовывается в фоне одним
+процессом и заменяет ее.
+
+Копия хранится по пути и пользователю, все анонимные посетители
+делят ключ 0. Поэтому декоратор годится только для видов, чей ответ
+зависит лишь от пути, GET-параметров и пользователя: без
+{% csrf_token %}, сообщений и данных сессии в шаблоне, иначе токен
+или сообщение одного посетителя попадут к другим. Сейчас это
+главная страница.
+"""
+from functools import wraps
+from hashlib import md5
+from threading import Thread
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.http import HttpRequest
+
+from core import metrics
+
+GENERATION_KEY = '{}:generation'
+PAGE_KEY = '{}:page:{}:{}'
+
+
+def invalidate(key_prefix):
+    """Помечает все сохраненные страницы устаревшими."""
+    key = GENERATION_KEY.format(key_prefix)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, None)
+
+
+def _fresh_request(request):
+    """Новый GET-запрос с тем же путем и пользователем.
+
+    Фоновая отрисовка идет после ответа, когда исходный запрос уже
+    отработан и мог быть изменен middleware.
+    """
+    fresh = HttpRequest()
+    fresh.method = 'GET'
+    fresh.path = request.path
+    fresh.path_info = request.path_info
+    fresh.GET = request.GET.copy()
+    # Только заголовки и окружение: без потока тела и cookie сессии.
+    fresh.META = {
+        key: value for key, value in request.META.items()
+        if isinstance(value, str) and key != 'HTTP_COOKIE'
+    }
+    fresh.user = request.user
+    fresh.resolver_match = request.resolver_match
+    return fresh
+
+
+def _refresh(view, request, args, kwargs, page_key, lock_key, generation):
+    try:
+        response = view(request, *args, **kwargs)
+        _store(response, page_key, generation)
+    finally:
+        cache.delete(lock_key)
+        if settings.PAGE_CACHE_REFRESH_IN_BACKGROUND:
+            connections.close_all()
+
+
+def _store(response, page_key, generation):
+    if response.status_code != 200 or response.streaming:
+        return
+    if hasattr(response, 'render') and callable(response.render):
+        response.render()
+    cache.set(page_key, (generation, response), settings.PAGE_CACHE_TIMEOUT)
+
+
+def cache_page_swr(key_prefix):
+    """Кеширует GET-ответы вида до смены поколения.
+
+    Ключ общий для всех анонимных посетителей: см. описание модуля.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            path = md5(request.get_full_path().encode()).hexdigest()
+            page_key = PAGE_KEY.format(key_prefix, path, request.user.pk or 0)
+            generation_key = GENERATION_KEY.format(key_prefix)
+            found = cache.get_many([page_key, generation_key])
+            generation = found.get(generation_key, 0)
+            cached = found.get(page_key)
+            if cached is None:
+                metrics.cache_result(key_prefix, misses=1)
+                response = view(request, *args, **kwargs)
+                _store(response, page_key, generation)
+                return response
+            stored_generation, response = cached
+            # Признак для валидаторов conditional GET.
+            response.stale = stored_generation != generation
+            if response.stale:
+                metrics.cache_result(key_prefix, stale=1)
+            else:
+                metrics.cache_result(key_prefix, hits=1)
+            lock_key = f'{page_key}:lock'
+            if response.stale and cache.add(
+                lock_key, 1, settings.PAGE_CACHE_LOCK_TIMEOUT
+            ):
+                refresh_args = (
+                    view, _fresh_request(request), args, kwargs,
+                    page_key, lock_key, generation,
+                )
+                if settings.PAGE_CACHE_REFRESH_IN_BACKGROUND:
+                    # Фоновый поток не видит незакоммиченных данных,
+                    # поэтому стартует только после фиксации транзакции.
+                    transaction.on_commit(Thread(
+                        target=_refresh, args=refresh_args, daemon=True
+                    ).start)
+                else:
+                    _refresh(*refresh_args)
+            return response
+        return wrapper
+    return decorator
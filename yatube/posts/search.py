@@ -0,0 +1,161 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Текст постов дублируется в виртуальную таблицу posts_post_fts
+с rowid, равным id поста. Сигналы поддерживают ее в актуальном
+состоянии, а команда rebuild_search_index пересобирает целиком.
+"""
+import re
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+
+FTS_TABLE = 'posts_post_fts'
+# Границы подсветки в snippet(): управляющие символы не встречаются
+# в тексте и переживают экранирование HTML.
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 24
+WORD = re.compile(r'\w+')
+
+
+def index_post(post_id, text, created=False):
+    """Добавляет или обновляет пост в индексе."""
+    with connection.cursor() as cursor:
+        if not created:
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+            )
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+            [post_id, text],
+        )
+
+
+def unindex_post(post_id):
+    """Убирает пост из индекса."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+        )
+
+
+def rebuild(chunk_size=10000):
+    """Заново заполняет индекс пачками по id и сжимает его."""
+    indexed = 0
+    last_pk = 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        while True:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) '
+                'SELECT id, text FROM posts_post WHERE id > %s '
+                'ORDER BY id LIMIT %s',
+                [last_pk, chunk_size],
+            )
+            if not cursor.rowcount:
+                break
+            indexed += cursor.rowcount
+            cursor.execute(f'SELECT MAX(rowid) FROM {FTS_TABLE}')
+            last_pk = cursor.fetchone()[0]
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"
+        )
+    return indexed
+
+
+def match_query(query):
+    """Строка запроса MATCH из пользовательского ввода.
+
+    Каждое слово берется в кавычки, чтобы операторы FTS5 в вводе
+    не ломали запрос; последнее слово ищется как префикс.
+    """
+    words = WORD.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_ids_sql(query):
+    """Подзапрос id постов, подходящих под запрос, для фильтра pk__in."""
+    return (
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_query(query)],
+    )
+
+
+def encode_cursor(rank, pk):
+    """Упаковывает ключ (rank, id) в непрозрачный токен."""
+    raw = f'{rank!r}|{pk}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw_rank, raw_pk = urlsafe_b64decode(padded).decode().split('|')
+        return float(raw_rank), int(raw_pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def _highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def search(query, per_page, after=None):
+    """Страница результатов по релевантности bm25.
+
+    Как и CursorPaginator.cursor_page, возвращает обычный Page
+    с относительным номером и курсором next_cursor. У постов
+    на странице есть snippet с подсвеченными совпадениями.
+    """
+    match = match_query(query)
+    cursor_key = decode_cursor(after) if after else None
+    rows = []
+    if match is not None:
+        sql = (
+            f'SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, %s, %s) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [MARK_START, MARK_END, '…', SNIPPET_TOKENS, match]
+        if cursor_key is not None:
+            sql += ' AND (rank > %s OR (rank = %s AND rowid > %s))'
+            params += [cursor_key[0], cursor_key[0], cursor_key[1]]
+        sql += ' ORDER BY rank, rowid LIMIT %s'
+        params.append(per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [pk for pk, _, _ in rows]
+    )
+    results = []
+    for pk, _, snippet in rows:
+        # Пост мог удалиться между двумя запросами.
+        if pk in posts:
+            posts[pk].snippet = _highlight(snippet)
+            results.append(posts[pk])
+    number = 2 if cursor_key is not None and rows else 1
+    paginator = Paginator(results, per_page)
+    paginator.num_pages = number + 1 if has_next else number
+    page = Page(results, number, paginator)
+    page.keyset = True
+    page.next_cursor = (
+        encode_cursor(rows[-1][1], rows[-1][0]) if has_next else None
+    )
+    page.previous_cursor = None
+    return page
@@ -0,0 +1,249 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (
+    conditional, counters, feed, group_stats, page_cache, search, tasks,
+    thumbnails, trending
+)
+from .constants import INDEX_PAGE_CACHE
+from .models import (
+    Comment, Counter, Follow, Group, GroupStats, Post, User
+)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    """Раскладывает новый пост по лентам подписчиков.
+
+    Немногим подписчикам — сразу, чтобы пост был в ленте после ответа;
+    остальным — задачей в очереди, чтобы не задерживать автора.
+    """
+    if not created or raw:
+        return
+    followers = counters.get(Counter.AUTHOR_FOLLOWERS, instance.author_id)
+    if followers <= settings.FEED_FANOUT_INLINE_FOLLOWERS:
+        feed.fan_out(instance, followers)
+    else:
+        tasks.fan_out_post.enqueue(
+            instance.pk, dedup_key=f'fan_out:{instance.pk}'
+        )
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    """Заполняет ленту постами автора после подписки."""
+    if created and not raw:
+        feed.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    """Чистит ленту после отписки."""
+    feed.prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_state(sender, instance, raw=False, **kwargs):
+    """Запоминает прежние группу, картинку и текст перед редактированием."""
+    if instance.pk and not raw:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'text'
+        ).first()
+        if old is not None:
+            (
+                instance._old_group_id,
+                instance._old_image,
+                instance._old_text,
+            ) = old
+
+
+# Стоит раньше count_post: тот переписывает _old_group_id.
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_versions(sender, instance, raw=False, **kwargs):
+    """Меняет версии страниц, на которых виден пост."""
+    if raw:
+        return
+    conditional.bump(
+        conditional.ALL,
+        conditional.post_scope(instance.pk),
+        conditional.author_scope(instance.author_id),
+        conditional.group_scope(instance.group_id),
+        conditional.group_scope(
+            getattr(instance, '_old_group_id', instance.group_id)
+        ),
+    )
+
+
+@receiver(post_save, sender=Post)
+def count_post(sender, instance, created, raw=False, **kwargs):
+    """Обновляет счетчики постов автора и группы и сводку группы."""
+    if raw:
+        return
+    if created:
+        counters.incr(Counter.AUTHOR_POSTS, instance.author_id)
+        counters.incr(Counter.GROUP_POSTS, instance.group_id)
+        group_stats.add_post(instance)
+        return
+    old_group_id = getattr(instance, '_old_group_id', instance.group_id)
+    if old_group_id != instance.group_id:
+        counters.incr(Counter.GROUP_POSTS, old_group_id, -1)
+        counters.incr(Counter.GROUP_POSTS, instance.group_id)
+        group_stats.remove_post(old_group_id, instance.pk)
+        group_stats.add_post(instance)
+        trending.move_post(instance, old_group_id)
+        instance._old_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def uncount_post(sender, instance, **kwargs):
+    """Вычитает удаленный пост из счетчиков, сводки и популярных."""
+    counters.incr(Counter.AUTHOR_POSTS, instance.author_id, -1)
+    counters.incr(Counter.GROUP_POSTS, instance.group_id, -1)
+    counters.reset(Counter.POST_COMMENTS, instance.pk)
+    group_stats.remove_post(instance.group_id, instance.pk)
+    trending.forget_post(instance)
+
+
+@receiver(post_save, sender=Group)
+def create_group_stats(sender, instance, created, raw=False, **kwargs):
+    """Пустая группа тоже видна в каталоге."""
+    if created and not raw:
+        GroupStats.objects.get_or_create(group=instance)
+
+
+@receiver(post_save, sender=Comment)
+def count_comment(sender, instance, created, raw=False, **kwargs):
+    """Прибавляет комментарий к счетчику поста."""
+    if created and not raw:
+        counters.incr(Counter.POST_COMMENTS, instance.post_id)
+
+
+@receiver(post_save, sender=Comment)
+def score_comment(sender, instance, created, raw=False, **kwargs):
+    """Комментарий поднимает пост в популярных."""
+    if created and not raw:
+        # add_comment сохраняет комментарий с уже загруженным постом:
+        # группа для доски берется из него без запроса.
+        trending.record_comment(
+            instance.post_id, instance.post.group_id, instance.created
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def uncount_comment(sender, instance, **kwargs):
+    """Вычитает удаленный комментарий из счетчика поста."""
+    counters.incr(Counter.POST_COMMENTS, instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, raw=False, **kwargs):
+    """Прибавляет подписку к подписчикам автора и подпискам читателя."""
+    if created and not raw:
+        counters.incr(Counter.AUTHOR_FOLLOWERS, instance.author_id)
+        counters.incr(Counter.AUTHOR_FOLLOWING, instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def uncount_follow(sender, instance, **kwargs):
+    """Вычитает отписку из счетчиков автора и читателя."""
+    counters.incr(Counter.AUTHOR_FOLLOWERS, instance.author_id, -1)
+    counters.incr(Counter.AUTHOR_FOLLOWING, instance.user_id, -1)
+
+
+# Стоит после uncount_follow: читает уже уменьшенный счетчик. Удаление
+# идет в транзакции на запись, поэтому порог пересекает одна отписка.
+@receiver(post_delete, sender=Follow)
+def restore_feeds(sender, instance, **kwargs):
+    """Автор перестал быть популярным: его посты — в ленты подписчиков."""
+    followers = counters.get(Counter.AUTHOR_FOLLOWERS, instance.author_id)
+    if followers != settings.FEED_POPULAR_AUTHOR_FOLLOWERS - 1:
+        return
+    if followers <= settings.FEED_FANOUT_INLINE_FOLLOWERS:
+        feed.backfill_author(instance.author_id)
+    else:
+        tasks.backfill_author_feeds.enqueue(
+            instance.author_id,
+            dedup_key=f'backfill_author:{instance.author_id}',
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_index(sender, raw=False, **kwargs):
+    """Сбрасывает кеш главной страницы после изменений."""
+    if not raw:
+        page_cache.invalidate(INDEX_PAGE_CACHE)
+
+
+@receiver(post_save, sender=User)
+def invalidate_index_on_rename(sender, update_fields=None, raw=False,
+                               **kwargs):
+    """Имена авторов есть на главной; вход пользователя их не меняет."""
+    if not raw and update_fields != frozenset({'last_login'}):
+        page_cache.invalidate(INDEX_PAGE_CACHE)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, created, raw=False, **kwargs):
+    """Создает миниатюры новой картинки, не дожидаясь читателей."""
+    if raw or not instance.image:
+        return
+    if created or getattr(instance, '_old_image', None) != instance.image.name:
+        thumbnails.schedule(instance.image.name)
+        instance._old_image = instance.image.name
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, created, raw=False, **kwargs):
+    """Обновляет пост в поисковом индексе, если изменился текст."""
+    if raw:
+        return
+    if created or getattr(instance, '_old_text', None) != instance.text:
+        search.index_post(instance.pk, instance.text, created)
+        instance._old_text = instance.text
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        conditional.bump(conditional.post_scope(instance.post_id))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_versions(sender, instance, raw=False, **kwargs):
+    """Подписка меняет ленту подписчика и счетчики обоих профилей."""
+    if not raw:
+        conditional.bump(
+            conditional.follower_scope(instance.user_id),
+            conditional.author_scope(instance.user_id),
+            conditional.author_scope(instance.author_id),
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_versions(sender, instance, raw=False, **kwargs):
+    if not raw:
+        conditional.bump(
+            conditional.ALL,
+            conditional.GROUPS,
+            conditional.group_scope(instance.pk),
+        )
+
+
+@receiver(post_save, sender=User)
+def bump_user_versions(sender, update_fields=None, raw=False, **kwargs):
+    """Имена пользователей видны на всех страницах."""
+    if not raw and update_fields != frozenset({'last_login'}):
+        conditional.bump(conditional.ALL, conditional.USERS)
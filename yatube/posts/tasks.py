@@ -0,0 +1,26 @@
+"""Фоновые задачи постов для очереди core.tasks."""
+from core.tasks import task
+
+from . import feed, thumbnails
+from .models import Post
+
+
+@task
+def fan_out_post(post_id):
+    """Раскладывает пост по лентам, если его еще не удалили."""
+    post = Post.objects.filter(pk=post_id).only(
+        'pk', 'author_id', 'pub_date'
+    ).first()
+    if post is not None:
+        feed.fan_out(post)
+
+
+@task
+def backfill_author_feeds(author_id):
+    """Раскладывает посты автора, переставшего быть популярным."""
+    feed.backfill_author(author_id)
+
+
+@task
+def generate_thumbnails(image_name):
+    thumbnails.generate(image_name)
@@ -0,0 +1,11 @@
+from django import template
+
+from ..cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(page_obj, group_link=False):
+    """Отрисованные карточки постов страницы."""
+    return render_cards(list(page_obj), group_link)
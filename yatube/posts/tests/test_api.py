@@ -0,0 +1,103 @@
+import gzip
+import json
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from ..constants import NUMBER_OF_POSTS
+from ..models import Comment, Group, Post, User
+
+
+class ApiTest(TestCase):
+    """Тестирование JSON API."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.author, group=cls.group)
+            for i in range(NUMBER_OF_POSTS + 2)
+        )
+        cls.post = Post.objects.latest('pub_date', 'id')
+        Comment.objects.create(
+            post=cls.post, author=cls.author, text='Комментарий'
+        )
+
+    def get_json(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        return response, json.loads(response.content)
+
+    def test_feeds_paginated_by_cursor(self):
+        """Ленты отдаются страницами, следующая — по ссылке next."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_posts', kwargs={'slug': 'test-slug'}),
+            reverse('posts:api_profile', kwargs={'username': 'Nemo'}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                _, first = self.get_json(url)
+                self.assertEqual(len(first['results']), NUMBER_OF_POSTS)
+                self.assertEqual(first['results'][0]['author'], 'Nemo')
+                self.assertEqual(first['results'][0]['group'], 'test-slug')
+                second = json.loads(self.client.get(first['next']).content)
+                self.assertEqual(len(second['results']), 2)
+                self.assertIsNone(second['next'])
+
+    def test_fields_selection(self):
+        """?fields= оставляет только нужные поля, лишние дают 400."""
+        _, data = self.get_json(
+            reverse('posts:api_post_detail', kwargs={'post_id': self.post.id}),
+            fields='id,text',
+        )
+        self.assertEqual(data, {'id': self.post.id, 'text': self.post.text})
+        response, data = self.get_json(
+            reverse('posts:api_index'), fields='id,password'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', data['error'])
+
+    def test_no_model_instances(self):
+        """Ответ строится из values() без объектов моделей."""
+        with mock.patch.object(Post, 'from_db') as from_db:
+            self.client.get(reverse('posts:api_index'))
+        from_db.assert_not_called()
+
+    def test_comments(self):
+        """Комментарии поста отдаются списком, для чужого поста — 404."""
+        _, data = self.get_json(reverse(
+            'posts:api_post_comments', kwargs={'post_id': self.post.id}
+        ))
+        self.assertEqual(data['results'][0]['text'], 'Комментарий')
+        response, _ = self.get_json(reverse(
+            'posts:api_post_comments', kwargs={'post_id': 0}
+        ))
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_and_gzip(self):
+        """Повторный запрос с ETag дает 304, ответ сжимается gzip."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(
+            len(json.loads(gzip.decompress(response.content))['results']),
+            NUMBER_OF_POSTS,
+        )
+        response = self.client.get(
+            url,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=response['ETag'],
+        )
+        self.assertEqual(response.status_code, 304)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,88 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Counter, Follow, Group, Post, User
+
+
+class CountersTest(TestCase):
+    """Тестирование денормализованных счетчиков."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.user = User.objects.create(username='Unknown')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа_2',
+            slug='test-slug_2',
+            description='Тестовое описание_2',
+        )
+
+    def setUp(self):
+        self.post = Post.objects.create(
+            text='Тестовый пост',
+            author=self.author,
+            group=self.group,
+        )
+
+    def test_counters_follow_changes(self):
+        """Счетчики меняются при создании и удалении объектов."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertEqual(
+            counters.for_author(self.author.id),
+            {'posts': 1, 'followers': 1, 'following': 0},
+        )
+        self.assertEqual(counters.for_author(self.user.id)['following'], 1)
+        self.assertEqual(counters.get(Counter.POST_COMMENTS, self.post.id), 1)
+        self.assertEqual(counters.get(Counter.GROUP_POSTS, self.group.id), 1)
+        comment.delete()
+        follow.delete()
+        self.assertEqual(counters.get(Counter.POST_COMMENTS, self.post.id), 0)
+        self.assertEqual(counters.for_author(self.author.id)['followers'], 0)
+
+    def test_regroup_moves_counter(self):
+        """Смена группы переносит пост между счетчиками групп."""
+        self.post.group = self.group_2
+        self.post.save()
+        self.assertEqual(counters.get(Counter.GROUP_POSTS, self.group.id), 0)
+        self.assertEqual(
+            counters.get(Counter.GROUP_POSTS, self.group_2.id), 1
+        )
+        self.post.delete()
+        self.assertEqual(
+            counters.get(Counter.GROUP_POSTS, self.group_2.id), 0
+        )
+        self.assertEqual(counters.for_author(self.author.id)['posts'], 0)
+
+    def test_rebuild_counters(self):
+        """Команда находит и исправляет расхождения."""
+        Post.objects.bulk_create([
+            Post(text='Без сигналов', author=self.author, group=self.group)
+        ])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+        call_command('rebuild_counters', chunk_size=1, stdout=StringIO())
+        call_command('rebuild_counters', check=True, stdout=StringIO())
+        self.assertEqual(counters.for_author(self.author.id)['posts'], 2)
+
+    def test_profile_reads_counters(self):
+        """Профиль не считает посты и подписки COUNT-запросами."""
+        client = Client()
+        # Первый запрос — поиск автора для валидаторов conditional GET.
+        with self.assertNumQueries(4):
+            response = client.get(
+                reverse('posts:profile', kwargs={'username': self.author})
+            )
+        self.assertEqual(response.context['counters']['posts'], 1)
@@ -0,0 +1,133 @@
+import gzip
+import json
+import shutil
+import tempfile
+from io import StringIO
+from os import path
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportDataTest(TestCase):
+    """Тестирование потоковой выгрузки."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='leo')
+        cls.reader = User.objects.create(username='reader')
+        cls.group = Group.objects.create(
+            slug='cats', title='Коты', description='Про котов'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(5)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Мяу'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def export(self, *args):
+        call_command(
+            'export_data', *args, output_dir=self.directory,
+            chunk_size=2, stdout=StringIO(),
+        )
+
+    def read(self, name):
+        file_path = path.join(self.directory, name)
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(file_path, 'rt', encoding='utf-8') as stream:
+            return stream.read()
+
+    def test_export_round_trip(self):
+        """Выгрузка загружается обратно командой import_data."""
+        self.export('--gzip')
+        posts = [
+            json.loads(line)
+            for line in self.read('posts.jsonl.gz').splitlines()
+        ]
+        self.assertEqual(
+            [post['id'] for post in posts],
+            [post.pk for post in self.posts],
+        )
+        self.assertEqual(posts[0]['author'], 'leo')
+        self.assertEqual(posts[0]['group'], 'cats')
+        expected = list(Post.objects.order_by('pk').values_list(
+            'pk', 'text', 'pub_date', 'author__username', 'group__slug'
+        ))
+        Post.objects.all().delete()
+        Group.objects.all().delete()
+        for kind in ('groups', 'posts', 'comments', 'follows'):
+            call_command(
+                'import_data', kind,
+                path.join(self.directory, f'{kind}.jsonl.gz'),
+                stdout=StringIO(),
+            )
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'pk', 'text', 'pub_date', 'author__username', 'group__slug'
+            )),
+            expected,
+        )
+        self.assertEqual(Comment.objects.get().text, 'Мяу')
+
+    def test_resume_from_checkpoint(self):
+        """Прерванная выгрузка продолжается без потерь и повторов."""
+        self.export('posts', '--format', 'csv')
+        file_path = path.join(self.directory, 'posts.csv')
+        with open(file_path, 'rb') as stream:
+            full = stream.read()
+        # Выгрузка «упала» после первой пачки, дописав часть второй.
+        first_chunk = full.index(b'\n', full.index('Пост 1'.encode())) + 1
+        with open(file_path, 'r+b') as stream:
+            stream.truncate(first_chunk + 5)
+        checkpoint_path = path.join(self.directory, 'checkpoint.json')
+        with open(checkpoint_path) as stream:
+            checkpoint = json.load(stream)
+        checkpoint['kinds']['posts'] = {
+            'last_pk': self.posts[1].pk,
+            'offset': first_chunk,
+            'done': False,
+        }
+        with open(checkpoint_path, 'w') as stream:
+            json.dump(checkpoint, stream)
+        self.export('posts', '--format', 'csv', '--resume')
+        with open(file_path, 'rb') as stream:
+            self.assertEqual(stream.read(), full)
+        self.assertTrue(full.startswith(b'id,text,pub_date,'))
+        self.assertEqual(full.count('Пост'.encode()), 5)
+
+    def test_admin_endpoint(self):
+        """Выгрузка по ссылке доступна только персоналу."""
+        url = reverse('posts:export_data', kwargs={'kind': 'posts'})
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get(url).status_code, 302)
+        staff = User.objects.create(username='admin', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(
+            url, {'format': 'csv', 'after': self.posts[2].pk}
+        )
+        self.assertTrue(response.streaming)
+        self.assertIn('posts.csv', response['Content-Disposition'])
+        body = b''.join(response.streaming_content).decode()
+        self.assertNotIn('id,text', body)
+        self.assertEqual(body.count('Пост'), 2)
+        response = self.client.get(url, {'gzip': '1'})
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)
+        ).splitlines()
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(self.client.get(
+            reverse('posts:export_data', kwargs={'kind': 'users'})
+        ).status_code, 404)
@@ -1,15 +1,43 @@
+import os
 import shutil
+import subprocess
+import sys
 import tempfile
 from http import HTTPStatus
+from io import BytesIO
+from unittest import mock
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from PIL import Image
+
+from ..forms import PostForm
+from ..images import process_upload
 from ..models import Comment, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+BIG_UPLOAD_SIZE = 50 * 10 ** 6
+# Скрипт для отдельного процесса: пиковый RSS родителя тестов
+# уже велик и не покажет прирост от обработки.
+BIG_UPLOAD_SCRIPT = '''
+import resource, shutil, sys, django
+django.setup()
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
+from posts.images import process_upload
+
+upload = TemporaryUploadedFile('big.jpg', 'image/jpeg', 0, None)
+with open(sys.argv[1], 'rb') as source:
+    shutil.copyfileobj(source, upload)
+upload.size = upload.tell()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+result = process_upload(upload)
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(after - before, max(Image.open(result).size))
+'''
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -75,9 +103,23 @@ class PostFormTests(TestCase):
         self.assertEqual(new_posts[0].text, form_data['text'])
         self.assertEqual(new_posts[0].group.id, form_data['group'])
         self.assertEqual(new_posts[0].author, self.author)
-        self.assertEqual(
-            new_posts[0].image,
-            'posts/' + form_data['image'].name
+        # Картинки пережимаются в JPEG.
+        self.assertEqual(new_posts[0].image, 'posts/small.jpg')
+
+    @override_settings(THUMBNAIL_PREGENERATE_IN_BACKGROUND=False)
+    def test_thumbnails_created_on_upload(self):
+        """Миниатюры создаются сразу после загрузки картинки."""
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Пост с картинкой', 'image': SimpleUploadedFile(
+                    name='thumb.gif',
+                    content=self.small_gif,
+                    content_type='image/gif'
+                )},
+            )
+        get_thumbnail.assert_called_once_with(
+            'posts/thumb.jpg', '960x339', crop='center', upscale=True
         )
 
     def test_post_edit(self):
@@ -98,6 +140,88 @@ class PostFormTests(TestCase):
         self.assertEqual(edit_post.author, self.author)
 
 
+class PostImageProcessingTests(TestCase):
+    """Тестирование обработки загруженных картинок."""
+    def upload(self, image, name='photo.png', fmt='PNG', **save_kwargs):
+        buffer = BytesIO()
+        image.save(buffer, fmt, **save_kwargs)
+        return SimpleUploadedFile(name, buffer.getvalue())
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_image_downscaled_to_progressive_jpeg(self):
+        """Картинка уменьшается и пережимается в прогрессивный JPEG."""
+        result = process_upload(self.upload(Image.new('RGBA', (400, 200))))
+        image = Image.open(result)
+        self.assertEqual(result.name, 'photo.jpg')
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (100, 50))
+        self.assertTrue(image.info.get('progressive'))
+
+    def test_exif_orientation_applied(self):
+        """Поворот из EXIF применяется к пикселям."""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        upload = self.upload(
+            Image.new('RGB', (40, 20)), 'photo.jpg', 'JPEG', exif=exif
+        )
+        self.assertEqual(Image.open(process_upload(upload)).size, (20, 40))
+
+    @override_settings(POST_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_rejected(self):
+        """Слишком большая по пикселям картинка отклоняется формой."""
+        form = PostForm(
+            data={'text': 'Текст'},
+            files={'image': self.upload(Image.new('RGB', (20, 20)))},
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_truncated_jpeg_rejected(self):
+        """Обрезанный JPEG дает ошибку формы, а не 500."""
+        buffer = BytesIO()
+        Image.radial_gradient('L').resize((3000, 2000)).save(buffer, 'JPEG')
+        data = buffer.getvalue()
+        author = User.objects.create(username='Truncated')
+        client = Client()
+        client.force_login(author)
+        response = client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Текст',
+                'image': SimpleUploadedFile(
+                    'photo.jpg', data[:len(data) // 3], 'image/jpeg'
+                ),
+            },
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertFormError(
+            response, 'form', 'image', 'Не удалось прочитать картинку.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_big_upload_memory_bounded(self):
+        """Обработка загрузки на 50 МБ не держит ее в памяти целиком."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'big.jpg')
+            # JPEG на 48 Мп, дополненный нулями после маркера EOI до 50 МБ.
+            image = Image.radial_gradient('L').resize((8000, 6000))
+            image.convert('RGB').save(path, 'JPEG', quality=95)
+            with open(path, 'ab') as file:
+                file.write(bytes(BIG_UPLOAD_SIZE - os.path.getsize(path)))
+            output = subprocess.run(
+                [sys.executable, '-c', BIG_UPLOAD_SCRIPT, path],
+                cwd=settings.BASE_DIR,
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout
+        growth, side = map(int, output.split())
+        self.assertEqual(side, settings.POST_IMAGE_MAX_SIDE)
+        # Полное декодирование 48 Мп в RGB заняло бы 144 МБ,
+        # а сама загрузка — 50.
+        self.assertLess(growth, 64 * 1024)
+
+
 class CommentFormTests(TestCase):
     """Тестирование формы комментариев."""
     @classmethod
@@ -0,0 +1,72 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase, override_settings
+
+from .. import counters
+from ..models import Comment, Counter, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class GenerateDataTest(TestCase):
+    """Тестирование генератора синтетических данных."""
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def generate(self, seed, now=None):
+        call_command(
+            'generate_data', users=50, groups=3, posts=300, comments=200,
+            follows=400, image_ratio=0.1, seed=seed, now=now,
+            stdout=StringIO(),
+        )
+
+    def snapshot(self):
+        return (
+            list(User.objects.order_by('pk').values_list(
+                'username', 'date_joined'
+            )),
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'author', 'group', 'pub_date'
+            )),
+            list(Follow.objects.order_by('pk').values_list('user', 'author')),
+            list(Comment.objects.order_by('pk').values_list(
+                'post', 'text', 'created'
+            )),
+        )
+
+    def test_counts_and_distributions(self):
+        """Создается сколько просили, подписчики распределены неравно."""
+        self.generate(seed=1)
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertFalse(Comment.objects.filter(
+            created__lt=F('post__pub_date')
+        ).exists())
+        followers = sorted(
+            (counters.get(Counter.AUTHOR_FOLLOWERS, pk)
+             for pk in User.objects.values_list('pk', flat=True)),
+            reverse=True,
+        )
+        # При равном распределении у десятой части авторов была бы
+        # десятая часть подписчиков.
+        self.assertGreater(sum(followers[:5]), sum(followers) / 4)
+
+    def test_same_seed_same_data(self):
+        """Одно зерно — одни и те же данные."""
+        self.generate(seed=7, now='2024-01-01T12:00:00+00:00')
+        first = self.snapshot()
+        for model in (Comment, Follow, Post, Group, User):
+            model.objects.all().delete()
+        self.generate(seed=7, now='2024-01-01T12:00:00+00:00')
+        self.assertEqual(self.snapshot(), first)
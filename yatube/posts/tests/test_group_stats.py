@@ -0,0 +1,108 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, GroupStats, Post, User
+
+
+class GroupStatsTest(TestCase):
+    """Тестирование сводок групп и каталога сообществ."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Пустая группа',
+            slug='empty',
+            description='Без постов',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.old = Post.objects.create(
+            text='Старый пост', author=self.author, group=self.group
+        )
+        self.new = Post.objects.create(
+            text='Новый пост', author=self.author, group=self.group
+        )
+
+    def stats(self, group):
+        return GroupStats.objects.get(group=group)
+
+    def assertStats(self, group, count, last_post):
+        stats = self.stats(group)
+        self.assertEqual(stats.posts_count, count)
+        self.assertEqual(stats.last_post, last_post)
+        self.assertEqual(
+            stats.last_activity, last_post and last_post.pub_date
+        )
+
+    def test_create_and_delete(self):
+        """Сводка следует за созданием и удалением постов."""
+        self.assertStats(self.group, 2, self.new)
+        self.assertStats(self.group_2, 0, None)
+        self.new.delete()
+        self.assertStats(self.group, 1, self.old)
+        self.old.delete()
+        self.assertStats(self.group, 0, None)
+
+    def test_regroup(self):
+        """Перенос поста меняет сводки обеих групп."""
+        self.new.group = self.group_2
+        self.new.save()
+        self.assertStats(self.group, 1, self.old)
+        self.assertStats(self.group_2, 1, self.new)
+        # Старый пост не вытесняет более новый.
+        self.old.group = self.group_2
+        self.old.save()
+        self.assertStats(self.group, 0, None)
+        self.assertStats(self.group_2, 2, self.new)
+
+    def test_older_post_keeps_last(self):
+        """Пост с ранней датой не становится последним."""
+        Post.objects.filter(pk=self.old.pk).update(
+            pub_date=self.new.pub_date + timedelta(days=1)
+        )
+        self.old.refresh_from_db()
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertStats(self.group, 2, self.old)
+        self.new.delete()
+        self.assertStats(self.group, 1, self.old)
+
+    def test_rebuild(self):
+        """Команда пересчета чинит и создает сводки."""
+        GroupStats.objects.filter(group=self.group).update(
+            posts_count=7, last_post=None
+        )
+        GroupStats.objects.filter(group=self.group_2).delete()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', check=True, stdout=StringIO())
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertStats(self.group, 2, self.new)
+        self.assertStats(self.group_2, 0, None)
+
+    def test_directory(self):
+        """Каталог читает все группы одним запросом."""
+        for number in range(5):
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'group{number}',
+                description='Описание',
+            )
+        # Первый запрос — версия страницы для conditional GET из кеша.
+        with self.assertNumQueries(1):
+            response = Client().get(reverse('posts:group_index'))
+        groups = list(response.context['groups'])
+        self.assertEqual(len(groups), Group.objects.count())
+        self.assertEqual(groups[0].group, self.group)
+        self.assertEqual(groups[0].posts_count, 2)
+        self.assertContains(response, self.new.text)
@@ -0,0 +1,125 @@
+import json
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from os import path
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from .. import counters, search
+from ..models import (
+    Comment, Counter, FeedEntry, Follow, Group, GroupStats, Post, User
+)
+
+
+class ImportDataTest(TestCase):
+    """Тестирование массовой загрузки данных."""
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        file_path = path.join(self.directory, name)
+        with open(file_path, 'w', encoding='utf-8') as stream:
+            stream.write(content)
+        return file_path
+
+    def write_jsonl(self, name, rows):
+        return self.write(
+            name, ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+
+    def load(self, kind, file_path, *args):
+        out = StringIO()
+        call_command(
+            'import_data', kind, file_path, *args,
+            stdout=out, stderr=StringIO(),
+        )
+        return out.getvalue()
+
+    def test_import_all_kinds(self):
+        """Загрузка создает объекты, счетчики, сводки, индекс и ленты."""
+        self.load('groups', self.write(
+            'groups.csv',
+            'slug,title,description\ncats,Коты,Про котов\n',
+        ))
+        self.load('posts', self.write_jsonl('posts.jsonl', [
+            {'id': 10, 'text': 'Старый пост про котов', 'author': 'leo',
+             'group': 'cats', 'pub_date': '2015-03-01T12:00:00'},
+            {'id': 11, 'text': 'Второй пост', 'author': 'leo'},
+        ]))
+        self.load('follows', self.write_jsonl('follows.jsonl', [
+            {'user': 'reader', 'author': 'leo'},
+        ]))
+        output = self.load('comments', self.write(
+            'comments.csv', 'post,author,text\n10,reader,Мяу\n',
+        ))
+        post = Post.objects.get(pk=10)
+        self.assertEqual(post.group.slug, 'cats')
+        self.assertEqual(
+            post.pub_date, datetime(2015, 3, 1, 12, tzinfo=timezone.utc)
+        )
+        self.assertFalse(post.author.has_usable_password())
+        reader = User.objects.get(username='reader')
+        self.assertEqual(counters.get(Counter.AUTHOR_POSTS, post.author_id), 2)
+        self.assertEqual(counters.get(Counter.GROUP_POSTS, post.group_id), 1)
+        stats = GroupStats.objects.get(group=post.group)
+        self.assertEqual((stats.posts_count, stats.last_post_id), (1, 10))
+        self.assertEqual(counters.get(Counter.POST_COMMENTS, post.pk), 1)
+        self.assertEqual(
+            counters.get(Counter.AUTHOR_FOLLOWERS, post.author_id), 1
+        )
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 2)
+        self.assertEqual(
+            [row.pk for row in search.search('котов', 10)], [post.pk]
+        )
+        self.assertEqual(Comment.objects.get().author, reader)
+        self.assertIn('строк/с', output)
+
+    def test_duplicates_skip_or_update(self):
+        """Дубликаты по id пропускаются или обновляются."""
+        author = User.objects.create(username='leo')
+        Post.objects.create(pk=1, text='Было', author=author)
+        file_path = self.write_jsonl('posts.jsonl', [
+            {'id': 1, 'text': 'Стало', 'author': 'leo'},
+            {'id': 2, 'text': 'Новый', 'author': 'leo'},
+        ])
+        output = self.load('posts', file_path)
+        self.assertIn('Создано 1, обновлено 0, пропущено 1', output)
+        self.assertEqual(Post.objects.get(pk=1).text, 'Было')
+        output = self.load('posts', file_path, '--on-duplicate', 'update')
+        self.assertIn('Создано 0, обновлено 2, пропущено 0', output)
+        self.assertEqual(Post.objects.get(pk=1).text, 'Стало')
+
+    def test_invalid_rows_are_reported(self):
+        """Плохие строки пропускаются, остальные загружаются."""
+        User.objects.create(username='leo')
+        file_path = self.write('follows.jsonl', '\n'.join([
+            'не json',
+            json.dumps({'user': 'leo', 'author': 'leo'}),
+            json.dumps({'user': 'leo'}),
+            json.dumps({'user': 'leo', 'author': 'ann'}),
+            json.dumps({'user': 'leo', 'author': 'ann'}),
+        ]))
+        output = self.load('follows', file_path, '--batch-size', '2')
+        self.assertIn(
+            'Создано 1, обновлено 0, пропущено 1, с ошибками 3', output
+        )
+        self.assertEqual(Follow.objects.get().author.username, 'ann')
+
+    def test_unknown_group_and_post(self):
+        """Ссылки на несуществующие группы и посты считаются ошибками."""
+        Group.objects.create(slug='cats', title='Коты', description='')
+        self.load('posts', self.write_jsonl('posts.jsonl', [
+            {'text': 'Пост', 'author': 'leo', 'group': 'dogs'},
+        ]))
+        output = self.load('comments', self.write_jsonl('comments.jsonl', [
+            {'post': 404, 'author': 'leo', 'text': 'Мяу'},
+        ]))
+        self.assertFalse(Post.objects.exists())
+        self.assertIn('с ошибками 1', output)
+        self.assertFalse(Comment.objects.exists())
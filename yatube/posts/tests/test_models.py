@@ -1,7 +1,8 @@
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
 from ..constants import TEXT_LIM
-from ..models import Group, Post, User
+from ..models import Follow, Group, Post, User
 
 
 class PostModelTest(TestCase):
@@ -56,3 +57,15 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, value
                 )
+
+    def test_follow_constraints(self):
+        """Нельзя подписаться дважды или на самого себя."""
+        user = User.objects.create(username='Unknown')
+        Follow.objects.create(user=user, author=self.author)
+        for follower in (user, self.author):
+            with self.subTest(follower=follower):
+                with self.assertRaises(IntegrityError):
+                    with transaction.atomic():
+                        Follow.objects.create(
+                            user=follower, author=self.author
+                        )
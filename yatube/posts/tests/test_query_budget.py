@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import Client, TestCase, override_settings
+from django.urls import URLPattern, reverse
+
+from core.query_budget import (
+    QueryBudget, QueryBudgetExceeded, assert_within_budget, declared_budget,
+    query_budget
+)
+
+from .. import urls
+from ..constants import COMMENTS_PER_PAGE, NUMBER_OF_POSTS
+from ..models import Comment, Follow, Group, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    THUMBNAIL_PREGENERATE_IN_BACKGROUND=False,
+    PAGE_CACHE_REFRESH_IN_BACKGROUND=False,
+)
+class QueryBudgetTest(TestCase):
+    """Виды posts укладываются в объявленный бюджет запросов.
+
+    Данных больше страницы, у комментариев и постов разные авторы
+    и группы: так N+1 сразу выходит за бюджет.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='reader')
+        authors = [
+            User.objects.create(username=f'author{number}')
+            for number in range(3)
+        ]
+        cls.author = authors[0]
+        groups = [
+            Group.objects.create(
+                title=f'Группа {number}', slug=f'group{number}',
+                description='Описание',
+            )
+            for number in range(3)
+        ]
+        cls.group = groups[0]
+        for number in range(NUMBER_OF_POSTS + 3):
+            Post.objects.create(
+                text=f'Пост {number}',
+                author=authors[number % 3],
+                group=groups[number % 3],
+                image=SimpleUploadedFile(
+                    f'small{number}.gif', SMALL_GIF, content_type='image/gif'
+                ) if number % 4 == 0 else '',
+            )
+        cls.post = Post.objects.filter(author=cls.author).first()
+        for number in range(COMMENTS_PER_PAGE + 3):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create(username=f'commenter{number}'),
+                text=f'Комментарий {number}',
+            )
+        for author in authors:
+            Follow.objects.create(user=cls.user, author=author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        self.client = Client()
+        self.client.force_login(self.user)
+        cache.clear()
+
+    def requests(self):
+        """(имя URL, аргументы, метод, данные) для каждого вида."""
+        post = {'post_id': self.post.pk}
+        author = {'username': self.author.username}
+        return [
+            ('index', {}, 'get', {}),
+            ('group_index', {}, 'get', {}),
+            ('group_list', {'slug': self.group.slug}, 'get', {}),
+            ('popular', {}, 'get', {}),
+            ('group_popular', {'slug': self.group.slug}, 'get', {}),
+            ('profile', author, 'get', {}),
+            ('post_detail', post, 'get', {}),
+            ('post_comments', post, 'get', {}),
+            ('post_search', {}, 'get', {'q': 'пост'}),
+            ('post_create', {}, 'get', {}),
+            ('post_create', {}, 'post', {'text': 'Новый', 'group': ''}),
+            ('post_edit', post, 'get', {}),
+            ('post_edit', post, 'post', {'text': 'Правка', 'group': ''}),
+            ('add_comment', post, 'post', {'text': 'Еще'}),
+            ('follow_index', {}, 'get', {}),
+            ('profile_unfollow', author, 'get', {}),
+            ('profile_follow', author, 'get', {}),
+            ('export_data', {'kind': 'posts'}, 'get', {}),
+            ('api_index', {}, 'get', {}),
+            ('api_group_posts', {'slug': self.group.slug}, 'get', {}),
+            ('api_profile', author, 'get', {}),
+            ('api_post_detail', post, 'get', {}),
+            ('api_post_comments', post, 'get', {}),
+        ]
+
+    def test_every_view_declares_budget(self):
+        """У каждого вида из posts.urls объявлен бюджет."""
+        for pattern in urls.urlpatterns:
+            if isinstance(pattern, URLPattern):
+                with self.subTest(name=pattern.name):
+                    self.assertIsNotNone(
+                        getattr(pattern.callback, 'query_budget', None)
+                    )
+        self.assertEqual(
+            {name for name, *_ in self.requests()},
+            {pattern.name for pattern in urls.urlpatterns},
+        )
+
+    def test_views_within_budget(self):
+        """Ни один вид не выходит за бюджет."""
+        for name, kwargs, method, data in self.requests():
+            with self.subTest(name=name, method=method):
+                cache.clear()
+                client = self.client
+                if name == 'post_edit':
+                    client = Client()
+                    client.force_login(self.author)
+                if name == 'export_data':
+                    client = Client()
+                    client.force_login(self.staff)
+                response = assert_within_budget(
+                    client,
+                    reverse(f'posts:{name}', kwargs=kwargs),
+                    method,
+                    data=data,
+                )
+                self.assertLess(response.status_code, 400)
+
+    def test_budget_report(self):
+        """Отчет о превышении показывает запросы и повторы."""
+        @query_budget(1)
+        def view(request):
+            for user in User.objects.all()[:2]:
+                list(user.posts.all())
+
+        with override_settings(QUERY_BUDGET_ENFORCE=True):
+            with self.assertRaises(QueryBudgetExceeded) as raised:
+                view(None)
+        message = str(raised.exception)
+        self.assertIn('3 запросов при бюджете 1', message)
+        self.assertIn('Повторяются:\n2 ×', message)
+        self.assertIn('"author_id" = ?', message)
+        with QueryBudget(3) as budget:
+            view(None)
+        self.assertEqual(len(budget.queries), 3)
+        self.assertEqual(declared_budget(reverse('posts:index')), 4)
@@ -0,0 +1,78 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+# Полный проход по таблице без индекса: «SCAN posts_post»
+# (в старых SQLite — «SCAN TABLE posts_post»).
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+( AS \w+)?$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class QueryPlanTest(TestCase):
+    """Проверка планов запросов SQLite для страниц постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.user = User.objects.create(username='Unknown')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост',
+            author=cls.author,
+            group=cls.group,
+        )
+        Comment.objects.create(
+            post=cls.post, author=cls.user, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    @staticmethod
+    def record(queries):
+        def wrapper(execute, sql, params, many, context):
+            queries.append((sql, params))
+            return execute(sql, params, many, context)
+        return wrapper
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_views_use_indexes(self):
+        """Страницы не сканируют таблицы целиком и не сортируют во временных
+        B-деревьях."""
+        pages = [
+            reverse('posts:index'),
+            reverse('posts:group_index'),
+            reverse('posts:popular'),
+            reverse('posts:group_popular', kwargs={'slug': self.group.slug}),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        ]
+        for page in pages:
+            queries = []
+            with connection.execute_wrapper(self.record(queries)):
+                self.authorized_client.get(page)
+            for sql, params in queries:
+                if not sql.startswith('SELECT'):
+                    continue
+                for detail in self.explain(sql, params):
+                    with self.subTest(page=page, sql=sql, plan=detail):
+                        self.assertIsNone(FULL_SCAN.match(detail))
+                        self.assertNotIn(TEMP_SORT, detail)
@@ -0,0 +1,79 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import search
+from ..constants import NUMBER_OF_POSTS
+from ..models import Post, User
+
+
+class SearchTest(TestCase):
+    """Тестирование полнотекстового поиска."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.url = reverse('posts:post_search')
+
+    def find(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        return response.context['page_obj']
+
+    def test_search_ranks_and_highlights(self):
+        """Посты ранжируются по bm25, совпадения подсвечиваются."""
+        rare = Post.objects.create(
+            text='Про котов и <b>собак</b>', author=self.author
+        )
+        often = Post.objects.create(
+            text='Коты, коты и снова коты', author=self.author
+        )
+        Post.objects.create(text='Про собак', author=self.author)
+        page = self.find('кот')
+        self.assertEqual(list(page), [often, rare])
+        self.assertIn('<mark>котов</mark>', page[1].snippet)
+        self.assertIn('&lt;b&gt;', page[1].snippet)
+
+    def test_index_follows_edit_and_delete(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.create(text='Старый текст', author=self.author)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(list(self.find('старый')), [])
+        self.assertEqual(list(self.find('новый')), [post])
+        post.delete()
+        self.assertEqual(list(self.find('новый')), [])
+
+    def test_fts_syntax_in_query_is_escaped(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        post = Post.objects.create(text='Кавычки и звезды', author=self.author)
+        self.assertEqual(list(self.find('"звезды*')), [post])
+        self.assertEqual(list(self.find('-(')), [])
+
+    def test_results_paginated_by_cursor(self):
+        """Следующая страница результатов открывается по курсору."""
+        Post.objects.bulk_create(
+            Post(text=f'Совпадение номер {i}', author=self.author)
+            for i in range(NUMBER_OF_POSTS + 3)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        first = self.find('совпадение')
+        self.assertEqual(len(first), NUMBER_OF_POSTS)
+        second = self.find('совпадение', after=first.next_cursor)
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertFalse(set(first) & set(second))
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идет через полнотекстовый индекс."""
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        client = Client()
+        client.force_login(admin)
+        post = Post.objects.create(text='Иголка в стоге', author=self.author)
+        Post.objects.create(text='Просто сено', author=self.author)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'иголка'}
+        )
+        self.assertEqual(list(response.context['cl'].result_list), [post])
+        self.assertEqual(search.match_query('иголка стог'), '"иголка" "стог"*')
@@ -0,0 +1,167 @@
+import pickle
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import trending
+from ..constants import NUMBER_OF_POSTS
+from ..models import Comment, Group, Post, TrendingScore, User
+
+
+class LeaderboardTest(TestCase):
+    """Тестирование доски и счета с затуханием."""
+
+    def test_order_and_size(self):
+        """Доска держит первые size постов по убыванию счета."""
+        board = trending.Leaderboard(3, [(1, 1.0), (2, 5.0), (3, 3.0)])
+        self.assertEqual(list(board.ids), [2, 3, 1])
+        board.update(4, 4.0)
+        self.assertEqual(list(board.ids), [2, 4, 3])
+        board.update(1, 0.5)
+        self.assertEqual(list(board.ids), [2, 4, 3])
+        board.update(3, 6.0)
+        self.assertEqual(list(board.ids), [3, 2, 4])
+        restored = pickle.loads(pickle.dumps(board))
+        self.assertEqual(list(restored.ids), [3, 2, 4])
+
+    def test_decay(self):
+        """Через период полураспада комментарий весит как два старых."""
+        now = timezone.now()
+        later = now + timedelta(seconds=settings.TRENDING_HALF_LIFE)
+        old = trending.weight(now)
+        self.assertAlmostEqual(
+            trending.combine(old, old), trending.weight(later)
+        )
+
+
+class TrendingTest(TestCase):
+    """Тестирование популярных постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Другая группа',
+            slug='other',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.quiet = Post.objects.create(
+            text='Тихий пост', author=self.author, group=self.group
+        )
+        self.busy = Post.objects.create(
+            text='Обсуждаемый пост', author=self.author, group=self.group
+        )
+        self.other = Post.objects.create(
+            text='Пост без группы', author=self.author
+        )
+        self.comment(self.quiet)
+        self.comment(self.busy, 3)
+        self.comment(self.other, 2)
+
+    def comment(self, post, count=1):
+        for number in range(count):
+            Comment.objects.create(
+                post=post, author=self.author, text=f'Комментарий {number}'
+            )
+
+    def ids(self, group=None):
+        return list(trending.leaderboard(group and group.pk).ids)
+
+    def commit(self):
+        """Выполняет on_commit, как после фиксации транзакции."""
+        with mock.patch.object(connection, 'validate_no_atomic_block'):
+            connection.run_and_clear_commit_hooks()
+
+    def test_comments_update_boards(self):
+        """Комментарии поднимают пост на досках сайта и группы."""
+        self.assertEqual(
+            self.ids(), [self.busy.pk, self.other.pk, self.quiet.pk]
+        )
+        self.assertEqual(self.ids(self.group), [self.busy.pk, self.quiet.pk])
+        self.comment(self.quiet, 3)
+        # До фиксации доски в кеше не меняются.
+        self.assertEqual(self.ids(self.group), [self.busy.pk, self.quiet.pk])
+        self.commit()
+        self.assertEqual(self.ids(self.group), [self.quiet.pk, self.busy.pk])
+        # Доски в кеше совпадают с построенными по таблице.
+        self.assertEqual(self.ids(), list(trending.build().ids))
+
+    def test_rollback_keeps_boards(self):
+        """Откат транзакции не оставляет на досках чужой счет."""
+        before = self.ids()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.comment(self.quiet, 5)
+                raise RuntimeError
+        self.commit()
+        self.assertEqual(self.ids(), before)
+
+    def test_recent_comments_outweigh_old(self):
+        """Старые комментарии затухают относительно новых."""
+        Comment.objects.filter(post=self.busy).update(
+            created=timezone.now() - timedelta(days=3)
+        )
+        trending.rebuild()
+        self.assertEqual(self.ids()[0], self.other.pk)
+        self.assertEqual(self.ids(self.group), [self.quiet.pk, self.busy.pk])
+
+    def test_rebuild_matches_incremental(self):
+        """Пересчет с нуля дает те же счета."""
+        scores = dict(TrendingScore.objects.values_list('post_id', 'score'))
+        self.assertEqual(trending.rebuild(), 3)
+        rebuilt = dict(TrendingScore.objects.values_list('post_id', 'score'))
+        for post_id, score in scores.items():
+            self.assertAlmostEqual(rebuilt[post_id], score)
+
+    def test_delete_and_regroup(self):
+        """Удаленный пост уходит с досок, перенесенный — в другую группу."""
+        self.ids(self.group)
+        self.busy.group = self.group_2
+        self.busy.save()
+        self.commit()
+        self.assertEqual(self.ids(self.group), [self.quiet.pk])
+        self.assertEqual(self.ids(self.group_2), [self.busy.pk])
+        self.busy.delete()
+        self.commit()
+        self.assertNotIn(self.busy.pk, self.ids())
+        self.assertEqual(self.ids(self.group_2), [])
+
+    @override_settings(TRENDING_TOP_K=NUMBER_OF_POSTS + 2)
+    def test_popular_page(self):
+        """Страница читает доску из кеша и посты одним запросом."""
+        for number in range(NUMBER_OF_POSTS):
+            post = Post.objects.create(
+                text=f'Пост {number}', author=self.author
+            )
+            self.comment(post)
+        trending.rebuild()
+        client = Client()
+        url = reverse('posts:popular')
+        client.get(url)
+        with self.assertNumQueries(1):
+            response = client.get(url)
+        posts = response.context['page_obj'].object_list
+        self.assertEqual(len(posts), NUMBER_OF_POSTS)
+        self.assertEqual(posts[0], self.busy)
+        response = client.get(url, {'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 2)
+        response = client.get(
+            reverse('posts:group_popular', args=(self.group.slug,))
+        )
+        self.assertEqual(
+            response.context['page_obj'].object_list, [self.busy, self.quiet]
+        )
@@ -34,6 +34,8 @@ class PostURLTests(TestCase):
         """Страницы доступны любому пользователю."""
         templates_url_names = [
             '/',
+            '/group/',
+            '/popular/',
             f'/group/{self.group.slug}/',
             f'/profile/{self.author}/',
             f'/posts/{self.post.id}/',
@@ -85,6 +87,8 @@ class PostURLTests(TestCase):
         """URL-адрес использует соответствующий шаблон."""
         templates_url_names = {
             '/': 'posts/index.html',
+            '/group/': 'posts/group_index.html',
+            '/popular/': 'posts/popular.html',
             f'/group/{self.group.slug}/': 'posts/group_list.html',
             f'/profile/{self.author}/': 'posts/profile.html',
             f'/posts/{self.post.id}/': 'posts/post_detail.html',
@@ -4,14 +4,25 @@ import tempfile
 from django.conf import settings
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
 
-from ..constants import NUMBER_OF_POSTS, TEST_POSTS
+from .. import page_cache, thumbnails
+from ..constants import COMMENTS_PER_PAGE, NUMBER_OF_POSTS, TEST_POSTS
 from ..forms import PostForm
-from ..models import Comment, Follow, Group, Post, User
+from ..models import Comment, FeedEntry, Follow, Group, Post, User
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x01\x00'
+    b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+    b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+    b'\x00\x00\x01\x00\x01\x00\x00\x02'
+    b'\x02\x4c\x01\x00\x3b'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -219,6 +230,298 @@ class PostViewsTests(TestCase):
             response_cache_clean.content
         )
 
+    @override_settings(PAGE_CACHE_REFRESH_IN_BACKGROUND=False)
+    def test_index_cache_refreshed_after_changes(self):
+        """После изменений отдается старая копия, а следующий запрос
+        получает обновленную страницу."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(
+            response.content, self.client.get(reverse('posts:index')).content
+        )
+        Post.objects.create(
+            author=self.user,
+            text='Проверка сброса кеша главной страницы.',
+            group=self.group
+        )
+        stale = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.content, stale.content)
+        fresh = self.client.get(reverse('posts:index'))
+        self.assertContains(fresh, 'Проверка сброса кеша главной страницы.')
+
+
+class PageCacheRefreshTest(TestCase):
+    """Тестирование обновления устаревшей копии страницы."""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(PAGE_CACHE_REFRESH_IN_BACKGROUND=False)
+    def test_refresh_uses_fresh_request(self):
+        """Копия обновляется новым запросом с тем же путем,
+        параметрами и пользователем, но без cookie."""
+        requests = []
+
+        @page_cache.cache_page_swr(key_prefix='refresh_test')
+        def view(request):
+            requests.append(request)
+            return HttpResponse(request.GET.get('page', ''))
+
+        request = RequestFactory().get('/?page=2', HTTP_COOKIE='a=b')
+        request.user = User.objects.create_user(username='reader')
+        view(request)
+        page_cache.invalidate('refresh_test')
+        view(request)
+        original, refreshed = requests
+        self.assertIsNot(refreshed, original)
+        self.assertEqual(refreshed.path, '/')
+        self.assertEqual(refreshed.GET['page'], '2')
+        self.assertEqual(refreshed.user, original.user)
+        self.assertNotIn('HTTP_COOKIE', refreshed.META)
+
+
+class PostCardCacheTest(TestCase):
+    """Тестирование кеша карточек постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Исходный текст',
+            author=self.author,
+            group=self.group,
+        )
+        self.url = reverse('posts:profile', kwargs={'username': self.author})
+
+    def test_card_taken_from_cache(self):
+        """Повторный показ не отрисовывает карточку заново."""
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertNotIn(
+            'posts/includes/post_card.html',
+            [template.name for template in response.templates]
+        )
+
+    def test_card_changes_after_edit_and_rename(self):
+        """Правка поста и переименование группы видны сразу."""
+        self.client.get(self.url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.group.title = 'Новое имя группы'
+        self.group.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Новый текст')
+        self.assertContains(response, 'Новое имя группы')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPreloadTest(TestCase):
+    """Тестирование пакетной загрузки миниатюр."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        for i in range(3):
+            Post.objects.create(
+                text=f'Пост с картинкой {i}',
+                author=cls.author,
+                image=SimpleUploadedFile(
+                    name=f'preload_{i}.gif',
+                    content=SMALL_GIF,
+                    content_type='image/gif'
+                )
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_preload_finds_existing_thumbnails(self):
+        """Готовые миниатюры находятся одним запросом."""
+        cache.clear()
+        posts = list(Post.objects.all())
+        for post in posts[:2]:
+            thumbnails.generate(post.image.name)
+        cache.clear()
+        with self.assertNumQueries(1):
+            thumbnails.preload(posts)
+        self.assertTrue(all(post.thumbnail_url for post in posts[:2]))
+        self.assertIsNone(posts[2].thumbnail_url)
+
+    def test_preload_matches_get_thumbnail(self):
+        """Имя и адрес миниатюры совпадают с публичным get_thumbnail:
+        тест ловит изменения внутренностей sorl-thumbnail."""
+        cache.clear()
+        post = Post.objects.first()
+        geometry, options = thumbnails.THUMBNAIL_SIZES[0]
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        self.assertEqual(
+            thumbnails.thumbnail_name(
+                ImageFile(post.image), geometry, options
+            ),
+            thumbnail.name,
+        )
+        thumbnails.preload([post])
+        self.assertEqual(post.thumbnail_url, thumbnail.url)
+        with self.assertNumQueries(0):
+            thumbnails.preload([post])
+        self.assertEqual(post.thumbnail_url, thumbnail.url)
+
+
+class ConditionalGetTest(TestCase):
+    """Тестирование ответов 304 по ETag."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.user = User.objects.create(username='Unknown')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='Тестовый пост', author=self.author, group=self.group
+        )
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def revalidate(self, client, url, etag):
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_not_rendered(self):
+        """Без изменений страницы отдают 304 без запросов страницы."""
+        pages = {
+            reverse('posts:index'): 0,
+            reverse('posts:group_list', kwargs={'slug': 'test-slug'}): 1,
+            reverse('posts:profile', kwargs={'username': 'Nemo'}): 1,
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}): 1,
+            reverse('posts:post_search') + '?q=пост': 0,
+        }
+        for url, lookups in pages.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                with self.assertNumQueries(lookups):
+                    response = self.revalidate(
+                        self.client, url, response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_refresh_pages(self):
+        """Правка поста и новый комментарий меняют ETag."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+        response = self.revalidate(self.client, url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        etag = self.client.get(url)['ETag']
+        self.post.text = 'Новый текст'
+        self.post.save()
+        self.assertContains(self.revalidate(self.client, url, etag), 'Новый')
+
+    def test_etag_depends_on_user_and_follows(self):
+        """ETag у каждого пользователя свой, подписка меняет ленту."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        response = self.revalidate(self.authorized_client, url, etag)
+        self.assertEqual(response.status_code, 200)
+        url = reverse('posts:follow_index')
+        etag = self.authorized_client.get(url)['ETag']
+        Follow.objects.create(user=self.user, author=self.author)
+        response = self.revalidate(self.authorized_client, url, etag)
+        self.assertContains(response, 'Тестовый пост')
+
+    def test_etag_changes_after_login_again(self):
+        """Новый вход того же пользователя меняет ETag вместе с CSRF."""
+        credentials = {'username': 'Relogin', 'password': 'password'}
+        User.objects.create_user(**credentials)
+        client = Client()
+        client.post(reverse('users:login'), credentials)
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        response = client.get(url)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        etag = response['ETag']
+        client.get(reverse('users:logout'))
+        client.post(reverse('users:login'), credentials)
+        response = self.revalidate(client, url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(PAGE_CACHE_REFRESH_IN_BACKGROUND=False)
+    def test_stale_index_copy_has_no_etag(self):
+        """Устаревшая копия главной не получает свежий ETag."""
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        Post.objects.create(text='Свежий пост', author=self.author)
+        stale = self.revalidate(self.client, url, etag)
+        self.assertEqual(stale.status_code, 200)
+        self.assertFalse(stale.has_header('ETag'))
+        fresh = self.client.get(url)
+        self.assertContains(fresh, 'Свежий пост')
+        self.assertTrue(fresh.has_header('ETag'))
+
+
+class CommentPaginationTest(TestCase):
+    """Тестирование постраничного вывода комментариев."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(username='Nemo')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.author)
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.id})
+
+    def add_comments(self, count):
+        """Добавляет count комментариев от разных авторов."""
+        start = Comment.objects.count()
+        names = [f'commenter_{i}' for i in range(start, start + count)]
+        User.objects.bulk_create(User(username=name) for name in names)
+        for author in User.objects.filter(username__in=names):
+            Comment.objects.create(
+                post=self.post, author=author, text=f'От {author.username}'
+            )
+
+    def test_comments_split_into_pages(self):
+        """Комментарии выводятся порциями, следующая — по курсору."""
+        self.add_comments(COMMENTS_PER_PAGE + 5)
+        comments = self.client.get(self.url).context['comments']
+        self.assertEqual(len(comments), COMMENTS_PER_PAGE)
+        self.assertTrue(comments.has_next())
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'after': comments.next_cursor},
+        )
+        rest = response.context['comments']
+        self.assertEqual(len(rest), 5)
+        self.assertFalse(rest.has_next())
+        self.assertFalse(set(comments) & set(rest))
+        self.assertTemplateNotUsed(response, 'base.html')
+
+    def test_query_count_does_not_grow(self):
+        """Число запросов не зависит от числа комментариев."""
+        self.add_comments(1)
+        # Пост, счетчик, комментарии и автор поста для валидаторов.
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        self.add_comments(COMMENTS_PER_PAGE * 3)
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+
 
 class PaginatorTest(TestCase):
     """Тестирование пагинатора."""
@@ -243,6 +546,9 @@ class PaginatorTest(TestCase):
             )
         Post.objects.bulk_create(cls.posts)
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         """Проверяем, что количество постов на первой странице равно 10."""
         pages = [
@@ -276,6 +582,27 @@ class PaginatorTest(TestCase):
                     TEST_POSTS - NUMBER_OF_POSTS
                 )
 
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и обратно на предыдущую страницу."""
+        first = self.client.get(reverse('posts:index')).context['page_obj']
+        self.assertTrue(first.has_next())
+        self.assertFalse(first.has_previous())
+        second = self.client.get(
+            reverse('posts:index') + f'?after={first.next_cursor}'
+        ).context['page_obj']
+        self.assertEqual(len(second), TEST_POSTS - NUMBER_OF_POSTS)
+        self.assertFalse(second.has_next())
+        self.assertTrue(set(first).isdisjoint(second))
+        back = self.client.get(
+            reverse('posts:index') + f'?before={second.previous_cursor}'
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.client.get(reverse('posts:index') + '?after=broken')
+        self.assertEqual(len(response.context['page_obj']), NUMBER_OF_POSTS)
+
 
 class FollowTest(TestCase):
     """Тестирование подписок."""
@@ -330,3 +657,68 @@ class FollowTest(TestCase):
         post = self.post
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertNotIn(post.id, response.context['page_obj'])
+
+    def test_new_post_fan_out(self):
+        """Новый пост раскладывается в ленты подписчиков."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Пост в ленту', author=self.author)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    @override_settings(FEED_FANOUT_INLINE_FOLLOWERS=1000)
+    def test_fan_out_to_many_followers(self):
+        """Пост раскладывается в ленты, даже если подписчиков много."""
+        readers = User.objects.bulk_create(
+            User(username=f'reader{number}') for number in range(600)
+        )
+        Follow.objects.bulk_create(
+            Follow(user=reader, author=self.author)
+            for reader in User.objects.filter(username__in=[
+                reader.username for reader in readers
+            ])
+        )
+        post = Post.objects.create(text='Пост в ленту', author=self.author)
+        self.assertEqual(FeedEntry.objects.filter(post=post).count(), 600)
+
+    def test_unfollow_prunes_feed(self):
+        """После отписки посты автора уходят из ленты."""
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        self.assertTrue(FeedEntry.objects.filter(user=self.user).exists())
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    @override_settings(FEED_POPULAR_AUTHOR_FOLLOWERS=1)
+    def test_popular_author_merged_on_read(self):
+        """Посты популярного автора подмешиваются при чтении ленты."""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(text='Популярный пост', author=self.author)
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post]
+        )
+
+    @override_settings(FEED_POPULAR_AUTHOR_FOLLOWERS=2)
+    def test_posts_kept_when_author_stops_being_popular(self):
+        """Посты, написанные в популярности, остаются в лентах после
+        отписки, опустившей автора ниже порога."""
+        other = User.objects.create(username='Other')
+        Follow.objects.create(user=self.user, author=self.author)
+        follow = Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(text='while popular', author=self.author)
+        url = reverse('posts:follow_index')
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post]
+        )
+        follow.delete()
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+        response = self.authorized_client.get(url)
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.post]
+        )
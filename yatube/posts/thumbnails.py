@@ -0,0 +1,123 @@
+"""Заблаговременная генерация миниатюр картинок постов.
+
+Миниатюры всех размеров из шаблонов создаются сразу после сохранения
+картинки задачей в очереди, а не первым читателем страницы. Блокировка
+на файл в общем кеше не дает двум процессам делать одну и ту же работу.
+
+preload() читает KV-хранилище пачкой, а у sorl-thumbnail для этого нет
+публичного API: имена файлов и ключи повторяют его внутренности.
+Поэтому версия sorl-thumbnail закреплена в requirements.txt, а
+ThumbnailPreloadTest сверяет результат с публичным get_thumbnail.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+# Размеры и параметры, с которыми шаблоны вызывают {% thumbnail %}.
+# Параметры должны совпадать с шаблонными, иначе имена файлов разойдутся.
+CARD_GEOMETRY = '960x339'
+THUMBNAIL_SIZES = (
+    (CARD_GEOMETRY, {'crop': 'center', 'upscale': True}),
+)
+LOCK_KEY = 'thumbnail_lock:{}'
+
+
+def generate(image_name):
+    """Создает все миниатюры одной картинки, если их никто не делает."""
+    lock_key = LOCK_KEY.format(image_name)
+    if not cache.add(lock_key, 1, settings.THUMBNAIL_LOCK_TIMEOUT):
+        return False
+    start = time.perf_counter()
+    try:
+        for geometry, options in THUMBNAIL_SIZES:
+            get_thumbnail(image_name, geometry, **options)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+        metrics.THUMBNAIL_GENERATION.observe(
+            time.perf_counter() - start, 'error'
+        )
+        return False
+    finally:
+        cache.delete(lock_key)
+    metrics.THUMBNAIL_GENERATION.observe(time.perf_counter() - start, 'ok')
+    return True
+
+
+def schedule(image_name):
+    """Ставит генерацию миниатюр в очередь задач."""
+    if not settings.THUMBNAIL_PREGENERATE_IN_BACKGROUND:
+        generate(image_name)
+        return
+    from .tasks import generate_thumbnails
+    generate_thumbnails.enqueue(
+        image_name, dedup_key=f'thumbnails:{image_name}'
+    )
+
+
+def thumbnail_name(source, geometry, options):
+    """Имя файла миниатюры так же, как его строит sorl.get_thumbnail."""
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def preload(posts):
+    """Находит готовые миниатюры карточек страницы одним запросом к KV.
+
+    Найденный адрес кладется в post.thumbnail_url; для остальных постов
+    шаблон сам вызовет {% thumbnail %} и создаст миниатюру.
+    """
+    geometry, options = THUMBNAIL_SIZES[0]
+    wanted = {}
+    for post in posts:
+        post.thumbnail_url = None
+        if post.image:
+            name = thumbnail_name(ImageFile(post.image), geometry, options)
+            thumbnail = ImageFile(name, default.storage)
+            wanted.setdefault(add_prefix(thumbnail.key), []).append(
+                (post, thumbnail)
+            )
+    if not wanted:
+        return
+    kv_cache = default.kvstore.cache
+    found = {
+        key for key, value in kv_cache.get_many(wanted).items()
+        if value != EMPTY_VALUE
+    }
+    missing = set(wanted) - found
+    metrics.cache_result(
+        'thumbnail_kv', hits=len(found), misses=len(missing)
+    )
+    if missing:
+        stored = dict(KVStore.objects.filter(
+            key__in=missing
+        ).values_list('key', 'value'))
+        if stored:
+            kv_cache.set_many(
+                stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+        found.update(stored)
+    for key in found:
+        for post, thumbnail in wanted[key]:
+            post.thumbnail_url = thumbnail.url
@@ -0,0 +1,210 @@
+"""Популярные посты: рейтинг по комментариям с затуханием.
+
+Комментарий, оставленный в момент t, весит 2 ** ((t - EPOCH) /
+TRENDING_HALF_LIFE): каждый период полураспада новые комментарии
+весят вдвое больше старых. Порядок постов от текущего времени не
+зависит, поэтому счета не пересчитываются: TrendingScore.score хранит
+log2 суммы весов поста и только растет с каждым комментарием.
+
+Первые TRENDING_TOP_K постов сайта и каждой группы лежат в кеше
+как Leaderboard — два плотных массива, счета и id. Комментарий
+обновляет счет поста одним UPDATE, а доски в кеше — только после
+фиксации транзакции, чтобы откат не оставил на доске несуществующий
+счет. Процессы обновляют доски без блокировки: при гонке пост может
+стоять не на своем месте до следующего комментария к нему. Страница
+«Популярное» берет доску из кеша и посты по id и не читает
+комментарии, сколько бы их ни было. Доску, пропавшую из кеша, первый
+читатель строит заново одним запросом по индексу (group, -score)
+к default: доска живет в кеше сутки, и отставшая реплика испортила
+бы ее надолго. Удаление комментария счет не уменьшает: активность
+уже была.
+"""
+import math
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, transaction
+from django.db.models import FloatField, Value
+from django.db.models.functions import Greatest, Least, Log, Power
+
+from .constants import NUMBER_OF_POSTS
+from .models import Comment, Post, TrendingScore
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+SITE = 'site'
+BOARD_KEY = 'trending:{}'
+
+
+def weight(when):
+    """log2 веса комментария, оставленного в момент when."""
+    return (when - EPOCH).total_seconds() / settings.TRENDING_HALF_LIFE
+
+
+def combine(score, added):
+    """log2(2 ** score + 2 ** added) без переполнения."""
+    high, low = max(score, added), min(score, added)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+class Leaderboard:
+    """Первые size постов по убыванию счета."""
+    __slots__ = ('size', 'keys', 'ids')
+
+    def __init__(self, size, entries=()):
+        self.size = size
+        # Счета со знаком минус: по возрастанию, чтобы работал bisect.
+        self.keys = array('d')
+        self.ids = array('q')
+        for post_id, score in entries:
+            self.update(post_id, score)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def remove(self, post_id):
+        if post_id in self.ids:
+            position = self.ids.index(post_id)
+            del self.keys[position]
+            del self.ids[position]
+
+    def update(self, post_id, score):
+        """Ставит пост на место по новому счету, вытесняя последний."""
+        self.remove(post_id)
+        position = bisect_right(self.keys, -score)
+        if position >= self.size:
+            return
+        self.keys.insert(position, -score)
+        self.ids.insert(position, post_id)
+        if len(self.ids) > self.size:
+            self.keys.pop()
+            self.ids.pop()
+
+
+def board_key(group_id=None):
+    return BOARD_KEY.format(SITE if group_id is None else group_id)
+
+
+def build(group_id=None):
+    """Доска из таблицы счетов default: один запрос по индексу."""
+    scores = TrendingScore.objects.using(DEFAULT_DB_ALIAS).order_by('-score')
+    if group_id is not None:
+        scores = scores.filter(group_id=group_id)
+    return Leaderboard(
+        settings.TRENDING_TOP_K,
+        scores.values_list('post_id', 'score')[:settings.TRENDING_TOP_K],
+    )
+
+
+def leaderboard(group_id=None):
+    """Доска сайта или группы; после промаха кеша строится заново."""
+    board = cache.get(board_key(group_id))
+    if board is None:
+        board = build(group_id)
+        cache.add(board_key(group_id), board, settings.TRENDING_BOARD_TIMEOUT)
+    return board
+
+
+def _combined(added):
+    """combine() поля score с added внутри UPDATE."""
+    added = Value(added, output_field=FloatField())
+    high, low = Greatest('score', added), Least('score', added)
+    return high + Log(2, 1 + Power(2, low - high))
+
+
+def _save_score(post_id, group_id, added):
+    """Прибавляет вес к счету поста одним UPDATE; новый счет."""
+    scores = TrendingScore.objects.filter(pk=post_id)
+    if not scores.update(score=_combined(added)):
+        try:
+            with transaction.atomic():
+                TrendingScore.objects.create(
+                    post_id=post_id, group_id=group_id, score=added
+                )
+            return added
+        except IntegrityError:
+            scores.update(score=_combined(added))
+    # Без first(): сортировка по pk потянула бы JOIN с постами.
+    return list(scores.values_list('score', flat=True))[0]
+
+
+def _update_boards(post_id, group_id, score):
+    """Ставит пост на место на досках, которые есть в кеше."""
+    for board_group in (None, group_id) if group_id else (None,):
+        key = board_key(board_group)
+        board = cache.get(key)
+        if board is not None:
+            board.update(post_id, score)
+            cache.set(key, board, settings.TRENDING_BOARD_TIMEOUT)
+
+
+def record_comment(post_id, group_id, created):
+    """Добавляет комментарий к счету поста, после фиксации — к доскам."""
+    score = _save_score(post_id, group_id, weight(created))
+    transaction.on_commit(
+        lambda: _update_boards(post_id, group_id, score)
+    )
+
+
+def _forget_boards(group_ids):
+    """После фиксации сбрасывает доски: их построит первый читатель."""
+    keys = [board_key(group) for group in group_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_post(post):
+    """Пост удален: доски, где он мог быть, строятся заново."""
+    _forget_boards([None, post.group_id] if post.group_id else [None])
+
+
+def move_post(post, old_group_id):
+    """Пост перенесен в другую группу вместе со счетом."""
+    if TrendingScore.objects.filter(pk=post.pk).update(
+        group_id=post.group_id
+    ):
+        _forget_boards([
+            group for group in (old_group_id, post.group_id) if group
+        ])
+
+
+def page(number, group_id=None):
+    """Страница популярных постов с авторами и группами."""
+    paginator = Paginator(
+        list(leaderboard(group_id).ids), NUMBER_OF_POSTS
+    )
+    page_obj = paginator.get_page(number)
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        page_obj.object_list
+    )
+    page_obj.object_list = [
+        posts[pk] for pk in page_obj.object_list if pk in posts
+    ]
+    return page_obj
+
+
+def rebuild():
+    """Пересчитывает все счета по комментариям и сбрасывает доски."""
+    scores = {}
+    groups = {}
+    comments = Comment.objects.order_by().values_list(
+        'post_id', 'post__group_id', 'created'
+    )
+    for post_id, group_id, created in comments.iterator():
+        added = weight(created)
+        if post_id in scores:
+            scores[post_id] = combine(scores[post_id], added)
+        else:
+            scores[post_id] = added
+            groups[post_id] = group_id
+    with transaction.atomic():
+        TrendingScore.objects.all().delete()
+        TrendingScore.objects.bulk_create(
+            TrendingScore(post_id=pk, group_id=groups[pk], score=score)
+            for pk, score in scores.items()
+        )
+    boards = {board_key(group) for group in groups.values() if group}
+    cache.delete_many([board_key(), *boards])
+    return len(scores)
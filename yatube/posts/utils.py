@@ -1,12 +1,121 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
 from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .constants import COMMENTS_PER_PAGE, NUMBER_OF_POSTS
+from .models import Comment
+
+
+def encode_cursor(pub_date, pk):
+    """Упаковывает ключ (pub_date, id) в непрозрачный токен."""
+    raw = f'{pub_date.isoformat()}|{pk}'.encode()
+    return urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw_date, raw_pk = urlsafe_b64decode(padded).decode().split('|')
+        pub_date = parse_datetime(raw_date)
+        pk = int(raw_pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class CursorPaginator(Paginator):
+    """Пагинация по ключу (pub_date, id) без COUNT(*) и OFFSET."""
+    date_field = 'pub_date'
+
+    def __init__(self, object_list, per_page, **kwargs):
+        object_list = object_list.order_by(
+            f'-{self.date_field}', '-pk'
+        )
+        super().__init__(object_list, per_page, **kwargs)
+
+    def _key(self, obj):
+        return encode_cursor(getattr(obj, self.date_field), obj.pk)
+
+    def _seek(self, queryset, cursor, older, pk_field='pk'):
+        pub_date, pk = cursor
+        lookup = 'lt' if older else 'gt'
+        return queryset.filter(
+            Q(**{f'{self.date_field}__{lookup}': pub_date})
+            | Q(**{self.date_field: pub_date, f'{pk_field}__{lookup}': pk})
+        )
 
-from .constants import NUMBER_OF_POSTS
+    def _rows(self, cursor, older, limit):
+        """Строки рядом с курсором: от новых к старым или наоборот."""
+        queryset = self.object_list
+        if cursor is not None:
+            queryset = self._seek(queryset, cursor, older)
+        if not older:
+            queryset = queryset.reverse()
+        return list(queryset[:limit])
+
+    def cursor_page(self, after=None, before=None):
+        """Возвращает страницу после или до курсора.
+
+        Страница остается обычным Page, но номер у нее относительный:
+        1 — самая свежая страница, 2 — любая следующая за ней.
+        Ссылки на соседей лежат в next_cursor и previous_cursor.
+        """
+        after = decode_cursor(after) if after else None
+        before = decode_cursor(before) if before else None
+        if before is not None:
+            rows = self._rows(before, older=False, limit=self.per_page + 1)
+            has_newer = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            has_older = bool(rows)
+        else:
+            rows = self._rows(after, older=True, limit=self.per_page + 1)
+            has_older = len(rows) > self.per_page
+            rows = rows[:self.per_page]
+            has_newer = after is not None and bool(rows)
+        number = 2 if has_newer else 1
+        self.num_pages = number + 1 if has_older else number
+        page = self._get_page(rows, number, self)
+        page.keyset = True
+        page.next_cursor = self._key(rows[-1]) if has_older else None
+        page.previous_cursor = self._key(rows[0]) if has_newer else None
+        return page
+
+
+def paginate(paginator, request):
+    """Страница пагинатора по параметрам запроса.
+
+    По умолчанию страницы листаются курсорами ?after=/?before=.
+    Номер ?page= поддерживается для старых ссылок и закладок.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return paginator.get_page(page_number)
+
+    return paginator.cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
 
 
 def get_page_context(posts, request):
     """Пагинация."""
-    paginator = Paginator(posts, NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    return paginate(CursorPaginator(posts, NUMBER_OF_POSTS), request)
+
+
+class CommentPaginator(CursorPaginator):
+    """Пагинация комментариев по ключу (created, id)."""
+    date_field = 'created'
+
 
-    return page_obj
+def get_comments_page(post_id, request):
+    """Порция комментариев поста после курсора ?after= вместе с авторами."""
+    comments = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    paginator = CommentPaginator(comments, COMMENTS_PER_PAGE)
+    return paginator.cursor_page(after=request.GET.get('after'))
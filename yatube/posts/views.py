@@ -1,13 +1,31 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import (
+    Http404, HttpResponseBadRequest, StreamingHttpResponse
+)
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import require_safe
 
+from core.query_budget import query_budget
+from core.replicas import read_from_replica
+
+from . import (
+    conditional, counters, export, group_stats, search, trending
+)
+from .conditional import versioned
+from .constants import INDEX_PAGE_CACHE, NUMBER_OF_POSTS
+from .feed import FeedPaginator
 from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
-from .utils import get_page_context
+from .models import Counter, Follow, Group, Post, User
+from .page_cache import cache_page_swr
+from .thumbnails import preload
+from .utils import get_comments_page, get_page_context, paginate
 
 
-@cache_page(20, key_prefix='index_page')
+@query_budget(4)
+@read_from_replica
+@versioned(conditional.index_scopes)
+@cache_page_swr(key_prefix=INDEX_PAGE_CACHE)
 def index(request):
     """Главная страница."""
     posts_list = Post.objects.select_related('author', 'group').all()
@@ -17,6 +35,19 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(3)
+@read_from_replica
+@versioned(conditional.index_scopes)
+def group_index(request):
+    """Каталог сообществ."""
+    context = {'groups': group_stats.directory()}
+
+    return render(request, 'posts/group_index.html', context)
+
+
+@query_budget(6)
+@read_from_replica
+@versioned(conditional.group_posts_scopes)
 def group_posts(request, slug):
     """Страница сообществ."""
     group = get_object_or_404(Group, slug=slug)
@@ -30,6 +61,27 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(6)
+@read_from_replica
+def popular(request, slug=None):
+    """Популярные посты сайта или группы."""
+    group = None
+    if slug is not None:
+        group = get_object_or_404(Group, slug=slug)
+    page_obj = trending.page(
+        request.GET.get('page'), group.pk if group else None
+    )
+    context = {
+        'group': group,
+        'page_obj': page_obj,
+    }
+
+    return render(request, 'posts/popular.html', context)
+
+
+@query_budget(8)
+@read_from_replica
+@versioned(conditional.profile_scopes)
 def profile(request, username):
     """Страница профиля пользователя."""
     author = get_object_or_404(User, username=username)
@@ -46,27 +98,64 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'counters': counters.for_author(author.id),
     }
 
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(7)
+@read_from_replica
+@versioned(conditional.post_detail_scopes)
 def post_detail(request, post_id):
     """Страница просмотра записей."""
     post = get_object_or_404(
         Post.objects.select_related('author', 'group'), pk=post_id
     )
+    preload([post])
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
     context = {
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': get_comments_page(post.id, request),
+        'author_posts': counters.get(Counter.AUTHOR_POSTS, post.author_id),
     }
 
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(4)
+@read_from_replica
+@versioned(conditional.post_comments_scopes)
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    post = get_object_or_404(Post.objects.only('id'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(post.id, request),
+    }
+
+    return render(request, 'includes/comment_list.html', context)
+
+
+@query_budget(4)
+@read_from_replica
+@versioned(conditional.index_scopes)
+def post_search(request):
+    """Поиск по текстам постов."""
+    query = request.GET.get('q', '').strip()
+    page_obj = search.search(
+        query, NUMBER_OF_POSTS, after=request.GET.get('after')
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+
+    return render(request, 'posts/search.html', context)
+
+
+@query_budget(12)
 @login_required
 def post_create(request):
     """Создание новых записей."""
@@ -84,6 +173,7 @@ def post_create(request):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(12)
 @login_required
 def post_edit(request, post_id):
     """Редактирование записей."""
@@ -109,6 +199,7 @@ def post_edit(request, post_id):
     return render(request, 'posts/create_post.html', context)
 
 
+@query_budget(9)
 @login_required
 def add_comment(request, post_id):
     """Создание комментариев."""
@@ -124,17 +215,19 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id)
 
 
+@query_budget(5)
 @login_required
+@versioned(conditional.follow_scopes)
 def follow_index(request):
     """Посты авторов."""
-    posts_list = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
-    page_obj = get_page_context(posts_list, request)
+    page_obj = paginate(
+        FeedPaginator(request.user, NUMBER_OF_POSTS), request
+    )
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
+@query_budget(15)
 @login_required
 def profile_follow(request, username):
     """Подписаться на автора."""
@@ -144,9 +237,37 @@ def profile_follow(request, username):
     return redirect('posts:profile', username=username)
 
 
+@query_budget(13)
 @login_required
 def profile_unfollow(request, username):
     """Отписка от автора."""
     author = get_object_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:profile', username=username)
+
+
+@query_budget(2)
+@staff_member_required
+@require_safe
+def export_data(request, kind):
+    """Выгрузка данных потоком; ?after=<id> продолжает прерванную."""
+    if kind not in export.KINDS:
+        raise Http404
+    file_format = request.GET.get('format', 'jsonl')
+    compress = request.GET.get('gzip') == '1'
+    try:
+        after = int(request.GET.get('after', 0))
+    except ValueError:
+        return HttpResponseBadRequest('after должен быть числом.')
+    if file_format not in export.FORMATS:
+        return HttpResponseBadRequest('format: jsonl или csv.')
+    response = StreamingHttpResponse(
+        (data for _, _, data in export.stream(
+            kind, file_format, compress, after=after, header=not after,
+        )),
+        content_type=export.content_type(file_format, compress),
+    )
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+        export.filename(kind, file_format, compress)
+    )
+    return response
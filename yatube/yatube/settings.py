@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -37,10 +41,12 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.timing.TimingMiddleware',
+    'core.metrics.MetricsMiddleware',
+    'core.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -48,7 +54,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -77,12 +82,29 @@ TEMPLATES = [
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
+# SQLite с WAL и очередью на запись (core/db/base.py).
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.db',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            'pragmas': {
+                # Действует только для новой базы, для старой нужен
+                # manage.py sqlite_maintenance --vacuum.
+                'auto_vacuum': 'INCREMENTAL',
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'mmap_size': 256 * 1024 * 1024,
+                # Отрицательное значение — в килобайтах.
+                'cache_size': -64 * 1024,
+                'busy_timeout': 5000,
+            },
+            # Сколько секунд ждать очереди на запись внутри процесса.
+            'write_timeout': 5,
+        },
     }
 }
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -121,8 +143,120 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Загрузки всегда пишутся во временный файл кусками, а не в память.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Ограничения и пережатие картинок постов (posts/images.py).
+POST_IMAGE_MAX_UPLOAD_SIZE = 50 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50 * 10 ** 6
+POST_IMAGE_MAX_SIDE = 1920
+POST_IMAGE_JPEG_QUALITY = 85
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
     }
 }
+
+# Тесты (manage.py test и pytest) чистят кеш, поэтому у них свой,
+# в памяти процесса, а не общий кеш сервера. Процессы, запущенные
+# тестами, узнают о них по TEST_DIR_VARIABLE.
+TEST_DIR_VARIABLE = 'YATUBE_TEST_DIR'
+TESTING = (
+    sys.argv[1:2] == ['test']
+    or 'pytest' in sys.modules
+    or TEST_DIR_VARIABLE in os.environ
+)
+if TESTING:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+            },
+        }
+    }
+
+# Посты авторов с таким числом подписчиков не раскладываются по лентам,
+# а подмешиваются к ленте подписок при чтении.
+FEED_POPULAR_AUTHOR_FOLLOWERS = 10000
+FEED_FANOUT_BATCH_SIZE = 1000
+
+# Время жизни отрисованных карточек постов (posts/cards.py).
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Кеш страниц со сбросом по событиям (posts/page_cache.py): страница
+# живет долго, а после изменений отдается устаревшая копия, пока свежая
+# отрисовывается в фоне.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+PAGE_CACHE_LOCK_TIMEOUT = 30
+PAGE_CACHE_REFRESH_IN_BACKGROUND = True
+
+# Миниатюры создаются сразу после загрузки картинки (posts/thumbnails.py)
+# задачей в очереди.
+THUMBNAIL_LOCK_TIMEOUT = 60
+THUMBNAIL_PREGENERATE_IN_BACKGROUND = True
+
+# Очередь фоновых задач (core/tasks.py), выполняет команда run_tasks
+# отдельным процессом (см. README). В режиме TASKS_EAGER задачи
+# выполняются сразу при постановке, воркер не нужен.
+TASKS_EAGER = False
+TASK_MAX_ATTEMPTS = 5
+# Задержка перед повтором удваивается: 10 с, 20 с, 40 с... до часа.
+TASK_RETRY_BACKOFF = 10
+TASK_RETRY_BACKOFF_MAX = 60 * 60
+# Задача, которая выполняется дольше, считается брошенной воркером.
+TASK_TIMEOUT = 60 * 10
+TASKS_KEEP_DONE_DAYS = 7
+# Посты авторов с большим числом подписчиков раскладываются
+# по лентам в очереди, а не в запросе.
+FEED_FANOUT_INLINE_FOLLOWERS = 100
+
+# Бюджеты SQL-запросов видов (core/query_budget.py): при True
+# превышение — ошибка, иначе при DEBUG — предупреждение в лог.
+QUERY_BUDGET_ENFORCE = False
+
+# Замер времени запросов (core/timing.py): доля замеряемых запросов,
+# размер кольцевого буфера последних замеров и заголовок Server-Timing.
+TIMING_SAMPLE_RATE = 1.0
+TIMING_BUFFER_SIZE = 1000
+TIMING_SERVER_TIMING_HEADER = True
+
+# Метрики Prometheus (core/metrics.py): файл, куда процессы сбрасывают
+# свои итоги, и как часто они это делают (в секундах).
+METRICS_PATH = os.path.join(BASE_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 5
+# Итоги тестовых процессов не попадают в файл сервера: они пишутся
+# во временный каталог на весь прогон. Обработчики atexit вызываются
+# в обратном порядке, и каталог удаляется после сброса метрик.
+if TESTING:
+    if TEST_DIR_VARIABLE not in os.environ:
+        os.environ[TEST_DIR_VARIABLE] = tempfile.mkdtemp(prefix='yatube-')
+        atexit.register(shutil.rmtree, os.environ[TEST_DIR_VARIABLE], True)
+    METRICS_PATH = os.path.join(
+        os.environ[TEST_DIR_VARIABLE], 'metrics.sqlite3'
+    )
+
+# Реплики только для чтения (core/replicas.py). Для проверки на одной
+# машине: добавить в DATABASES базу 'replica' с файлом replica.sqlite3,
+# вписать ее сюда и запустить manage.py sync_replica --interval 5.
+DATABASE_REPLICAS = []
+# Отставшая больше реплика не используется.
+REPLICA_MAX_LAG = 10
+REPLICA_LAG_CHECK_INTERVAL = 1
+# Сколько секунд после записи клиент читает из default; не меньше
+# REPLICA_MAX_LAG, иначе реплика может еще не видеть его изменений.
+REPLICA_READ_YOUR_WRITES = REPLICA_MAX_LAG
+
+# Популярные посты (posts/trending.py): за каждый период полураспада
+# (в секундах) вес старых комментариев падает вдвое. В кеше хранятся
+# первые TRENDING_TOP_K постов сайта и каждой группы.
+TRENDING_HALF_LIFE = 60 * 60 * 6
+TRENDING_TOP_K = 200
+TRENDING_BOARD_TIMEOUT = 60 * 60 * 24